@@ -1,10 +1,28 @@
+import asyncio
+import hashlib
 import logging
+import time
 
 from fastapi import HTTPException, Security, status
 from fastapi.security import OpenIdConnect
+from jose import JWTError, jwt
 from keycloak import KeycloakError, KeycloakOpenID
 
-from app.config import settings
+from app.config import JWKS_MIN_REFRESH_INTERVAL, TokenVerificationMode, settings
+from app.helpers import TTLCache
+
+# Claims of an access token we expose as user info, mirroring the userinfo endpoint
+USERINFO_CLAIMS = (
+    "sub",
+    "email",
+    "email_verified",
+    "name",
+    "preferred_username",
+    "given_name",
+    "family_name",
+    "realm_access",
+    "resource_access",
+)
 
 oidc = OpenIdConnect(
     openIdConnectUrl=str(settings.AIOD_KEYCLOAK.OIDC_URL),
@@ -20,6 +38,54 @@ keycloak_openid = KeycloakOpenID(
 )
 
 
+class JWKSCache:
+    """Public signing keys of the Keycloak realm, periodically refetched.
+
+    Keys are refreshed once they are older than `refresh_interval` seconds
+    or when a token signed by an unknown key arrives (key rotation). The latter
+    is rate-limited so that forged tokens cannot make us hammer Keycloak.
+    """
+
+    def __init__(self, refresh_interval: int) -> None:
+        self.refresh_interval = refresh_interval
+        self.keys: dict[str, dict] = {}
+        self.issuer: str | None = None
+        self.fetched_at: float | None = None
+        self.lock = asyncio.Lock()
+
+    async def get_key(self, kid: str | None) -> dict | None:
+        if self._is_older_than(self.refresh_interval):
+            await self.refresh()
+        elif kid not in self.keys and self._is_older_than(JWKS_MIN_REFRESH_INTERVAL):
+            await self.refresh()
+
+        return self.keys.get(kid) if kid is not None else None
+
+    async def refresh(self) -> None:
+        fetched_at = self.fetched_at
+        async with self.lock:
+            if self.fetched_at != fetched_at:
+                # Keys have been refreshed while we were waiting for the lock
+                return
+
+            if self.issuer is None:
+                well_known = await asyncio.to_thread(keycloak_openid.well_known)
+                self.issuer = well_known["issuer"]
+
+            certs = await asyncio.to_thread(keycloak_openid.certs)
+            self.keys = {key["kid"]: key for key in certs.get("keys", []) if "kid" in key}
+            self.fetched_at = time.monotonic()
+
+    def _is_older_than(self, seconds: int) -> bool:
+        return self.fetched_at is None or time.monotonic() - self.fetched_at > seconds
+
+
+jwks_cache = JWKSCache(refresh_interval=settings.AIOD_KEYCLOAK.JWKS_REFRESH_INTERVAL)
+user_cache = TTLCache(
+    maxsize=settings.AIOD_KEYCLOAK.USER_CACHE_SIZE, ttl=settings.AIOD_KEYCLOAK.USER_CACHE_TTL
+)
+
+
 async def get_current_user_token(token=Security(oidc)):
     return token
 
@@ -29,12 +95,74 @@ async def get_current_user_if_exists(token: str | None = Security(oidc)) -> dict
         return None
 
     token = token.replace("Bearer ", "")
+    token_digest = hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    user = user_cache.get(token_digest)
+    if user is None:
+        user = await _resolve_user(token)
+        user_cache.set(token_digest, user, ttl=_get_user_cache_ttl(token))
+    return user
+
+
+async def _resolve_user(token: str) -> dict:
+    if settings.AIOD_KEYCLOAK.TOKEN_VERIFICATION == TokenVerificationMode.LOCAL:
+        return await verify_token_locally(token)
+
     try:
         return keycloak_openid.userinfo(token)
     except KeycloakError as e:
-        _raise_invalid_token(e)
+        _raise_invalid_token(e.error_message)
+
+    return {}
+
+
+def _get_user_cache_ttl(token: str) -> float:
+    """Cached user must not outlive the validity of the token it was resolved from"""
+    ttl = settings.AIOD_KEYCLOAK.USER_CACHE_TTL
+    try:
+        expires_at = jwt.get_unverified_claims(token).get("exp")
+    except JWTError:
+        return ttl
+
+    if not isinstance(expires_at, (int, float)):
+        return ttl
+    return min(ttl, expires_at - time.time())
+
+
+async def verify_token_locally(token: str) -> dict:
+    """Verify signature, expiration, issuer and audience of an access token
+    using the cached realm keys and return the user info contained in its claims.
+    """
+    try:
+        kid = jwt.get_unverified_header(token).get("kid")
+    except JWTError as e:
+        _raise_invalid_token(str(e))
+
+    try:
+        key = await jwks_cache.get_key(kid)
+    except KeycloakError as e:
+        logging.error("Failed to retrieve signing keys from Keycloak", exc_info=e)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Unable to verify the authentication token at the moment",
+        )
+    if key is None:
+        _raise_invalid_token("Unknown signing key")
+
+    audience = settings.AIOD_KEYCLOAK.AUDIENCE
+    try:
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=[key.get("alg", "RS256")],
+            audience=audience,
+            issuer=jwks_cache.issuer,
+            options={"verify_aud": audience is not None, "verify_at_hash": False},
+        )
+    except JWTError as e:
+        _raise_invalid_token(str(e))
 
-    return None
+    return {claim: claims[claim] for claim in USERINFO_CLAIMS if claim in claims}
 
 
 async def get_current_user_or_raise(token: str | None = Security(oidc)) -> dict:
@@ -71,8 +199,7 @@ def raise_requires_auth(detail: str | None = None) -> None:
     )
 
 
-def _raise_invalid_token(ex: KeycloakError) -> None:
-    error_msg = ex.error_message
+def _raise_invalid_token(error_msg: str | bytes | None) -> None:
     error_detail = "Invalid authentication token"
 
     if isinstance(error_msg, bytes):
@@ -1,7 +1,8 @@
+from enum import Enum
 from functools import lru_cache
 from pathlib import Path
 
-from pydantic import AnyHttpUrl, BaseModel, BaseSettings, DirectoryPath
+from pydantic import AnyHttpUrl, BaseModel, BaseSettings, DirectoryPath, FilePath, validator
 
 USERDATA_DIRNAME = "experiments-userdata"
 EXPERIMENT_TEMPLATES_DIRNAME = "experiment-templates"
@@ -9,12 +10,16 @@ EXPERIMENT_RUN_DIR_PREFIX = "run-"
 EXPERIMENT_TEMPLATE_DIR_PREFIX = "template-"
 METRICS_FILENAME = "metrics.json"
 LOGS_FILENAME = "logs.txt"
-LITTLE_NAP = 5
+BUILD_LOGS_FILENAME = "build-logs.txt"
+OUTPUT_MANIFEST_FILENAME = "output-manifest.json"
 CHECK_REANA_CONNECTION_INTERVAL = 60
 RUN_TEMP_OUTPUT_FOLDER = "output-temp"
 RUN_OUTPUT_FOLDER = "output"
 REPOSITORY_NAME = "rail-exp-templates"
+# Images are tagged by a hash of their environment, so that templates can share them
+ENVIRONMENT_IMAGE_TAG_PREFIX = "env-"
 TEMP_DIRNAME = "temp"
+JWKS_MIN_REFRESH_INTERVAL = 30
 
 
 class AIoDApiConfig(BaseModel):
@@ -27,6 +32,99 @@ class AIoDLibraryApiConfig(BaseModel):
 
 class AIoDEnhancedSearchApiConfig(BaseModel):
     BASE_URL: AnyHttpUrl
+    # How long search jobs and their results are kept for subsequent requests
+    RESULTS_TTL: int = 3600
+    MAX_JOBS: int = 1000
+    # Bounds of the exponential backoff used when polling for results
+    POLL_INITIAL_DELAY: float = 0.5
+    POLL_MAX_DELAY: float = 8
+
+
+class TokenVerificationMode(str, Enum):
+    REMOTE = "remote"  # Keycloak userinfo endpoint is called for each token
+    LOCAL = "local"  # token signature and claims are verified against cached JWKS
+
+
+class AIoDResponseCacheConfig(BaseModel):
+    SIZE: int = 1000
+    # Time-to-live of cached responses of individual endpoint families
+    LIST_TTL: int = 60
+    SEARCH_TTL: int = 300
+    COUNT_TTL: int = 3600
+    # How long after their TTL responses can still be served while being refreshed
+    MAX_STALE: int = 86400
+
+
+class AIoDAssetMirrorConfig(BaseModel):
+    ENABLED: bool = False
+    # Interval between synchronizations of the mirror with AIoD, 0 disables them
+    SYNC_INTERVAL: int = 3600
+    SYNC_PAGE_SIZE: int = 100
+    # Whether the synchronization mirrors all AIoD assets or only those RAIL has fetched already
+    SYNC_NEW_ASSETS: bool = False
+
+
+class RunOutputCacheConfig(BaseModel):
+    # Whether outputs of concluded runs are archived locally and served from there
+    ENABLED: bool = False
+    # Maximum total size (in bytes) of archived outputs
+    QUOTA: int = 10 * 1024**3
+
+
+class DockerImageCacheConfig(BaseModel):
+    # Maximum total size (in bytes) of built images kept locally as the cache of later builds,
+    # 0 means images are removed right after they're pushed
+    MAX_SIZE: int = 20 * 1024**3
+    # Number of the most common base images of templates that are pulled on startup
+    PREWARM_BASE_IMAGES: int = 5
+
+
+class JobQueueConfig(BaseModel):
+    # How long a worker owns a claimed job unless it renews its lease
+    LEASE_DURATION: int = 60
+    HEARTBEAT_INTERVAL: int = 20
+    # How often the queue is checked for jobs enqueued by other replicas or with expired leases
+    POLL_INTERVAL: float = 5
+
+
+class SchedulingPolicyType(str, Enum):
+    FIFO = "fifo"
+    FAIR_SHARE = "fair_share"  # round-robin over users weighted by USER_WEIGHTS
+
+
+class RunSchedulingConfig(BaseModel):
+    POLICY: SchedulingPolicyType = SchedulingPolicyType.FIFO
+    # Maximum number of runs of a single user executed at once, 0 means no limit
+    MAX_RUNNING_PER_USER: int = 0
+    # Overrides of MAX_RUNNING_PER_USER and weights (default 1) of individual users by their email
+    USER_MAX_RUNNING: dict[str, int] = {}
+    USER_WEIGHTS: dict[str, float] = {}
+
+    @validator("USER_WEIGHTS")
+    def weights_must_be_positive(cls, weights: dict[str, float]) -> dict[str, float]:
+        if any(weight <= 0 for weight in weights.values()):
+            raise ValueError("Weights of users must be positive")
+        return weights
+
+
+class WorkflowEngineType(str, Enum):
+    REANA = "reana"
+    LOCAL = "local"  # workflows are executed on the host of RAIL itself
+
+
+class LocalExecutionMode(str, Enum):
+    DOCKER = "docker"  # script is executed in a container of the image of the template
+    PROCESS = "process"  # script is executed by a local Python interpreter
+
+
+class LocalWorkflowsConfig(BaseModel):
+    MODE: LocalExecutionMode = LocalExecutionMode.DOCKER
+    # Limits of a single workflow, 0 means no limit. CPU is only limited in the docker mode.
+    CPU_LIMIT: float = 1
+    MEMORY_LIMIT: int = 4 * 1024**3
+    # Location of EEE_DATA_PATH on the Docker host, if RAIL itself runs in a container
+    HOST_DATA_PATH: Path | None = None
+    PYTHON_EXECUTABLE: str = "python"
 
 
 class AIODKeycloakConfig(BaseModel):
@@ -35,6 +133,13 @@ class AIODKeycloakConfig(BaseModel):
     CLIENT_SECRET: str
     SERVER_URL: AnyHttpUrl
     OIDC_URL: AnyHttpUrl
+    TOKEN_VERIFICATION: TokenVerificationMode = TokenVerificationMode.REMOTE
+    # Expected 'aud' claim of access tokens, it is not checked if left empty
+    AUDIENCE: str | None = None
+    JWKS_REFRESH_INTERVAL: int = 3600
+    # Resolved users are cached per token, at most until the token expires
+    USER_CACHE_TTL: int = 60
+    USER_CACHE_SIZE: int = 1024
 
 
 class Settings(BaseSettings):  # type: ignore
@@ -45,22 +150,54 @@ class Settings(BaseSettings):  # type: ignore
     AIOD_LIBRARY_API: AIoDLibraryApiConfig
     AIOD_ENHANCED_SEARCH_API: AIoDEnhancedSearchApiConfig
     AIOD_KEYCLOAK: AIODKeycloakConfig
+    AIOD_RESPONSE_CACHE: AIoDResponseCacheConfig = AIoDResponseCacheConfig()
+    AIOD_ASSET_MIRROR: AIoDAssetMirrorConfig = AIoDAssetMirrorConfig()
     DEFAULT_RESPONSE_LIMIT: int = 100
+    AIOD_MAX_CONCURRENT_REQUESTS: int = 10
+    ASSET_CACHE_SIZE: int = 5000
+    ASSET_CACHE_TTL: int = 600
+    ASSET_CACHE_NEGATIVE_TTL: int = 60
 
     # TODO: clean
     DOCKER_BASE_URL: str
     DOCKER_REGISTRY_URL: str
     DOCKER_REGISTRY_USERNAME: str
     DOCKER_REGISTRY_PASSWORD: str
+    DOCKER_IMAGE_CACHE: DockerImageCacheConfig = DockerImageCacheConfig()
+    # How long the results of checks whether images exist in the registry are reused
+    IMAGE_CHECK_TTL: int = 3600
+    IMAGE_CHECK_NEGATIVE_TTL: int = 30
+
+    WORKFLOW_ENGINE: WorkflowEngineType = WorkflowEngineType.REANA
+    LOCAL_WORKFLOWS: LocalWorkflowsConfig = LocalWorkflowsConfig()
 
     REANA_SERVER_URL: str
     REANA_ACCESS_TOKEN: str
+    # Verification of TLS certificate of REANA when its files are streamed, either a bool
+    # or a path to a CA bundle (e.g. for REANA deployments using self-signed certificates)
+    REANA_VERIFY_TLS: bool | FilePath = True
+    # Interval between polls of statuses of running REANA workflows
+    REANA_STATUS_POLL_INTERVAL: float = 5
+    # Interval between checks of availability of REANA and its upper bound while REANA is unavailable
+    REANA_HEALTH_CHECK_INTERVAL: float = 30
+    REANA_HEALTH_CHECK_MAX_BACKOFF: float = 300
+    # Interval between fetches of logs of active experiment runs that are being streamed
+    LOGS_STREAM_INTERVAL: float = 5
 
     EEE_DATA_PATH: DirectoryPath
     MAX_PARALLEL_IMAGE_BUILDS: int = 2
     MAX_PARALLEL_CONTAINERS: int = 2
+    MAX_PARALLEL_PREPROCESSING: int = 2
+    MAX_PARALLEL_POSTPROCESSING: int = 2
     MAX_IMAGE_BUILDS_ATTEMPTS: int = 1
+    # Maximum duration (in seconds) of building and pushing a single image
+    IMAGE_BUILD_TIMEOUT: int = 3600
+    # Maximum duration (in seconds) for which Docker may not report any progress of the build/push
+    IMAGE_BUILD_IDLE_TIMEOUT: int = 600
     MAX_EXPERIMENT_RUN_ATTEMPTS: int = 1
+    JOB_QUEUE: JobQueueConfig = JobQueueConfig()
+    RUN_SCHEDULING: RunSchedulingConfig = RunSchedulingConfig()
+    RUN_OUTPUT_CACHE: RunOutputCacheConfig = RunOutputCacheConfig()
 
     class Config:
         env_file = ".env"
@@ -1,14 +1,34 @@
+import asyncio
 import logging
+import os
+import re
+import statistics
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
 from pathlib import Path
-from typing import Type
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Hashable,
+    Iterator,
+    Type,
+    TypeVar,
+)
 
+import aiofiles as aiof
 from beanie.odm.operators.find.comparison import NE, BaseFindComparisonOperator, Eq
 from pydantic import BaseModel
 
 from app.config import settings
 
+T = TypeVar("T")
+
 
 class Pagination(BaseModel):
     offset: int = 0
@@ -33,6 +53,264 @@ class FileDetail(BaseModel):
     last_modified: datetime
 
 
+@dataclass
+class FileStream:
+    """Content of a file (or of its byte range) that is read chunk by chunk"""
+
+    filename: str
+    chunks: AsyncIterator[bytes]
+    close: Callable[[], Awaitable[None]]
+    status_code: int = 200
+    # Content-Length, Content-Range, ... of the streamed content
+    headers: dict[str, str] = field(default_factory=dict)
+
+
+class TTLCache:
+    """Bounded in-memory LRU cache whose entries expire after a time-to-live."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= time.monotonic():
+            del self._entries[key]
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        """Store a value, `ttl` overrides the default time-to-live of the cache"""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "size": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hit_ratio,
+        }
+
+
+class SingleFlight:
+    """Coalesces concurrent calls sharing the same key into a single execution.
+
+    Callers arriving while a call with the same key is in flight await its result
+    instead of starting a new one. A cancelled caller doesn't cancel the shared call.
+    """
+
+    def __init__(self) -> None:
+        self._in_flight: dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self._in_flight[key] = future
+            future.add_done_callback(lambda f: self._forget(key, f))
+
+        return await asyncio.shield(future)
+
+    def is_in_flight(self, key: Hashable) -> bool:
+        return key in self._in_flight
+
+    def _forget(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        if not future.cancelled():
+            # mark a possible exception as retrieved even if nobody awaits the future anymore
+            future.exception()
+
+
+class StaleWhileRevalidateCache:
+    """Bounded LRU cache serving expired entries while refreshing them in the background.
+
+    Entries older than their `ttl` are still returned and a refresh is started in the background.
+    Only missing entries or entries older than `ttl + max_stale` make the caller wait for `fetch`.
+    Failed fetches are not cached, a failed background refresh keeps the stale entry.
+    """
+
+    def __init__(self, maxsize: int, max_stale: float) -> None:
+        self.maxsize = maxsize
+        self.max_stale = max_stale
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._fetches = SingleFlight()
+        self._background_tasks: set[asyncio.Task] = set()
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[T]], ttl: float) -> T:
+        entry = self._entries.get(key)
+        age = time.monotonic() - entry[0] if entry is not None else None
+
+        if entry is not None and age is not None and age <= ttl:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[1]
+
+        if entry is not None and age is not None and age <= ttl + self.max_stale:
+            self.stale_hits += 1
+            self._entries.move_to_end(key)
+            if not self._fetches.is_in_flight(key):
+                task = asyncio.create_task(self._refresh_in_background(key, fetch))
+                self._background_tasks.add(task)
+                task.add_done_callback(self._background_tasks.discard)
+            return entry[1]
+
+        self.misses += 1
+        return await self._fetches.do(key, lambda: self._fetch_and_store(key, fetch))
+
+    async def _refresh_in_background(self, key: Hashable, fetch: Callable[[], Awaitable]) -> None:
+        try:
+            await self._fetches.do(key, lambda: self._fetch_and_store(key, fetch))
+        except Exception as e:
+            logging.getLogger("uvicorn").warning(
+                f"Failed to refresh a cached response, serving the stale one: {e}"
+            )
+
+    async def _fetch_and_store(self, key: Hashable, fetch: Callable[[], Awaitable[T]]) -> T:
+        value = await fetch()
+        if self.maxsize > 0:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict[str, float]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits + self.stale_hits) / lookups if lookups > 0 else 0.0,
+        }
+
+
+class DurationStats:
+    """Running statistics of measured durations in seconds.
+
+    Percentiles are computed over the most recent `window` measurements.
+    """
+
+    def __init__(self, window: int = 1000) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent: deque[float] = deque(maxlen=window)
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self._recent.append(seconds)
+
+    @contextmanager
+    def measure(self) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(time.perf_counter() - start)
+
+    def stats(self) -> dict[str, float]:
+        recent = sorted(self._recent)
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count > 0 else 0.0,
+            "max": self.max,
+            "p50": statistics.median(recent) if recent else 0.0,
+            "p95": recent[max(0, int(len(recent) * 0.95) - 1)] if recent else 0.0,
+        }
+
+
+def parse_byte_range(byte_range: str, size: int) -> tuple[int, int] | None:
+    """First and last byte of a single range requested by the HTTP Range header
+    of a file of the given size. Returns None if the range cannot be satisfied.
+    """
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", byte_range.strip())
+    if match is None or match.groups() == ("", ""):
+        return None
+
+    first, last = match.groups()
+    if first == "":
+        # suffix range, i.e. the last N bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        return None
+    return start, end
+
+
+async def iter_file_chunks(
+    path: Path, start: int = 0, end: int | None = None, chunk_size: int = 1024**2
+) -> AsyncIterator[bytes]:
+    """Read a local file, or its bytes from `start` to `end` (inclusive), chunk by chunk"""
+    async with aiof.open(path, "rb") as f:
+        await f.seek(start)
+        remaining = None if end is None else end - start + 1
+        while remaining is None or remaining > 0:
+            chunk = await f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+
+def read_file_part(path: Path, offset: int = 0, limit: int | None = None) -> tuple[bytes, int]:
+    """Read a part of a file without loading the whole file, a negative offset
+    counts from the end of the file. Returns the read bytes and the size of the file.
+    """
+    if not path.is_file():
+        return b"", 0
+
+    with path.open("rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(size + offset, 0) if offset < 0 else min(offset, size))
+        return f.read(-1 if limit is None else limit), size
+
+
 def create_env_file(env_vars: dict[str, str], path: Path) -> None:
     lines = []
     for key, value in env_vars.items():
@@ -8,11 +8,13 @@ from fastapi.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 
 from app import __version__
-from app.config import TEMP_DIRNAME, settings
+from app.config import TEMP_DIRNAME, WorkflowEngineType, settings
+from app.models.aiod_asset import AIoDAsset
 from app.models.experiment import Experiment
 from app.models.experiment_run import ExperimentRun
 from app.models.experiment_template import ExperimentTemplate
 from app.models.rail_user import RailUser
+from app.models.scheduled_job import ScheduledJob
 from app.routers import (
     admin,
     aiod,
@@ -25,11 +27,16 @@ from app.services.aiod import (
     aiod_client_wrapper,
     aiod_enhanced_search_client_wrapper,
     aiod_library_client_wrapper,
+    schedule_asset_mirror_sync,
 )
+from app.services.asset_caches.memory import InMemoryAssetCache
+from app.services.asset_mirror import AssetMirror
 from app.services.container_platforms.base import ContainerPlatformBase
 from app.services.container_platforms.docker import DockerService
 from app.services.experiment_scheduler import ExperimentScheduler
+from app.services.run_output_cache import RunOutputCache
 from app.services.workflow_engines.base import WorkflowEngineBase
+from app.services.workflow_engines.local import LocalWorkflowEngine
 from app.services.workflow_engines.reana import ReanaService
 
 app = FastAPI(title="AIoD - RAIL", version=__version__)
@@ -61,18 +68,39 @@ async def app_init():
     aiod_client_wrapper.start()
     aiod_library_client_wrapper.start()
     aiod_enhanced_search_client_wrapper.start()
+    await InMemoryAssetCache.init()
 
     app.db = AsyncIOMotorClient(settings.MONGODB_URI, uuidRepresentation="standard")[
         settings.MONGODB_DBNAME
     ]
     await init_beanie(
         database=app.db,
-        document_models=[ExperimentTemplate, Experiment, ExperimentRun, RailUser],
+        document_models=[
+            ExperimentTemplate,
+            Experiment,
+            ExperimentRun,
+            RailUser,
+            AIoDAsset,
+            ScheduledJob,
+        ],
     )
 
+    if settings.AIOD_ASSET_MIRROR.ENABLED:
+        asset_mirror = await AssetMirror.init()
+        if settings.AIOD_ASSET_MIRROR.SYNC_INTERVAL > 0:
+            asyncio.create_task(schedule_asset_mirror_sync(asset_mirror))
+
+    if settings.RUN_OUTPUT_CACHE.ENABLED:
+        await RunOutputCache.init()
+
     # initialize container platform and workflow engine
     container_platform: ContainerPlatformBase = await DockerService.init()
-    workflow_engine: WorkflowEngineBase = await ReanaService.init()
+    asyncio.create_task(container_platform.prewarm_base_images())
+    workflow_engine: WorkflowEngineBase
+    if settings.WORKFLOW_ENGINE == WorkflowEngineType.LOCAL:
+        workflow_engine = await LocalWorkflowEngine.init()
+    else:
+        workflow_engine = await ReanaService.init()
 
     # Setup ExperimentScheduler and create queues of experiments and images to execute
     experiment_scheduler = await ExperimentScheduler.init(container_platform, workflow_engine)
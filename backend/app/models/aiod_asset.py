@@ -0,0 +1,30 @@
+from datetime import datetime, timezone
+from functools import partial
+
+import pymongo
+from beanie import Document
+from pydantic import Field
+from pymongo import IndexModel
+
+
+class AIoDAsset(Document):
+    """Local copy of an AIoD asset document"""
+
+    asset_type: str
+    identifier: str
+    date_modified: str | None = None
+    data: dict
+    synced_at: datetime = Field(default_factory=partial(datetime.now, tz=timezone.utc))
+
+    class Settings:
+        name = "aiodAssets"
+        indexes = [
+            IndexModel(
+                [("asset_type", pymongo.ASCENDING), ("identifier", pymongo.ASCENDING)],
+                unique=True,
+            )
+        ]
+
+    @staticmethod
+    def get_date_modified(asset: dict) -> str | None:
+        return (asset.get("aiod_entry") or {}).get("date_modified")
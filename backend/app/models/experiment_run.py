@@ -16,6 +16,7 @@ from app.config import (
     METRICS_FILENAME,
     settings,
 )
+from app.helpers import read_file_part
 from app.schemas.experiment_run import ExperimentRunDetails, ExperimentRunResponse
 from app.schemas.states import RunState
 
@@ -31,9 +32,14 @@ class ExperimentRun(Document):
     is_archived: bool = False
 
     @property
-    def logs(self) -> str:
-        log_path = self.run_path / LOGS_FILENAME
-        return log_path.read_text() if log_path.is_file() else ""
+    def logs_path(self) -> Path:
+        return self.run_path / LOGS_FILENAME
+
+    def read_logs(self, offset: int = 0, limit: int | None = None) -> tuple[bytes, int]:
+        """Read a part of the logs without loading the whole file, a negative offset
+        counts from the end of the logs. Returns the read bytes and the size of the logs.
+        """
+        return read_file_part(self.logs_path, offset, limit)
 
     @property
     def metrics(self) -> dict[str, float]:
@@ -67,13 +73,17 @@ class ExperimentRun(Document):
         await self.set({ExperimentRun.state: self.state, ExperimentRun.updated_at: self.updated_at})
 
     def map_to_response(
-        self, user: dict | None = None, return_detailed_response: bool = False
+        self, user: dict | None = None, return_detailed_response: bool = False, logs_tail: int = 0
     ) -> ExperimentRunResponse | ExperimentRunDetails:
+        """Detailed response includes at most `logs_tail` last bytes of logs"""
         is_mine = user is not None and self.created_by == user["email"]
         response = ExperimentRunResponse(**self.dict(), metrics=self.metrics, is_mine=is_mine)
 
         if return_detailed_response:
-            return ExperimentRunDetails(**response.dict(), logs=self.logs)
+            logs = None
+            if logs_tail > 0:
+                logs = self.read_logs(offset=-logs_tail)[0].decode("utf-8", errors="ignore")
+            return ExperimentRunDetails(**response.dict(), logs=logs)
         else:
             return response
 
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import hashlib
 import re
 from datetime import datetime, timezone
 from functools import partial
@@ -14,11 +15,13 @@ from pydantic import Field
 
 from app.auth import has_admin_role
 from app.config import (
-    EXPERIMENT_TEMPLATE_DIR_PREFIX,
+    BUILD_LOGS_FILENAME,
+    ENVIRONMENT_IMAGE_TAG_PREFIX,
     REPOSITORY_NAME,
     RUN_TEMP_OUTPUT_FOLDER,
     settings,
 )
+from app.helpers import read_file_part
 from app.schemas.asset_id import AssetId
 from app.schemas.env_vars import EnvironmentVar, EnvironmentVarDef
 from app.schemas.experiment_template import (
@@ -29,7 +32,7 @@ from app.schemas.experiment_template import (
     TaskType,
 )
 from app.schemas.states import TemplateState
-from app.services.aiod import get_dataset_name, get_model_name
+from app.services.aiod import get_dataset_names, get_model_names
 
 
 class ExperimentTemplate(Document):
@@ -46,7 +49,10 @@ class ExperimentTemplate(Document):
     retry_count: int = 0
     state: TemplateState = TemplateState.CREATED
     image_version: int = 0
-    image_digest: str | None = None  # not used
+    # Digest of the image in the registry, as of the last check of the image
+    image_digest: str | None = None
+    # Hash of the environment the image is built from, see `compute_environment_hash`
+    environment_hash: str | None = None
     is_public: bool = True
     is_archived: bool = False
     is_approved: bool = False
@@ -68,6 +74,14 @@ class ExperimentTemplate(Document):
     def experiment_template_path(self) -> Path:
         return settings.get_experiment_template_path(template_id=self.id)
 
+    @property
+    def build_logs_path(self) -> Path:
+        return self.experiment_template_path / BUILD_LOGS_FILENAME
+
+    def read_build_logs(self, offset: int = 0, limit: int | None = None) -> tuple[bytes, int]:
+        """Read a part of the logs of the last image build, see `ExperimentRun.read_logs`"""
+        return read_file_part(self.build_logs_path, offset, limit)
+
     @property
     def base_image(self) -> str:
         if self.dockerfile == "":
@@ -100,9 +114,28 @@ class ExperimentTemplate(Document):
             return path.read_text()
         return ""
 
+    def compute_environment_hash(self) -> str:
+        """Hash of the Dockerfile and pip requirements the image of the template is built from.
+        Requirements are compared regardless of their order, blank lines and comments.
+        """
+        requirements = sorted(
+            {
+                line.strip()
+                for line in self.pip_requirements.splitlines()
+                if line.strip() and not line.strip().startswith("#")
+            }
+        )
+        environment = "\n".join([self.dockerfile.strip(), "", *requirements])
+        return hashlib.sha256(environment.encode("utf-8")).hexdigest()
+
     @property
     def image_name(self) -> str:
-        image_tag = f"{EXPERIMENT_TEMPLATE_DIR_PREFIX}{self.id}-{self.image_version}"
+        """Image of the template, shared by all templates with the same environment"""
+        environment_hash = self.environment_hash
+        if environment_hash is None:
+            # the template hasn't been migrated to shared images yet
+            environment_hash = self.compute_environment_hash()
+        image_tag = f"{ENVIRONMENT_IMAGE_TAG_PREFIX}{environment_hash}"
         return f"{settings.DOCKER_REGISTRY_URL}/{REPOSITORY_NAME}:{image_tag}"
 
     @property
@@ -139,12 +172,35 @@ class ExperimentTemplate(Document):
         base_path.joinpath("Dockerfile").write_text(dockerfile)
         base_path.joinpath("requirements.txt").write_text(pip_requirements)
         base_path.joinpath("script.py").write_text(script)
+        self.environment_hash = self.compute_environment_hash()
 
-        reana_cfg = yaml.safe_load(open("app/data/template-reana.yaml"))
-        reana_cfg["workflow"]["specification"]["steps"][0]["environment"] = self.image_name
+        with open("app/data/template-reana.yaml") as fp:
+            reana_cfg = yaml.safe_load(fp)
         reana_cfg["outputs"]["directories"][0] = RUN_TEMP_OUTPUT_FOLDER
+        self._write_reana_spec(reana_cfg)
+
+    def migrate_to_shared_image(self) -> bool:
+        """Hash the environment of a template created before images were shared and point its
+        REANA specification to the shared image. Returns whether the specification has changed.
+        """
+        self.environment_hash = self.compute_environment_hash()
+        return self.update_reana_spec()
+
+    def update_reana_spec(self) -> bool:
+        """Point the REANA specification of the template to its current image.
+        Returns whether it has been changed.
+        """
+        with self.experiment_template_path.joinpath("reana.yaml").open() as fp:
+            reana_cfg = yaml.safe_load(fp)
+        if reana_cfg["workflow"]["specification"]["steps"][0]["environment"] == self.image_name:
+            return False
 
-        with base_path.joinpath("reana.yaml").open("w") as fp:
+        self._write_reana_spec(reana_cfg)
+        return True
+
+    def _write_reana_spec(self, reana_cfg: dict) -> None:
+        reana_cfg["workflow"]["specification"]["steps"][0]["environment"] = self.image_name
+        with self.experiment_template_path.joinpath("reana.yaml").open("w") as fp:
             yaml.safe_dump(reana_cfg, fp)
 
     def map_to_response(self, user: dict | None = None) -> ExperimentTemplateResponse:
@@ -201,8 +257,12 @@ class ExperimentTemplate(Document):
             }
         )
 
+    async def update_image_digest_in_db(self, image_digest: str) -> None:
+        self.image_digest = image_digest
+        await self.set({ExperimentTemplate.image_digest: self.image_digest})
+
     async def validate_models(self, model_ids: list[AssetId]) -> bool:
-        model_names = [await get_model_name(x) for x in model_ids]
+        model_names = await get_model_names(model_ids)
 
         checks = [
             all(model_name is not None for model_name in model_names),
@@ -212,7 +272,7 @@ class ExperimentTemplate(Document):
         return all(checks)
 
     async def validate_datasets(self, dataset_ids: list[AssetId]) -> bool:
-        dataset_names = [await get_dataset_name(x) for x in dataset_ids]
+        dataset_names = await get_dataset_names(dataset_ids)
 
         checks = [
             all(dataset_name is not None for dataset_name in dataset_names),
@@ -0,0 +1,49 @@
+from datetime import datetime, timezone
+from enum import Enum
+from functools import partial
+
+import pymongo
+from beanie import Document, PydanticObjectId
+from pydantic import Field
+from pymongo import IndexModel
+
+
+class JobKind(str, Enum):
+    EXPERIMENT_RUN = "EXPERIMENT_RUN"
+    IMAGE_BUILD = "IMAGE_BUILD"
+
+
+class ScheduledJob(Document):
+    """Entry of a persistent job queue shared by all backend replicas.
+
+    A job is owned by a single worker as long as its lease has not expired,
+    jobs with an expired lease are claimed again by other workers.
+    """
+
+    kind: JobKind
+    target_id: PydanticObjectId
+    # User on whose behalf the job is executed
+    owner: str | None = None
+    enqueued_at: datetime = Field(default_factory=partial(datetime.now, tz=timezone.utc))
+    lease_owner: str | None = None
+    lease_id: str | None = None
+    lease_expires_at: datetime | None = None
+    # Job is to be processed once more after its current execution
+    requeued: bool = False
+    attempts: int = 0
+
+    class Settings:
+        name = "scheduledJobs"
+        indexes = [
+            IndexModel(
+                [("kind", pymongo.ASCENDING), ("target_id", pymongo.ASCENDING)],
+                unique=True,
+            ),
+            IndexModel(
+                [
+                    ("kind", pymongo.ASCENDING),
+                    ("lease_expires_at", pymongo.ASCENDING),
+                    ("enqueued_at", pymongo.ASCENDING),
+                ]
+            ),
+        ]
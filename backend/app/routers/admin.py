@@ -7,6 +7,8 @@ from starlette import status
 
 from app.auth import is_admin
 from app.models.experiment_template import ExperimentTemplate
+from app.services.aiod import aiod_response_cache, asset_upstream_latency
+from app.services.asset_caches.base import AssetCacheBase
 from app.services.experiment_scheduler import ExperimentScheduler
 
 router = APIRouter(dependencies=[Depends(is_admin)])
@@ -37,3 +39,28 @@ async def approve_experiment_template(
 
     if approve:
         await exp_scheduler.add_image_to_build(experiment_template.id)
+
+
+@router.get("/metrics/assets", response_model=dict)
+async def get_asset_metrics(
+    asset_cache: AssetCacheBase | None = Depends(AssetCacheBase.get_service),
+) -> Any:
+    return {
+        "cache": asset_cache.stats() if asset_cache is not None else None,
+        "upstream_latency": asset_upstream_latency.stats(),
+        "responses": aiod_response_cache.stats(),
+    }
+
+
+@router.get("/metrics/scheduler", response_model=dict)
+async def get_scheduler_metrics(
+    exp_scheduler: ExperimentScheduler = Depends(ExperimentScheduler.get_service),
+) -> Any:
+    return await exp_scheduler.get_metrics()
+
+
+@router.get("/scheduler/runs", response_model=dict)
+async def get_run_schedule(
+    exp_scheduler: ExperimentScheduler = Depends(ExperimentScheduler.get_service),
+) -> Any:
+    return await exp_scheduler.get_run_schedule()
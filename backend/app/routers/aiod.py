@@ -7,13 +7,13 @@ from app.auth import get_current_user_or_raise, get_current_user_token
 from app.helpers import Pagination
 from app.schemas.asset_id import AssetIdPathArg
 from app.schemas.dataset import Dataset
+from app.schemas.enhanced_search import EnhancedSearchJobResponse
 from app.schemas.ml_model import MLModel
 from app.schemas.platform import Platform
 from app.schemas.publication import Publication
 from app.services.aiod import (
     AssetType,
     aiod_client_wrapper,
-    enhanced_search,
     get_asset,
     get_assets,
     get_assets_count,
@@ -21,6 +21,13 @@ from app.services.aiod import (
     get_my_assets,
     search_assets,
 )
+from app.services.asset_caches.base import AssetCacheBase
+from app.services.asset_mirror import AssetMirror
+from app.services.enhanced_search import (
+    enhanced_search,
+    get_enhanced_search_job,
+    submit_enhanced_search,
+)
 
 router = APIRouter()
 
@@ -72,6 +79,31 @@ async def search_datasets(
         )
 
 
+@router.post(
+    "/datasets/search/enhanced",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=EnhancedSearchJobResponse,
+)
+async def submit_enhanced_datasets_search(query: str, pagination: Pagination = Depends()) -> Any:
+    job = submit_enhanced_search(
+        asset_type=AssetType.DATASETS,
+        query=query,
+        pagination=pagination,
+    )
+    return job.map_to_response(pagination)
+
+
+@router.get("/datasets/search/enhanced/jobs/{id}", response_model=EnhancedSearchJobResponse)
+async def get_enhanced_datasets_search_job(id: str, pagination: Pagination = Depends()) -> Any:
+    job = get_enhanced_search_job(id)
+    if job is None or job.asset_type != AssetType.DATASETS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Such enhanced search job doesn't exist or has expired",
+        )
+    return job.map_to_response(pagination)
+
+
 @router.get("/datasets/{id}", response_model=Dataset)
 async def get_dataset(id: AssetIdPathArg) -> Any:
     return await get_asset(asset_type=AssetType.DATASETS, asset_id=id)
@@ -139,11 +171,20 @@ async def create_dataset(
 
 
 @router.delete("/datasets/{id}", response_model=bool)
-async def delete_dataset(id: AssetIdPathArg, token: str = Depends(get_current_user_token)) -> Any:
+async def delete_dataset(
+    id: AssetIdPathArg,
+    token: str = Depends(get_current_user_token),
+    asset_cache: AssetCacheBase | None = Depends(AssetCacheBase.get_service),
+    asset_mirror: AssetMirror | None = Depends(AssetMirror.get_service),
+) -> Any:
     res = await aiod_client_wrapper.client.delete(
         Path("datasets", id),
         headers={"Authorization": f"{token}"},
     )
+    if asset_cache is not None:
+        await asset_cache.invalidate(AssetType.DATASETS.value, id)
+    if asset_mirror is not None:
+        await asset_mirror.delete(AssetType.DATASETS.value, id)
 
     if res.status_code != 200:
         print("ERROR", res.json())
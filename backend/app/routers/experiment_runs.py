@@ -1,30 +1,42 @@
+import asyncio
+import gzip
 from datetime import datetime
 from pathlib import Path
 from typing import Any
 
 from beanie import PydanticObjectId
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import FileResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 
 from app.auth import get_current_user_if_exists, get_current_user_or_raise
-from app.config import TEMP_DIRNAME
-from app.helpers import FileDetail
+from app.config import RUN_OUTPUT_FOLDER, settings
+from app.helpers import FileDetail, FileStream, iter_file_chunks, parse_byte_range
 from app.models.experiment_run import ExperimentRun
 from app.schemas.experiment_run import ExperimentRunDetails
 from app.schemas.states import RunState
+from app.services.log_stream import stream_logs
+from app.services.output_archive import ArchiveFormat, stream_archive
+from app.services.run_output_cache import RunOutputCache
 from app.services.workflow_engines.base import WorkflowEngineBase
 from app.services.workflow_engines.reana import ReanaService
 
+LOCAL_CHUNK_SIZE = 1024**2  # 1MB
+MAX_LOGS_TAIL = 1024**2  # 1MB
+# Smaller logs are not worth compressing
+GZIP_MIN_SIZE = 1024
+
 router = APIRouter()
 
 
 @router.get("/experiment-runs/{id}", response_model=ExperimentRunDetails | None)
 async def get_experiment_run(
     id: PydanticObjectId,
+    logs_tail: int = Query(default=0, ge=0, le=MAX_LOGS_TAIL),
     user: dict | None = Depends(get_current_user_if_exists),
 ) -> Any:
     experiment_run = await get_experiment_run_if_accessible_or_raise(id, user)
-    return experiment_run.map_to_response(user, return_detailed_response=True)
+    return experiment_run.map_to_response(user, return_detailed_response=True, logs_tail=logs_tail)
 
 
 @router.get("/experiment-runs/{id}/stop", response_model=None)
@@ -68,53 +80,176 @@ async def delete_experiment_run(
 @router.get("/experiment-runs/{id}/logs", response_class=PlainTextResponse)
 async def get_experiment_run_logs(
     id: PydanticObjectId,
+    offset: int = 0,
+    limit: int | None = Query(default=None, gt=0),
+    accept_encoding: str = Header(default=""),
+    user: dict | None = Depends(get_current_user_if_exists),
+) -> Any:
+    """Logs of the run, or `limit` bytes of them starting at the byte `offset`.
+    A negative offset counts from the end of the logs.
+    """
+    experiment_run = await get_experiment_run_if_accessible_or_raise(id, user)
+    logs, logs_size = await asyncio.to_thread(experiment_run.read_logs, offset, limit)
+
+    headers = {"X-Logs-Size": str(logs_size), "Vary": "Accept-Encoding"}
+    if "gzip" in accept_encoding and len(logs) >= GZIP_MIN_SIZE:
+        logs = await asyncio.to_thread(gzip.compress, logs, compresslevel=6)
+        headers["Content-Encoding"] = "gzip"
+    return PlainTextResponse(logs, headers=headers)
+
+
+@router.get("/experiment-runs/{id}/logs/stream", response_class=StreamingResponse)
+async def stream_experiment_run_logs(
+    id: PydanticObjectId,
+    offset: int = Query(default=0, ge=0),
+    last_event_id: str | None = Header(default=None),
+    workflow_engine: WorkflowEngineBase = Depends(ReanaService.get_service),
     user: dict | None = Depends(get_current_user_if_exists),
-) -> str:
+) -> Any:
+    """Server-sent events with logs of the run, starting at the byte `offset`.
+    Reconnecting clients resume from the offset sent in Last-Event-ID.
+    """
     experiment_run = await get_experiment_run_if_accessible_or_raise(id, user)
-    return experiment_run.logs
+    if last_event_id is not None and last_event_id.isdigit():
+        offset = int(last_event_id)
+
+    return StreamingResponse(
+        stream_logs(experiment_run.id, workflow_engine, offset, settings.LOGS_STREAM_INTERVAL),
+        media_type="text/event-stream",
+        # responses must not be buffered by proxies, e.g. nginx
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/experiment-runs/{id}/files/download", response_class=StreamingResponse)
 async def download_file_from_experiment_run(
     id: PydanticObjectId,
     filepath: str,
+    range: str | None = Header(default=None),
     workflow_engine: WorkflowEngineBase = Depends(ReanaService.get_service),
+    run_output_cache: RunOutputCache | None = Depends(RunOutputCache.get_service),
     user: dict | None = Depends(get_current_user_if_exists),
-) -> bytes:
+) -> Any:
     experiment_run = await get_experiment_run_if_accessible_or_raise(id, user)
 
-    # TODO use temporaryFile/Directory package for this?
-    tempdir = Path(TEMP_DIRNAME)
-    tempdir.mkdir(parents=True, exist_ok=True)
+    if run_output_cache is not None:
+        local_path = run_output_cache.get_file(experiment_run, filepath)
+        if local_path is not None:
+            return local_file_response(local_path, byte_range=range)
 
-    savepath = await workflow_engine.download_file(experiment_run, filepath, savedir=tempdir)
-    if savepath is None:
+    file_stream = await workflow_engine.stream_file(experiment_run, filepath, byte_range=range)
+    if file_stream is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Requested file doesn't exist.",
         )
 
-    def iterfile():
-        with open(savepath, "rb") as f:
-            CHUNK_SIZE = 1024**2  # 1MB
-            while chunk := f.read(CHUNK_SIZE):
-                yield chunk
-        savepath.unlink()
+    headers = {
+        **file_stream.headers,
+        "Content-Disposition": f'attachment; filename="{file_stream.filename}"',
+    }
+    return StreamingResponse(
+        file_stream.chunks,
+        status_code=file_stream.status_code,
+        headers=headers,
+        media_type="application/octet-stream",
+        # the file is closed even if the client disconnects during the download
+        background=BackgroundTask(file_stream.close),
+    )
+
 
-    headers = {"Content-Disposition": f'attachment; filename="{savepath.name}"'}
-    return StreamingResponse(iterfile(), headers=headers, media_type="application/octet-stream")
+@router.get("/experiment-runs/{id}/files/archive", response_class=StreamingResponse)
+async def download_archive_from_experiment_run(
+    id: PydanticObjectId,
+    prefix: str = f"{RUN_OUTPUT_FOLDER}/",
+    archive_format: ArchiveFormat = Query(default=ArchiveFormat.ZIP, alias="format"),
+    workflow_engine: WorkflowEngineBase = Depends(ReanaService.get_service),
+    run_output_cache: RunOutputCache | None = Depends(RunOutputCache.get_service),
+    user: dict | None = Depends(get_current_user_if_exists),
+) -> Any:
+    experiment_run = await get_experiment_run_if_accessible_or_raise(id, user)
+
+    files = None
+    if run_output_cache is not None and prefix.startswith(f"{RUN_OUTPUT_FOLDER}/"):
+        files = run_output_cache.list_files(experiment_run)
+    if files is None:
+        files = await workflow_engine.list_files(experiment_run)
+
+    files = [
+        file
+        for file in files
+        if file.filepath.startswith(prefix) and not file.filepath.endswith("/")
+    ]
+    if len(files) == 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="There are no files to download.",
+        )
+
+    async def open_file(filepath: str) -> FileStream | None:
+        if run_output_cache is not None:
+            file_stream = await run_output_cache.open_file(experiment_run, filepath)
+            if file_stream is not None:
+                return file_stream
+        return await workflow_engine.stream_file(experiment_run, filepath)
+
+    filename = f"run-{id}.{archive_format.value}"
+    return StreamingResponse(
+        stream_archive(files, open_file, archive_format),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        media_type=archive_format.media_type,
+    )
 
 
 @router.get("/experiment-runs/{id}/files/list", response_model=list[FileDetail])
 async def list_files_of_experiment_run(
     id: PydanticObjectId,
     workflow_engine: WorkflowEngineBase = Depends(ReanaService.get_service),
+    run_output_cache: RunOutputCache | None = Depends(RunOutputCache.get_service),
     user: dict | None = Depends(get_current_user_if_exists),
 ) -> list[FileDetail]:
     experiment_run = await get_experiment_run_if_accessible_or_raise(id, user)
+
+    if run_output_cache is not None:
+        files = run_output_cache.list_files(experiment_run)
+        if files is not None:
+            return files
+
     return await workflow_engine.list_files(experiment_run)
 
 
+def local_file_response(path: Path, byte_range: str | None = None) -> Response:
+    """Serve a local file, or the single byte range of it requested by the Range header"""
+    headers = {"Accept-Ranges": "bytes"}
+    if byte_range is None:
+        return FileResponse(
+            path, filename=path.name, headers=headers, media_type="application/octet-stream"
+        )
+
+    file_size = path.stat().st_size
+    requested_range = parse_byte_range(byte_range, file_size)
+    if requested_range is None:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={"Content-Range": f"bytes */{file_size}"},
+        )
+
+    start, end = requested_range
+    headers.update(
+        {
+            "Content-Range": f"bytes {start}-{end}/{file_size}",
+            "Content-Length": str(end - start + 1),
+            "Content-Disposition": f'attachment; filename="{path.name}"',
+        }
+    )
+    return StreamingResponse(
+        iter_file_chunks(path, start, end, chunk_size=LOCAL_CHUNK_SIZE),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        headers=headers,
+        media_type="application/octet-stream",
+    )
+
+
 async def get_experiment_run_if_accessible_or_raise(
     run_id: PydanticObjectId, user: dict | None, write_access: bool = False
 ) -> ExperimentRun:
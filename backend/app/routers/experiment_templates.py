@@ -1,10 +1,12 @@
+import asyncio
 import shutil
 from datetime import datetime, timezone
 from typing import Any
 
 from beanie import PydanticObjectId, operators
 from beanie.odm.queries.find import FindMany
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 
 from app.auth import get_current_user_if_exists, get_current_user_or_raise, raise_requires_auth
@@ -58,6 +60,21 @@ async def get_experiment_template(
     return experiment_template.map_to_response(user)
 
 
+@router.get("/experiment-templates/{id}/build-logs", response_class=PlainTextResponse)
+async def get_experiment_template_build_logs(
+    id: PydanticObjectId,
+    offset: int = 0,
+    limit: int | None = Query(default=None, gt=0),
+    user: dict | None = Depends(get_current_user_if_exists),
+) -> Any:
+    """Logs of the last build of the image of the template, or `limit` bytes of them
+    starting at the byte `offset`. The logs grow while the image is being built.
+    """
+    experiment_template = await get_experiment_template_if_accessible_or_raise(id, user)
+    logs, logs_size = await asyncio.to_thread(experiment_template.read_build_logs, offset, limit)
+    return PlainTextResponse(logs, headers={"X-Logs-Size": str(logs_size)})
+
+
 @router.get("/count/experiment-templates", response_model=int)
 async def get_experiment_templates_count(
     user: dict | None = Depends(get_current_user_if_exists),
@@ -97,6 +114,9 @@ async def create_experiment_template(
         pip_requirements=experiment_template.pip_requirements,
         script=experiment_template.script,
     )
+    await created_experiment_template.set(
+        {ExperimentTemplate.environment_hash: created_experiment_template.environment_hash}
+    )
     return created_experiment_template.map_to_response(user)
 
 
@@ -152,7 +152,7 @@ async def execute_experiment_run(
     )
     experiment_run = await experiment_run.create()
 
-    await exp_scheduler.add_run_to_execute(experiment_run.id)
+    await exp_scheduler.add_run_to_execute(experiment_run.id, owner=experiment_run.created_by)
     return experiment_run.map_to_response(user)
 
 
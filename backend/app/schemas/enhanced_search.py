@@ -0,0 +1,15 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+from app.schemas.dataset import Dataset
+from app.schemas.states import SearchJobState
+
+
+class EnhancedSearchJobResponse(BaseModel):
+    id: str
+    query: str
+    state: SearchJobState
+    created_at: datetime
+    error_message: str = ""
+    results: list[Dataset] | None = None
@@ -24,7 +24,8 @@ class ExperimentRunResponse(ExperimentRunBase):
 
 
 class ExperimentRunDetails(ExperimentRunBase):
-    logs: str
+    # Only the tail of logs if requested, whole logs are retrieved from a separate endpoint
+    logs: str | None = None
 
 
 class ExperimentRunId(BaseModel):
@@ -39,3 +40,10 @@ class ExperimentRunId(BaseModel):
 
     class Settings:
         projection = {"id": "$_id"}
+
+
+class ExperimentRunIdWithOwner(ExperimentRunId):
+    created_by: str
+
+    class Settings:
+        projection = {"id": "$_id", "created_by": 1}
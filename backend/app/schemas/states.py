@@ -15,3 +15,9 @@ class RunState(str, Enum):
     POSTPROCESSING = "POSTPROCESSING"
     FINISHED = "FINISHED"
     CRASHED = "CRASHED"
+
+
+class SearchJobState(str, Enum):
+    IN_PROGRESS = "IN_PROGRESS"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
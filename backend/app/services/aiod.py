@@ -1,5 +1,7 @@
 import asyncio
+import logging
 from enum import Enum
+from functools import partial
 from pathlib import Path
 from typing import List
 
@@ -9,10 +11,19 @@ from pydantic import Json
 
 from app.auth import get_current_user_or_raise
 from app.config import settings
-from app.helpers import Pagination
+from app.helpers import (
+    DurationStats,
+    Pagination,
+    SingleFlight,
+    StaleWhileRevalidateCache,
+)
 from app.schemas.asset_id import AssetId
 from app.schemas.dataset import Dataset
 from app.schemas.ml_model import MLModel
+from app.services.asset_caches.base import AssetCacheBase
+from app.services.asset_mirror import AssetMirror
+
+logger = logging.getLogger("uvicorn")
 
 
 class AssetType(Enum):
@@ -48,9 +59,27 @@ aiod_enhanced_search_client_wrapper = AsyncClientWrapper(
     base_url=settings.AIOD_ENHANCED_SEARCH_API.BASE_URL
 )
 
+asset_fetches = SingleFlight()
+asset_upstream_latency = DurationStats()
+aiod_response_cache = StaleWhileRevalidateCache(
+    maxsize=settings.AIOD_RESPONSE_CACHE.SIZE,
+    max_stale=settings.AIOD_RESPONSE_CACHE.MAX_STALE,
+)
+
 
 async def get_assets(asset_type: AssetType, pagination: Pagination) -> list:
-    """Wrapper function to call the AIoD API and return a list of requested assets."""
+    """Wrapper function to call the AIoD API and return a list of requested assets.
+
+    Responses are cached in `aiod_response_cache`.
+    """
+    return await aiod_response_cache.get_or_fetch(
+        ("list", asset_type, None, pagination.offset, pagination.limit),
+        partial(_get_assets, asset_type, pagination),
+        ttl=settings.AIOD_RESPONSE_CACHE.LIST_TTL,
+    )
+
+
+async def _get_assets(asset_type: AssetType, pagination: Pagination) -> list:
     res = await aiod_client_wrapper.client.get(
         Path(asset_type.value).as_posix(),
         params={"offset": pagination.offset, "limit": pagination.limit},
@@ -68,9 +97,10 @@ async def get_assets(asset_type: AssetType, pagination: Pagination) -> list:
 async def get_my_assets(asset_type: AssetType, token: str, pagination: Pagination) -> List[Json]:
     """Wrapper function to fetch my assets from AIoD's My Library."""
     my_asset_ids = await get_my_asset_ids(asset_type, token, pagination)
-    my_assets = [
-        await get_asset(asset_type=asset_type, asset_id=asset_id) for asset_id in my_asset_ids
-    ]
+    my_assets, failures = await get_assets_by_ids(asset_type, my_asset_ids)
+
+    for asset_id, exception in failures.items():
+        logger.warning(f"Failed to get {asset_type.value} id={asset_id} from AIoD: {exception}")
     return my_assets
 
 
@@ -122,26 +152,106 @@ async def get_my_asset_ids(
 
 
 async def get_asset(asset_type: AssetType, asset_id: AssetId) -> Json:
-    """Wrapper function to call the AIoD API and return requested asset data."""
-    res = await aiod_client_wrapper.client.get(
-        Path(asset_type.value, asset_id).as_posix(),
+    """Wrapper function to call the AIoD API and return requested asset data.
+
+    Assets are served from the asset cache if there is one set up. Concurrent requests
+    for the same asset that is not cached are coalesced into a single AIoD API call.
+    """
+    asset_cache = AssetCacheBase.get_service()
+    if asset_cache is not None:
+        cached_asset = await asset_cache.get(asset_type.value, asset_id)
+        if cached_asset is not None and cached_asset.asset is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Failed to get {asset_type.value} from AIoD. {asset_id} not found.",
+            )
+        elif cached_asset is not None:
+            return cached_asset.asset
+
+    return await asset_fetches.do(
+        (asset_type, asset_id), partial(_fetch_asset, asset_type, asset_id)
     )
 
+
+async def _fetch_asset(asset_type: AssetType, asset_id: AssetId) -> Json:
+    asset_cache = AssetCacheBase.get_service()
+    asset_mirror = AssetMirror.get_service()
+
+    if asset_mirror is not None:
+        asset = await asset_mirror.get(asset_type.value, asset_id)
+        if asset is not None:
+            if asset_cache is not None:
+                await asset_cache.set(asset_type.value, asset_id, asset)
+            return asset
+
+    with asset_upstream_latency.measure():
+        res = await aiod_client_wrapper.client.get(
+            Path(asset_type.value, asset_id).as_posix(),
+        )
+
+    if asset_cache is not None and res.status_code in (200, 404):
+        asset = res.json() if res.status_code == 200 else None
+        await asset_cache.set(asset_type.value, asset_id, asset)
+
     if res.status_code != 200:
         raise HTTPException(
             status_code=res.status_code,
             detail=f"Failed to get {asset_type.value} from AIoD. {res.json()}",
         )
 
+    if asset_mirror is not None:
+        await asset_mirror.upsert(asset_type.value, res.json())
     return res.json()
 
 
+async def get_assets_by_ids(
+    asset_type: AssetType,
+    asset_ids: list[AssetId],
+    max_concurrency: int = settings.AIOD_MAX_CONCURRENT_REQUESTS,
+) -> tuple[list[Json], dict[AssetId, Exception]]:
+    """Fetch multiple assets from AIoD API concurrently, at most `max_concurrency` at a time.
+
+    Returns the successfully fetched assets, kept in the order of `asset_ids`,
+    and the exceptions of individual assets that could not be fetched.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch_asset(asset_id: AssetId) -> Json:
+        async with semaphore:
+            return await get_asset(asset_type=asset_type, asset_id=asset_id)
+
+    results = await asyncio.gather(
+        *[fetch_asset(asset_id) for asset_id in asset_ids], return_exceptions=True
+    )
+
+    assets, failures = [], {}
+    for asset_id, result in zip(asset_ids, results):
+        if isinstance(result, Exception):
+            failures[asset_id] = result
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            assets.append(result)
+
+    return assets, failures
+
+
 async def get_assets_count(asset_type: AssetType, filter_query: str | None = None) -> int:
     """Wrapper function to call the AIoD API and return the total counts of requested assets.
 
     Note: The current AIoD API 'counts' endpoint does not support filtering of assets to count.
     Therefore, the desired logic is achieved by calling the 'search' endpoint in that case.
+
+    Responses are cached in `aiod_response_cache`.
     """
+    return await aiod_response_cache.get_or_fetch(
+        ("count", asset_type, filter_query, None, None),
+        partial(_get_assets_count, asset_type, filter_query),
+        ttl=settings.AIOD_RESPONSE_CACHE.COUNT_TTL,
+    )
+
+
+async def _get_assets_count(asset_type: AssetType, filter_query: str | None) -> int:
     if filter_query is None:
         res = await aiod_client_wrapper.client.get(
             Path(f"counts/{asset_type.value}").as_posix(),
@@ -170,7 +280,18 @@ async def get_assets_count(asset_type: AssetType, filter_query: str | None = Non
 
 
 async def search_assets(asset_type: AssetType, query: str, pagination: Pagination) -> list:
-    """Wrapper function to call the AIoD API and return a list of requested assets."""
+    """Wrapper function to call the AIoD API and return a list of requested assets.
+
+    Responses are cached in `aiod_response_cache`.
+    """
+    return await aiod_response_cache.get_or_fetch(
+        ("search", asset_type, query, pagination.offset, pagination.limit),
+        partial(_search_assets, asset_type, query, pagination),
+        ttl=settings.AIOD_RESPONSE_CACHE.SEARCH_TTL,
+    )
+
+
+async def _search_assets(asset_type: AssetType, query: str, pagination: Pagination) -> list:
     res = await aiod_client_wrapper.client.get(
         Path(f"search/{asset_type.value}").as_posix(),
         params={
@@ -190,49 +311,6 @@ async def search_assets(asset_type: AssetType, query: str, pagination: Paginatio
     return res.json()["resources"]
 
 
-async def enhanced_search(asset_type: AssetType, query: str, pagination: Pagination) -> list:
-    topk = min(pagination.offset + pagination.limit, 100)
-    initial_response = await aiod_enhanced_search_client_wrapper.client.post(
-        "query",
-        params={"search_query": query, "asset_type": asset_type.value, "topk": topk},
-    )
-
-    if initial_response.status_code != 202:
-        raise HTTPException(
-            status_code=initial_response.status_code, detail="Failed to initiate query"
-        )
-
-    # Extract the location header to poll for results
-    result_location = initial_response.headers.get("location")
-    if not result_location:
-        raise HTTPException(
-            status_code=500, detail="Missing Location header in external API response"
-        )
-
-    # Poll the result endpoint until we get the result
-    max_retries = 5 + round(topk * 0.15)
-    delay = 2
-    for _ in range(max_retries):
-        result_response: httpx.Response = await aiod_enhanced_search_client_wrapper.client.get(
-            result_location,
-            params={"return_entire_assets": True},
-            follow_redirects=True,
-        )
-        if result_response.status_code == 200 and result_response.json()["status"] == "Completed":
-            results = result_response.json()["results"][-pagination.limit :]
-            assets = [result["asset"] for result in results]
-            return assets
-
-        elif result_response.status_code == 200:
-            await asyncio.sleep(delay)
-        else:
-            raise HTTPException(
-                status_code=result_response.status_code, detail="Error fetching results"
-            )
-
-    raise HTTPException(status_code=504, detail="Timed out waiting for result from external API")
-
-
 async def get_dataset_name(id: AssetId) -> str:
     """Helper function to fetch requested Dataset and return its name"""
     dataset = Dataset(**await get_asset(asset_type=AssetType.DATASETS, asset_id=id))
@@ -243,3 +321,56 @@ async def get_model_name(id: AssetId) -> str:
     """Helper function to fetch requested MLModel and return its name"""
     ml_model = MLModel(**await get_asset(asset_type=AssetType.ML_MODELS, asset_id=id))
     return ml_model.name
+
+
+async def get_dataset_names(ids: list[AssetId]) -> list[str]:
+    """Helper function to fetch requested Datasets concurrently and return their names"""
+    datasets = await _get_all_assets_or_raise(AssetType.DATASETS, ids)
+    return [Dataset(**dataset).name for dataset in datasets]
+
+
+async def get_model_names(ids: list[AssetId]) -> list[str]:
+    """Helper function to fetch requested MLModels concurrently and return their names"""
+    ml_models = await _get_all_assets_or_raise(AssetType.ML_MODELS, ids)
+    return [MLModel(**ml_model).name for ml_model in ml_models]
+
+
+async def _get_all_assets_or_raise(asset_type: AssetType, ids: list[AssetId]) -> list[Json]:
+    assets, failures = await get_assets_by_ids(asset_type, ids)
+    if len(failures) > 0:
+        raise next(iter(failures.values()))
+    return assets
+
+
+async def sync_asset_mirror(asset_mirror: AssetMirror, asset_types: list[AssetType]) -> int:
+    """Page through AIoD assets and update the mirrored ones that have been modified.
+
+    Returns the number of updated documents.
+    """
+    page_size = settings.AIOD_ASSET_MIRROR.SYNC_PAGE_SIZE
+    updated_count = 0
+
+    for asset_type in asset_types:
+        offset = 0
+        while True:
+            page = await _get_assets(asset_type, Pagination(offset=offset, limit=page_size))
+            updated_count += await asset_mirror.upsert_many(
+                asset_type.value, page, insert_new=settings.AIOD_ASSET_MIRROR.SYNC_NEW_ASSETS
+            )
+            if len(page) < page_size:
+                break
+            offset += page_size
+
+    return updated_count
+
+
+async def schedule_asset_mirror_sync(asset_mirror: AssetMirror) -> None:
+    asset_types = [AssetType.DATASETS, AssetType.ML_MODELS, AssetType.PUBLICATIONS]
+    while True:
+        try:
+            updated_count = await sync_asset_mirror(asset_mirror, asset_types)
+            logger.info(f"AIoD asset mirror has been synchronized ({updated_count} updated)")
+        except Exception as e:
+            logger.error("There was an error when synchronizing AIoD asset mirror", exc_info=e)
+
+        await asyncio.sleep(settings.AIOD_ASSET_MIRROR.SYNC_INTERVAL)
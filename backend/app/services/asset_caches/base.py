@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+
+from pydantic import BaseModel
+
+
+class CachedAsset(BaseModel):
+    # None represents an asset that doesn't exist in AIoD (negative caching)
+    asset: dict | None = None
+
+
+class AssetCacheBase(ABC):
+    SERVICE: AssetCacheBase | None = None
+
+    @abstractmethod
+    async def get(self, asset_type: str, asset_id: str) -> CachedAsset | None:
+        pass
+
+    @abstractmethod
+    async def set(self, asset_type: str, asset_id: str, asset: dict | None) -> None:
+        pass
+
+    @abstractmethod
+    async def invalidate(self, asset_type: str, asset_id: str) -> None:
+        pass
+
+    @abstractmethod
+    def stats(self) -> dict[str, float]:
+        pass
+
+    @staticmethod
+    @abstractmethod
+    async def init() -> AssetCacheBase:
+        pass
+
+    @staticmethod
+    def set_service(service: AssetCacheBase | None) -> None:
+        AssetCacheBase.SERVICE = service
+
+    @staticmethod
+    def get_service() -> AssetCacheBase | None:
+        return AssetCacheBase.SERVICE
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from app.config import settings
+from app.helpers import TTLCache
+from app.services.asset_caches.base import AssetCacheBase, CachedAsset
+
+
+class InMemoryAssetCache(AssetCacheBase):
+    def __init__(self, maxsize: int, ttl: float, negative_ttl: float) -> None:
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.negative_ttl = negative_ttl
+
+    async def get(self, asset_type: str, asset_id: str) -> CachedAsset | None:
+        return self.cache.get((asset_type, asset_id))
+
+    async def set(self, asset_type: str, asset_id: str, asset: dict | None) -> None:
+        ttl = None if asset is not None else self.negative_ttl
+        self.cache.set((asset_type, asset_id), CachedAsset(asset=asset), ttl=ttl)
+
+    async def invalidate(self, asset_type: str, asset_id: str) -> None:
+        self.cache.pop((asset_type, asset_id))
+
+    def stats(self) -> dict[str, float]:
+        return self.cache.stats()
+
+    @staticmethod
+    async def init() -> InMemoryAssetCache:
+        service = InMemoryAssetCache(
+            maxsize=settings.ASSET_CACHE_SIZE,
+            ttl=settings.ASSET_CACHE_TTL,
+            negative_ttl=settings.ASSET_CACHE_NEGATIVE_TTL,
+        )
+        AssetCacheBase.set_service(service)
+        return service
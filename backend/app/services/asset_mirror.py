@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+
+from app.models.aiod_asset import AIoDAsset
+
+
+class AssetMirror:
+    """Persistent local mirror of AIoD asset metadata stored in MongoDB.
+
+    Assets are added to the mirror once they're fetched from AIoD and are kept
+    up to date by a periodic synchronization (see `sync_asset_mirror`).
+    """
+
+    SERVICE: AssetMirror | None = None
+
+    def __init__(self) -> None:
+        self.logger = logging.getLogger("uvicorn")
+
+    async def get(self, asset_type: str, asset_id: str) -> dict | None:
+        asset = await AIoDAsset.find_one(
+            AIoDAsset.asset_type == asset_type, AIoDAsset.identifier == asset_id
+        )
+        return asset.data if asset is not None else None
+
+    async def upsert(self, asset_type: str, asset: dict) -> None:
+        await self.upsert_many(asset_type, [asset])
+
+    async def upsert_many(
+        self, asset_type: str, assets: list[dict], insert_new: bool = True
+    ) -> int:
+        """Store assets that are missing or whose `aiod_entry.date_modified` differs
+        from the mirrored version. Returns the number of written documents.
+
+        If `insert_new` is False, only assets that are already mirrored are updated.
+        """
+        identifiers = [asset["identifier"] for asset in assets if "identifier" in asset]
+        mirrored = {
+            doc["identifier"]: doc.get("date_modified")
+            for doc in await AIoDAsset.get_motor_collection()
+            .find(
+                {"asset_type": asset_type, "identifier": {"$in": identifiers}},
+                {"identifier": 1, "date_modified": 1},
+            )
+            .to_list(length=None)
+        }
+
+        synced_at = datetime.now(tz=timezone.utc)
+        updates = []
+        for asset in assets:
+            identifier = asset.get("identifier")
+            date_modified = AIoDAsset.get_date_modified(asset)
+            if identifier is None or (identifier not in mirrored and insert_new is False):
+                continue
+            if identifier in mirrored and mirrored[identifier] == date_modified:
+                continue
+
+            updates.append(
+                UpdateOne(
+                    {"asset_type": asset_type, "identifier": identifier},
+                    {
+                        "$set": {
+                            "date_modified": date_modified,
+                            "data": asset,
+                            "synced_at": synced_at,
+                        }
+                    },
+                    upsert=True,
+                )
+            )
+
+        if len(updates) > 0:
+            await AIoDAsset.get_motor_collection().bulk_write(updates, ordered=False)
+        return len(updates)
+
+    async def delete(self, asset_type: str, asset_id: str) -> None:
+        await AIoDAsset.find(
+            AIoDAsset.asset_type == asset_type, AIoDAsset.identifier == asset_id
+        ).delete()
+
+    @staticmethod
+    async def init() -> AssetMirror:
+        AssetMirror.SERVICE = AssetMirror()
+        return AssetMirror.SERVICE
+
+    @staticmethod
+    def get_service() -> AssetMirror | None:
+        return AssetMirror.SERVICE
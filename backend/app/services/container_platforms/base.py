@@ -24,6 +24,14 @@ class ContainerPlatformBase(ABC):
     async def terminate(self) -> bool:
         pass
 
+    def get_build_stats(self) -> dict:
+        """Durations and cache usage of image builds"""
+        return {}
+
+    async def prewarm_base_images(self) -> None:
+        """Prepare base images of templates ahead of their builds"""
+        pass
+
     @staticmethod
     @abstractmethod
     async def init() -> ContainerPlatformBase:
@@ -2,20 +2,69 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from threading import Event
+from typing import Iterator, TextIO
 
-from docker import DockerClient
-from docker.errors import APIError
+from docker import APIClient, DockerClient
+from docker.errors import APIError, ImageNotFound
 
-from app.config import settings
+from app.config import REPOSITORY_NAME, settings
+from app.helpers import DurationStats, TTLCache
 from app.models.experiment_template import ExperimentTemplate
 from app.services.container_platforms.base import ContainerPlatformBase
+from app.services.container_platforms.docker_image_cache import DockerImageCache
+
+IMAGE_CHECK_CACHE_SIZE = 1024
+# Cached result of a check of an image that is missing in the registry
+MISSING_IMAGE = ""
+
+
+class ImageBuildException(Exception):
+    pass
+
+
+class ImageBuild:
+    """State of a single attempt to build and push the image of a template"""
+
+    def __init__(self, experiment_template: ExperimentTemplate, pull: bool) -> None:
+        self.image_name = experiment_template.image_name
+        self.template_path = experiment_template.experiment_template_path
+        self.logs_path = experiment_template.build_logs_path
+        self.pull = pull
+        self.cancelled = Event()
+        self.build_lines: list[str] = []
+        self.build_duration = 0.0
+        self.push_duration = 0.0
 
 
 class DockerService(ContainerPlatformBase):
     def __init__(self) -> None:
         self.docker_client = DockerClient(base_url=settings.DOCKER_BASE_URL)
+        # Builds and pushes are given up on once the daemon stops reporting their progress,
+        # otherwise their threads would be blocked by reading the progress indefinitely
+        self.build_client = APIClient(
+            base_url=settings.DOCKER_BASE_URL, timeout=settings.IMAGE_BUILD_IDLE_TIMEOUT
+        )
         # self.logger = setup_logging("docker")
         self.logger = logging.getLogger("uvicorn")
+        self.image_cache = DockerImageCache(
+            self.docker_client,
+            repository=f"{settings.DOCKER_REGISTRY_URL}/{REPOSITORY_NAME}",
+            max_size=settings.DOCKER_IMAGE_CACHE.MAX_SIZE,
+        )
+        self.build_durations = DurationStats()
+        self.push_durations = DurationStats()
+        self.build_timeouts = 0
+        self.cached_builds = 0
+        # Last build of individual templates by their ids
+        self.builds: dict[str, dict] = {}
+        # Timed out builds whose threads may still be running by paths of their build logs
+        self.abandoned_builds: dict[str, asyncio.Future] = {}
+        # Digests of images in the registry by image names
+        self.image_checks = TTLCache(maxsize=IMAGE_CHECK_CACHE_SIZE, ttl=settings.IMAGE_CHECK_TTL)
 
     async def login_to_registry(self) -> bool:
         try:
@@ -37,49 +86,83 @@ class DockerService(ContainerPlatformBase):
         if self.docker_client:
             self.docker_client.close()
             self.docker_client = None
+        self.build_client.close()
 
         return True
 
     async def check_image(self, experiment_template: ExperimentTemplate) -> bool:
+        image_name = experiment_template.image_name
+        image_digest = self.image_checks.get(image_name)
+        if image_digest is None:
+            image_digest = await self._get_image_digest(experiment_template)
+            if image_digest == MISSING_IMAGE:
+                # a missing image is likely to be built soon
+                self.image_checks.set(
+                    image_name, image_digest, ttl=settings.IMAGE_CHECK_NEGATIVE_TTL
+                )
+            else:
+                self.image_checks.set(image_name, image_digest)
+
+        if image_digest == MISSING_IMAGE:
+            return False
+
+        self.image_cache.touch(image_name)
+        if experiment_template.image_digest != image_digest:
+            await experiment_template.update_image_digest_in_db(image_digest)
+        return True
+
+    async def _get_image_digest(self, experiment_template: ExperimentTemplate) -> str:
         try:
-            await asyncio.to_thread(
+            registry_data = await asyncio.to_thread(
                 self.docker_client.images.get_registry_data,
                 experiment_template.image_name,
             )
         except APIError:
-            self.logger.warning(
-                "Docker image for ExperimentTemplate "
-                + f"id={experiment_template.id} was not found. "
-                + "Rebuilding the image..."
+            self.logger.info(
+                f"Docker image '{experiment_template.image_name}' for ExperimentTemplate "
+                + f"id={experiment_template.id} was not found"
             )
-            return False
-        return True
+            return MISSING_IMAGE
+        return registry_data.id
 
     async def build_image(self, experiment_template: ExperimentTemplate) -> bool:
         template_id = experiment_template.id
         image_name = experiment_template.image_name
-        template_path = experiment_template.experiment_template_path
 
         self.logger.info(
             f"\tBuilding image (attempt={experiment_template.retry_count}) "
             + f"for ExperimentTemplate id={template_id}"
         )
 
+        abandoned_build = self.abandoned_builds.pop(str(experiment_template.build_logs_path), None)
+        if abandoned_build is not None:
+            # the previous attempt still writes to the build logs until the daemon gives up on it
+            await asyncio.wait([abandoned_build])
+
+        # base images are pulled only once, they're kept up to date by pre-warming
+        pull = not await self._exists_locally(experiment_template.base_image)
+        build = ImageBuild(experiment_template, pull)
+        build_future = asyncio.ensure_future(asyncio.to_thread(self._build_and_push, build))
         try:
-            await asyncio.to_thread(
-                self.docker_client.images.build,
-                path=str(template_path),
-                tag=f"{image_name}",
-                pull=True,
-                rm=True,
-                nocache=False,
+            await asyncio.wait_for(
+                asyncio.shield(build_future), timeout=settings.IMAGE_BUILD_TIMEOUT
             )
-            self.logger.info(
-                "\tPushing docker image to a remote repository "
-                + f"for ExperimentTemplate id={template_id}"
+            self.image_checks.pop(image_name)
+            # the image is kept as the cache of later builds, unless the cache is full
+            self.image_cache.touch(image_name)
+            await asyncio.to_thread(self.image_cache.enforce)
+        except asyncio.TimeoutError:
+            # the build is abandoned as soon as the Docker daemon reports its progress again
+            # or once it hasn't reported any for IMAGE_BUILD_IDLE_TIMEOUT seconds
+            build.cancelled.set()
+            build_future.add_done_callback(lambda future: future.exception())
+            self.abandoned_builds[str(build.logs_path)] = build_future
+            self.build_timeouts += 1
+            self.logger.error(
+                "\tBuilding/pushing an image for ExperimentTemplate "
+                + f"id={template_id} has timed out"
             )
-            await asyncio.to_thread(self.docker_client.images.push, repository=image_name)
-            await asyncio.to_thread(self.docker_client.images.remove, image=image_name)
+            return False
         except Exception as e:
             self.logger.error(
                 "\tThere was an error when building/pushing an image "
@@ -88,12 +171,149 @@ class DockerService(ContainerPlatformBase):
             )
             return False
 
+        self._record_build(experiment_template, build)
         self.logger.info(
             "\tDocker image has been successfully uploaded "
             + f"for ExperimentTemplate id={template_id}"
         )
         return True
 
+    def _build_and_push(self, build: ImageBuild) -> None:
+        """Build and push an image, writing their progress to the build logs as it's reported"""
+        with build.logs_path.open("w", encoding="utf-8") as log_file:
+            try:
+                start = time.perf_counter()
+                build.build_lines = self._follow(
+                    self.build_client.build(
+                        path=str(build.template_path),
+                        tag=build.image_name,
+                        pull=build.pull,
+                        rm=True,
+                        nocache=False,
+                        decode=True,
+                        timeout=self.build_client.timeout,
+                    ),
+                    log_file,
+                    build.cancelled,
+                )
+                build.build_duration = time.perf_counter() - start
+
+                log_file.write(f"Pushing {build.image_name}\n")
+                start = time.perf_counter()
+                self._follow(
+                    self.build_client.push(
+                        build.image_name,
+                        stream=True,
+                        decode=True,
+                        auth_config={
+                            "username": settings.DOCKER_REGISTRY_USERNAME,
+                            "password": settings.DOCKER_REGISTRY_PASSWORD,
+                        },
+                    ),
+                    log_file,
+                    build.cancelled,
+                )
+                build.push_duration = time.perf_counter() - start
+            except Exception as e:
+                log_file.write(f"ERROR: {e}\n")
+                raise e
+
+    @staticmethod
+    def _follow(progress: Iterator[dict], log_file: TextIO, cancelled: Event) -> list[str]:
+        """Write the progress reported by the Docker daemon to the logs, returns the written lines.
+        The daemon stops building/pushing the image once the progress is closed.
+        """
+        lines = []
+        try:
+            for item in progress:
+                if cancelled.is_set():
+                    raise ImageBuildException("Timed out")
+                if "error" in item:
+                    raise ImageBuildException(item["error"])
+
+                if "stream" in item:
+                    line = item["stream"]
+                elif "status" in item and "progress" not in item:
+                    # progress bars of individual layers are left out
+                    line = f"{item.get('id', '')} {item['status']}".strip() + "\n"
+                else:
+                    continue
+                lines.append(line.strip())
+                log_file.write(line)
+                log_file.flush()
+        finally:
+            progress.close()
+        return lines
+
+    def _record_build(self, experiment_template: ExperimentTemplate, build: ImageBuild) -> None:
+        steps = sum(1 for line in build.build_lines if line.startswith("Step "))
+        cached_steps = sum(1 for line in build.build_lines if line.startswith("---> Using cache"))
+        # all steps but FROM have been cached
+        cached = steps > 0 and cached_steps >= steps - 1
+
+        self.build_durations.add(build.build_duration)
+        self.push_durations.add(build.push_duration)
+        self.cached_builds += cached
+        self.builds[str(experiment_template.id)] = {
+            "image_name": experiment_template.image_name,
+            "build_duration": build.build_duration,
+            "push_duration": build.push_duration,
+            "steps": steps,
+            "cached_steps": cached_steps,
+            "cached": cached,
+            "pulled_base_image": build.pull,
+            "built_at": datetime.now(tz=timezone.utc),
+        }
+        self.logger.info(
+            f"\tImage of ExperimentTemplate id={experiment_template.id} built in "
+            + f"{build.build_duration:.2f}s ({cached_steps}/{steps} steps cached), "
+            + f"pushed in {build.push_duration:.2f}s"
+        )
+
+    def get_build_stats(self) -> dict:
+        return {
+            "build_durations": self.build_durations.stats(),
+            "push_durations": self.push_durations.stats(),
+            "timeouts": self.build_timeouts,
+            "cached_builds": self.cached_builds,
+            "image_cache": self.image_cache.stats(),
+            "image_checks": {
+                "size": len(self.image_checks),
+                "hits": self.image_checks.hits,
+                "misses": self.image_checks.misses,
+            },
+            "templates": self.builds,
+        }
+
+    async def prewarm_base_images(self) -> None:
+        """Pull the most common base images of templates, so that builds don't wait for them"""
+        count = settings.DOCKER_IMAGE_CACHE.PREWARM_BASE_IMAGES
+        if count <= 0:
+            return
+
+        experiment_templates = await ExperimentTemplate.find(
+            ExperimentTemplate.is_archived == False  # noqa: E712
+        ).to_list()
+        base_images = await asyncio.to_thread(
+            lambda: Counter(t.base_image for t in experiment_templates if t.base_image)
+        )
+        for base_image, _ in base_images.most_common(count):
+            try:
+                await asyncio.to_thread(self.docker_client.images.pull, base_image)
+            except Exception as e:
+                self.logger.warning(f"Base image '{base_image}' could not be pre-warmed: {e}")
+                continue
+            self.logger.info(f"Base image '{base_image}' has been pre-warmed")
+
+    async def _exists_locally(self, image_name: str) -> bool:
+        if image_name == "":
+            return False
+        try:
+            await asyncio.to_thread(self.docker_client.images.get, image_name)
+        except ImageNotFound:
+            return False
+        return True
+
     @staticmethod
     async def init() -> DockerService:
         service = DockerService()
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import logging
+import time
+from datetime import datetime, timezone
+
+from docker import DockerClient
+from docker.errors import APIError
+
+
+class DockerImageCache:
+    """Built images kept locally, so that later builds reuse their layers.
+
+    Images of the repository of RAIL are removed in the least recently used order
+    once their total size exceeds `max_size`. Images that haven't been used since
+    RAIL started are ordered by their creation time.
+    """
+
+    def __init__(self, docker_client: DockerClient, repository: str, max_size: int) -> None:
+        self.logger = logging.getLogger("uvicorn")
+        self.docker_client = docker_client
+        self.repository = repository
+        self.max_size = max_size
+        self.last_used: dict[str, float] = {}
+        self.evictions = 0
+
+    def touch(self, image_name: str) -> None:
+        self.last_used[image_name] = time.time()
+
+    def enforce(self) -> list[str]:
+        """Remove the least recently used images until the cache fits its size.
+        Returns the names of removed images.
+        """
+        images = []
+        for image in self.docker_client.images.list(name=self.repository):
+            tags = [tag for tag in image.tags if tag.startswith(f"{self.repository}:")]
+            if len(tags) == 0:
+                continue
+            last_used = max(self.last_used.get(tag, self._get_created_at(image)) for tag in tags)
+            images.append((last_used, image.attrs.get("Size", 0), tags))
+
+        # Layers shared by images are counted for each of them, overestimating the size
+        total_size = sum(size for _, size, _ in images)
+        removed = []
+        for _, size, tags in sorted(images, key=lambda image: image[0]):
+            if total_size <= self.max_size:
+                break
+            try:
+                for tag in tags:
+                    self.docker_client.images.remove(image=tag)
+                    self.last_used.pop(tag, None)
+                    removed.append(tag)
+            except APIError as e:
+                # e.g. the image is used by a container
+                self.logger.warning(f"Docker image {tags} could not be removed: {e}")
+                continue
+            total_size -= size
+            self.evictions += 1
+
+        return removed
+
+    def stats(self) -> dict:
+        return {"max_size": self.max_size, "evictions": self.evictions}
+
+    @staticmethod
+    def _get_created_at(image) -> float:
+        # e.g. 2024-01-01T10:00:00.123456789Z, fractions of seconds are irrelevant
+        created = image.attrs.get("Created", "")
+        try:
+            return datetime.fromisoformat(created[:19]).replace(tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            return 0
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timezone
+from functools import partial
+from uuid import uuid4
+
+import httpx
+from fastapi import HTTPException
+from pydantic import BaseModel, Field
+
+from app.config import settings
+from app.helpers import Pagination, TTLCache
+from app.schemas.enhanced_search import EnhancedSearchJobResponse
+from app.schemas.states import SearchJobState
+from app.services.aiod import AssetType, aiod_enhanced_search_client_wrapper
+
+logger = logging.getLogger("uvicorn")
+
+MAX_TOPK = 100
+
+
+class EnhancedSearchJob(BaseModel):
+    id: str = Field(default_factory=lambda: uuid4().hex)
+    asset_type: AssetType
+    query: str
+    topk: int
+    state: SearchJobState = SearchJobState.IN_PROGRESS
+    created_at: datetime = Field(default_factory=partial(datetime.now, tz=timezone.utc))
+    error_status_code: int | None = None
+    error_message: str = ""
+    results: list[dict] = []
+
+    def get_assets(self, pagination: Pagination) -> list[dict]:
+        page = self.results[pagination.offset : pagination.offset + pagination.limit]
+        return [result["asset"] for result in page]
+
+    def map_to_response(self, pagination: Pagination) -> EnhancedSearchJobResponse:
+        return EnhancedSearchJobResponse(
+            **self.dict(exclude={"results"}),
+            results=(
+                self.get_assets(pagination) if self.state == SearchJobState.COMPLETED else None
+            ),
+        )
+
+
+class EnhancedSearchJobs:
+    """In-memory registry of enhanced search jobs.
+
+    Identical queries share a single job as long as it's in progress or its results
+    are still kept, so that paging through the results doesn't run the query again.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.jobs = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.latest_jobs = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    def get(self, job_id: str) -> EnhancedSearchJob | None:
+        return self.jobs.get(job_id)
+
+    def submit(self, asset_type: AssetType, query: str, topk: int) -> EnhancedSearchJob:
+        job_id = self.latest_jobs.get((asset_type, query))
+        job = self.jobs.get(job_id) if job_id is not None else None
+        if job is not None and job.state != SearchJobState.FAILED and job.topk >= topk:
+            return job
+
+        job = EnhancedSearchJob(asset_type=asset_type, query=query, topk=topk)
+        self.jobs.set(job.id, job)
+        self.latest_jobs.set((asset_type, query), job.id)
+
+        task = asyncio.create_task(self._run(job))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+        return job
+
+    async def wait(self, job: EnhancedSearchJob) -> EnhancedSearchJob:
+        task = self._tasks.get(job.id)
+        if task is not None:
+            await asyncio.shield(task)
+        return job
+
+    async def _run(self, job: EnhancedSearchJob) -> None:
+        try:
+            job.results = await query_enhanced_search(job.asset_type, job.query, job.topk)
+            job.state = SearchJobState.COMPLETED
+        except HTTPException as e:
+            job.state = SearchJobState.FAILED
+            job.error_status_code = e.status_code
+            job.error_message = str(e.detail)
+        except Exception as e:
+            logger.error("There was an error when running an enhanced search", exc_info=e)
+            job.state = SearchJobState.FAILED
+            job.error_message = "Failed to get results from enhanced search"
+
+
+enhanced_search_jobs = EnhancedSearchJobs(
+    maxsize=settings.AIOD_ENHANCED_SEARCH_API.MAX_JOBS,
+    ttl=settings.AIOD_ENHANCED_SEARCH_API.RESULTS_TTL,
+)
+
+
+def submit_enhanced_search(
+    asset_type: AssetType, query: str, pagination: Pagination
+) -> EnhancedSearchJob:
+    topk = min(pagination.offset + pagination.limit, MAX_TOPK)
+    return enhanced_search_jobs.submit(asset_type, query, topk)
+
+
+def get_enhanced_search_job(job_id: str) -> EnhancedSearchJob | None:
+    return enhanced_search_jobs.get(job_id)
+
+
+async def enhanced_search(asset_type: AssetType, query: str, pagination: Pagination) -> list:
+    """Run an enhanced search and wait for its results."""
+    job = await enhanced_search_jobs.wait(submit_enhanced_search(asset_type, query, pagination))
+    if job.state == SearchJobState.FAILED:
+        raise HTTPException(status_code=job.error_status_code or 500, detail=job.error_message)
+
+    return job.get_assets(pagination)
+
+
+async def query_enhanced_search(asset_type: AssetType, query: str, topk: int) -> list[dict]:
+    """Submit a query to the enhanced search service and poll for its results
+    with exponential backoff and jitter.
+    """
+    initial_response = await aiod_enhanced_search_client_wrapper.client.post(
+        "query",
+        params={"search_query": query, "asset_type": asset_type.value, "topk": topk},
+    )
+
+    if initial_response.status_code != 202:
+        raise HTTPException(
+            status_code=initial_response.status_code, detail="Failed to initiate query"
+        )
+
+    # Extract the location header to poll for results
+    result_location = initial_response.headers.get("location")
+    if not result_location:
+        raise HTTPException(
+            status_code=500, detail="Missing Location header in external API response"
+        )
+
+    # Same time budget as the former polling in fixed 2 second intervals
+    deadline = time.monotonic() + 2 * (5 + round(topk * 0.15))
+    delay = settings.AIOD_ENHANCED_SEARCH_API.POLL_INITIAL_DELAY
+    while True:
+        result_response: httpx.Response = await aiod_enhanced_search_client_wrapper.client.get(
+            result_location,
+            params={"return_entire_assets": True},
+            follow_redirects=True,
+        )
+        if result_response.status_code != 200:
+            raise HTTPException(
+                status_code=result_response.status_code, detail="Error fetching results"
+            )
+        elif result_response.json()["status"] == "Completed":
+            return result_response.json()["results"]
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise HTTPException(
+                status_code=504, detail="Timed out waiting for result from external API"
+            )
+
+        await asyncio.sleep(min(random.uniform(delay / 2, delay), remaining))
+        delay = min(delay * 2, settings.AIOD_ENHANCED_SEARCH_API.POLL_MAX_DELAY)
@@ -3,25 +3,62 @@ from __future__ import annotations
 import asyncio
 import logging
 import shutil
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from functools import partial
+from typing import AsyncIterator, Callable
 
 from beanie import PydanticObjectId
 
-from app.config import CHECK_REANA_CONNECTION_INTERVAL, LITTLE_NAP, settings
-from app.helpers import WorkflowState
+from app.config import CHECK_REANA_CONNECTION_INTERVAL, settings
+from app.helpers import DurationStats, SingleFlight, WorkflowState
 from app.models.experiment import Experiment
 from app.models.experiment_run import ExperimentRun
 from app.models.experiment_template import ExperimentTemplate
-from app.schemas.experiment_run import ExperimentRunId
+from app.models.scheduled_job import JobKind, ScheduledJob
+from app.schemas.experiment_run import ExperimentRunIdWithOwner
 from app.schemas.experiment_template import ExperimentTemplateId, ReservedEnvVars
 from app.schemas.states import RunState, TemplateState
-from app.services.aiod import get_dataset_name, get_model_name
+from app.services.aiod import get_dataset_names, get_model_names
 from app.services.container_platforms.base import ContainerPlatformBase
+from app.services.job_queue import JobQueue, get_worker_id
+from app.services.scheduling_policies import get_scheduling_policy
 from app.services.workflow_engines.base import (
     WorkflowConnectionException,
     WorkflowEngineBase,
 )
 
 
+class ReleasableSlot:
+    """Slot of a semaphore that can be released before the job holding it concludes,
+    or released while the job waits for something and acquired again afterwards
+    """
+
+    def __init__(
+        self,
+        semaphore: asyncio.Semaphore,
+        on_release: Callable[[], None],
+        on_acquire: Callable[[], None] | None = None,
+    ) -> None:
+        self.semaphore = semaphore
+        self.on_release = on_release
+        self.on_acquire = on_acquire
+        self.held = True
+
+    def release(self) -> None:
+        if self.held:
+            self.held = False
+            self.semaphore.release()
+            self.on_release()
+
+    async def acquire(self) -> None:
+        if not self.held:
+            await self.semaphore.acquire()
+            self.held = True
+            if self.on_acquire is not None:
+                self.on_acquire()
+
+
 class ExperimentScheduler:
     SERVICE: ExperimentScheduler | None = None
 
@@ -29,37 +66,86 @@ class ExperimentScheduler:
         self,
         container_platform: ContainerPlatformBase,
         workflow_engine: WorkflowEngineBase,
+        worker_id: str | None = None,
     ) -> None:
         self.logger = logging.getLogger("uvicorn")
 
         self.container_platform = container_platform
         self.workflow_engine = workflow_engine
 
+        # Each phase of runs has its own pool, so that a run that's being postprocessed
+        # doesn't prevent another run from being executed
+        self.preprocessing_semaphore = asyncio.Semaphore(settings.MAX_PARALLEL_PREPROCESSING)
         self.experiment_semaphore = asyncio.Semaphore(settings.MAX_PARALLEL_CONTAINERS)
+        self.postprocessing_semaphore = asyncio.Semaphore(settings.MAX_PARALLEL_POSTPROCESSING)
         self.image_semaphore = asyncio.Semaphore(settings.MAX_PARALLEL_IMAGE_BUILDS)
+        # Builds of images of templates by template ids, shared by all runs waiting for them
+        self.image_builds = SingleFlight()
+
+        # Queues are shared by all replicas of the backend, each replica is a separate worker
+        self.worker_id = worker_id or get_worker_id()
+        self.run_scheduling_policy = get_scheduling_policy(settings.RUN_SCHEDULING)
+        self.experiment_run_queue = JobQueue(
+            JobKind.EXPERIMENT_RUN, self.worker_id, policy=self.run_scheduling_policy
+        )
+        self.image_building_queue = JobQueue(JobKind.IMAGE_BUILD, self.worker_id)
 
-        self.experiment_run_queue: asyncio.Queue[PydanticObjectId] = asyncio.Queue()
-        self.image_building_queue: asyncio.Queue[PydanticObjectId] = asyncio.Queue()
+        # metrics
+        self.run_queue_wait = DurationStats()
+        self.image_queue_wait = DurationStats()
+        self.run_slot_wait = DurationStats()
+        self.active_runs = 0
+        self.active_run_phases = {"preprocessing": 0, "running": 0, "postprocessing": 0}
+        self.active_image_builds = 0
+        self.runs_waiting_for_image = 0
 
     async def init_run_queue(self) -> None:
-        run_ids = (
+        """Enqueue unfinished runs that are missing in the queue,
+        e.g. runs created before the queue was persisted.
+        """
+        runs = (
             await ExperimentRun.find(
                 ExperimentRun.state != RunState.FINISHED,
                 ExperimentRun.state != RunState.CRASHED,
             )
             .sort(+ExperimentRun.updated_at)  # type: ignore
-            .project(ExperimentRunId)
+            .project(ExperimentRunIdWithOwner)
             .to_list()
         )
-        for run_id in run_ids:
-            await self.add_run_to_execute(run_id.id)
+        count = 0
+        for run in runs:
+            count += await self.experiment_run_queue.put_if_absent(run.id, owner=run.created_by)
 
-        count = self.experiment_run_queue.qsize()
         if count > 0:
             self.logger.info(
                 "Workflow queue has been initialized with " + f"{count} workflows to execute"
             )
 
+    async def init_environment_hashes(self) -> None:
+        """Migrate templates created before images were shared by templates with the same
+        environment, their REANA specifications still refer to their own images.
+        """
+        experiment_templates = await ExperimentTemplate.find(
+            ExperimentTemplate.environment_hash == None  # noqa: E711
+        ).to_list()
+        for experiment_template in experiment_templates:
+            try:
+                await asyncio.to_thread(experiment_template.migrate_to_shared_image)
+            except OSError as e:
+                self.logger.warning(
+                    f"ExperimentTemplate id={experiment_template.id} could not be migrated "
+                    + f"to a shared image: {e}"
+                )
+                continue
+            await experiment_template.set(
+                {ExperimentTemplate.environment_hash: experiment_template.environment_hash}
+            )
+
+        if len(experiment_templates) > 0:
+            self.logger.info(
+                f"{len(experiment_templates)} ExperimentTemplates have been migrated to shared images"
+            )
+
     async def init_image_build_queue(self) -> None:
         template_ids = (
             await ExperimentTemplate.find(
@@ -72,137 +158,333 @@ class ExperimentScheduler:
             .project(ExperimentTemplateId)
             .to_list()
         )
+        count = 0
         for template_id in template_ids:
-            await self.add_image_to_build(template_id.id)
+            count += await self.image_building_queue.put_if_absent(template_id.id)
 
-        count = self.image_building_queue.qsize()
         if count > 0:
             self.logger.info(
                 "Docker image queue has been initialized with "
                 + f"{count} images to build and push"
             )
 
-    async def add_run_to_execute(self, er_id: PydanticObjectId) -> None:
-        await self.experiment_run_queue.put(er_id)
+    async def add_run_to_execute(self, er_id: PydanticObjectId, owner: str | None = None) -> None:
+        await self.experiment_run_queue.put(er_id, owner=owner)
 
-    async def get_run_to_execute(self) -> PydanticObjectId:
-        while True:
-            if not self.experiment_run_queue.empty():
-                while not await self.workflow_engine.is_available():
-                    await asyncio.sleep(CHECK_REANA_CONNECTION_INTERVAL)
-                return self.experiment_run_queue.get_nowait()
-            await asyncio.sleep(LITTLE_NAP)
+    async def get_run_to_execute(self) -> ScheduledJob:
+        # Runs are not claimed while the workflow engine is unavailable,
+        # so that other replicas can execute them in the meantime
+        while not await self.workflow_engine.is_available():
+            await asyncio.sleep(CHECK_REANA_CONNECTION_INTERVAL)
+
+        job = await self.experiment_run_queue.get()
+        self._record_queue_wait(job, self.run_queue_wait)
+        return job
 
     async def add_image_to_build(self, temp_id: PydanticObjectId) -> None:
         await self.image_building_queue.put(temp_id)
 
-    async def get_image_to_build(self) -> PydanticObjectId:
-        return await self.image_building_queue.get()
+    async def get_image_to_build(self) -> ScheduledJob:
+        job = await self.image_building_queue.get()
+        self._record_queue_wait(job, self.image_queue_wait)
+        return job
+
+    def _record_queue_wait(self, job: ScheduledJob, queue_wait: DurationStats) -> None:
+        enqueued_at = job.enqueued_at
+        if enqueued_at.tzinfo is None:
+            enqueued_at = enqueued_at.replace(tzinfo=timezone.utc)
+        queue_wait.add((datetime.now(tz=timezone.utc) - enqueued_at).total_seconds())
 
     async def schedule_experiment_runs(self) -> None:
         while True:
-            if self.experiment_semaphore._value > 0:
-                er_id = await self.get_run_to_execute()
-                asyncio.create_task(self.execute_experiment_run(er_id))
-            await asyncio.sleep(LITTLE_NAP)
+            # A run is claimed only once there's a free slot to preprocess it,
+            # the slot is held until the run gets a slot to be executed
+            await self.preprocessing_semaphore.acquire()
+            try:
+                job = await self.get_run_to_execute()
+            except BaseException:
+                self.preprocessing_semaphore.release()
+                raise
+
+            self.active_run_phases["preprocessing"] += 1
+            preprocessing_slot = ReleasableSlot(
+                self.preprocessing_semaphore,
+                on_release=partial(self._leave_phase, "preprocessing"),
+                on_acquire=partial(self._enter_phase, "preprocessing"),
+            )
+            asyncio.create_task(self._execute_experiment_run_in_slot(job, preprocessing_slot))
 
     async def schedule_image_building(self) -> None:
         while True:
-            if self.image_semaphore._value > 0:
-                temp_id = await self.get_image_to_build()
-                asyncio.create_task(self.build_experiment_environment(temp_id))
-            await asyncio.sleep(LITTLE_NAP)
-
-    async def execute_experiment_run(self, exp_run_id: PydanticObjectId) -> None:
-        async with self.experiment_semaphore:
-            experiment_run = await ExperimentRun.get(exp_run_id)
-            experiment = await Experiment.get(experiment_run.experiment_id)
-            experiment_template = await ExperimentTemplate.get(experiment.experiment_template_id)
-
-            image_exists = await self._rebuild_image_if_necessary(
-                experiment_run, experiment_template
+            await self.image_semaphore.acquire()
+            try:
+                job = await self.get_image_to_build()
+            except BaseException:
+                self.image_semaphore.release()
+                raise
+            asyncio.create_task(self._build_experiment_environment_in_slot(job))
+
+    async def _execute_experiment_run_in_slot(
+        self, job: ScheduledJob, preprocessing_slot: ReleasableSlot
+    ) -> None:
+        self.active_runs += 1
+        heartbeat = asyncio.create_task(self.experiment_run_queue.keep_alive(job))
+        try:
+            await self.execute_experiment_run(job.target_id, preprocessing_slot=preprocessing_slot)
+        except Exception as e:
+            self.logger.error(f"ExperimentRun id={job.target_id} failed unexpectedly", exc_info=e)
+        finally:
+            heartbeat.cancel()
+            self.active_runs -= 1
+            # in case the run has concluded before being executed
+            preprocessing_slot.release()
+
+        # A cancelled run (shutdown) keeps its job so that it's reclaimed once its lease expires
+        await self.experiment_run_queue.complete(job)
+
+    @asynccontextmanager
+    async def running_slot(self, preprocessing_slot: ReleasableSlot | None) -> AsyncIterator[None]:
+        """Slot for executing a workflow, the preprocessing slot is released once it's acquired"""
+        with self.run_slot_wait.measure():
+            await self.experiment_semaphore.acquire()
+        if preprocessing_slot is not None:
+            preprocessing_slot.release()
+
+        self.active_run_phases["running"] += 1
+        try:
+            yield
+        finally:
+            self._leave_phase("running")
+            self.experiment_semaphore.release()
+
+    @asynccontextmanager
+    async def postprocessing_slot(self) -> AsyncIterator[None]:
+        async with self.postprocessing_semaphore:
+            self.active_run_phases["postprocessing"] += 1
+            try:
+                yield
+            finally:
+                self._leave_phase("postprocessing")
+
+    def _enter_phase(self, phase: str) -> None:
+        self.active_run_phases[phase] += 1
+
+    def _leave_phase(self, phase: str) -> None:
+        self.active_run_phases[phase] -= 1
+
+    async def _build_experiment_environment_in_slot(self, job: ScheduledJob) -> None:
+        self.active_image_builds += 1
+        heartbeat = asyncio.create_task(self.image_building_queue.keep_alive(job))
+        try:
+            await self.build_experiment_environment(job.target_id)
+        except Exception as e:
+            self.logger.error(
+                f"Image building of ExperimentTemplate id={job.target_id} failed unexpectedly",
+                exc_info=e,
             )
-            if image_exists is False:
-                return
+        finally:
+            heartbeat.cancel()
+            self.active_image_builds -= 1
+            self.image_semaphore.release()
+
+        await self.image_building_queue.complete(job)
+
+    async def get_metrics(self) -> dict:
+        return {
+            "worker_id": self.worker_id,
+            "runs": {
+                "queued": await self.experiment_run_queue.count_queued(),
+                "in_progress": await self.experiment_run_queue.count_leased(),
+                "active": self.active_runs,
+                "max_parallel": settings.MAX_PARALLEL_CONTAINERS,
+                "phases": {
+                    "preprocessing": {
+                        "active": self.active_run_phases["preprocessing"],
+                        "max_parallel": settings.MAX_PARALLEL_PREPROCESSING,
+                    },
+                    "running": {
+                        "active": self.active_run_phases["running"],
+                        "max_parallel": settings.MAX_PARALLEL_CONTAINERS,
+                    },
+                    "postprocessing": {
+                        "active": self.active_run_phases["postprocessing"],
+                        "max_parallel": settings.MAX_PARALLEL_POSTPROCESSING,
+                    },
+                },
+                "waiting_for_image": self.runs_waiting_for_image,
+                "queue_wait": self.run_queue_wait.stats(),
+                "run_slot_wait": self.run_slot_wait.stats(),
+                "postprocess_stages": self.workflow_engine.get_postprocess_stats(),
+            },
+            "image_builds": {
+                "queued": await self.image_building_queue.count_queued(),
+                "in_progress": await self.image_building_queue.count_leased(),
+                "active": self.active_image_builds,
+                "max_parallel": settings.MAX_PARALLEL_IMAGE_BUILDS,
+                "queue_wait": self.image_queue_wait.stats(),
+                "builds": self.container_platform.get_build_stats(),
+            },
+        }
 
-            await experiment_run.update_state_in_db(RunState.PREPROCESSING)
-            self.logger.info(
-                f"=== ExperimentRun id={experiment_run.id} "
-                + f"(retry_count={experiment_run.retry_count}) "
-                + f"- Experiment id={experiment.id} INITIALIZED ==="
-            )
-            try:
-                workflow_state = await self._exec_experiment(experiment_run, experiment)
-            except WorkflowConnectionException as e:
-                self.logger.error(str(e))
-                await self.add_run_to_execute(exp_run_id)
-                return
+    async def get_run_schedule(self) -> dict:
+        """Order in which queued runs are to be executed and the share of individual users"""
+        queued_jobs, running = await asyncio.gather(
+            self.experiment_run_queue.get_queued_jobs(),
+            self.experiment_run_queue.count_running_by_owner(),
+        )
+        policy = self.run_scheduling_policy
+        ordered_jobs = policy.order(queued_jobs, running)
+
+        owners = set(running) | {job.owner for job in queued_jobs}
+        total_running = sum(running.values())
+        users = [
+            {
+                "user": owner,
+                "running": running.get(owner, 0),
+                "queued": sum(job.owner == owner for job in queued_jobs),
+                "weight": policy.get_weight(owner),
+                "max_running": policy.get_max_running(owner),
+                "share": running.get(owner, 0) / total_running if total_running > 0 else 0,
+            }
+            for owner in sorted(owners, key=lambda o: o or "")
+        ]
+        return {
+            "policy": policy.name,
+            "queue": [
+                {
+                    "experiment_run_id": str(job.target_id),
+                    "user": job.owner,
+                    "enqueued_at": job.enqueued_at,
+                    "can_run": policy.can_run(job.owner, running),
+                }
+                for job in ordered_jobs
+            ],
+            "users": users,
+        }
 
-            should_retry = (
-                experiment_run.retry_count < settings.MAX_EXPERIMENT_RUN_ATTEMPTS - 1
-                and workflow_state.success is False
-                and workflow_state.manually_stopped is False
-                and workflow_state.manually_deleted is False
+    async def execute_experiment_run(
+        self, exp_run_id: PydanticObjectId, preprocessing_slot: ReleasableSlot | None = None
+    ) -> None:
+        experiment_run = await ExperimentRun.get(exp_run_id)
+        if experiment_run is None or experiment_run.state in (RunState.FINISHED, RunState.CRASHED):
+            # A job may be delivered more than once, e.g. if its lease expired
+            self.logger.info(f"ExperimentRun id={exp_run_id} has already been concluded")
+            return
+        experiment = await Experiment.get(experiment_run.experiment_id)
+        experiment_template = await ExperimentTemplate.get(experiment.experiment_template_id)
+
+        image_exists = await self._rebuild_image_if_necessary(
+            experiment_run, experiment_template, preprocessing_slot
+        )
+        if image_exists is False:
+            return
+
+        await experiment_run.update_state_in_db(RunState.PREPROCESSING)
+        self.logger.info(
+            f"=== ExperimentRun id={experiment_run.id} "
+            + f"(retry_count={experiment_run.retry_count}) "
+            + f"- Experiment id={experiment.id} INITIALIZED ==="
+        )
+        try:
+            workflow_state = await self._exec_experiment(
+                experiment_run, experiment, preprocessing_slot
             )
-            if workflow_state.success:
-                new_state = RunState.FINISHED
-            else:
-                new_state = RunState.CRASHED
+        except WorkflowConnectionException as e:
+            self.logger.error(str(e))
+            await self.add_run_to_execute(exp_run_id)
+            return
+
+        should_retry = (
+            experiment_run.retry_count < settings.MAX_EXPERIMENT_RUN_ATTEMPTS - 1
+            and workflow_state.success is False
+            and workflow_state.manually_stopped is False
+            and workflow_state.manually_deleted is False
+        )
+        if workflow_state.success:
+            new_state = RunState.FINISHED
+        else:
+            new_state = RunState.CRASHED
 
-            if workflow_state.manually_deleted is False:
-                await experiment_run.update_state_in_db(new_state)
+        if workflow_state.manually_deleted is False:
+            await experiment_run.update_state_in_db(new_state)
 
-                if should_retry:
-                    new_exp_run = experiment_run.retry_failed_run()
-                    await new_exp_run.create()
-                    await self.add_run_to_execute(new_exp_run.id)
+            if should_retry:
+                new_exp_run = experiment_run.retry_failed_run()
+                await new_exp_run.create()
+                await self.add_run_to_execute(new_exp_run.id, owner=new_exp_run.created_by)
 
-            self.logger.info(
-                f"=== ExperimentRun id={experiment_run.id} "
-                + f"(retry_count={experiment_run.retry_count}) CONCLUDED ==="
-            )
+        self.logger.info(
+            f"=== ExperimentRun id={experiment_run.id} "
+            + f"(retry_count={experiment_run.retry_count}) CONCLUDED ==="
+        )
 
     async def _exec_experiment(
-        self, experiment_run: ExperimentRun, experiment: Experiment
+        self,
+        experiment_run: ExperimentRun,
+        experiment: Experiment,
+        preprocessing_slot: ReleasableSlot | None = None,
     ) -> WorkflowState:
         environment_variables = await self._general_workflow_preparation(experiment_run, experiment)
         await self.workflow_engine.preprocess_workflow(
             experiment_run, experiment, environment_variables
         )
 
-        await experiment_run.update_state_in_db(RunState.RUNNING)
-        workflow_state = await self.workflow_engine.run_workflow(experiment_run)
+        async with self.running_slot(preprocessing_slot):
+            await experiment_run.update_state_in_db(RunState.RUNNING)
+            workflow_state = await self.workflow_engine.run_workflow(experiment_run)
 
         if workflow_state.manually_deleted is False:
             await experiment_run.update_state_in_db(RunState.POSTPROCESSING)
-            await self.workflow_engine.postprocess_workflow(experiment_run, workflow_state)
+            async with self.postprocessing_slot():
+                await self.workflow_engine.postprocess_workflow(experiment_run, workflow_state)
 
         return workflow_state
 
     async def _rebuild_image_if_necessary(
-        self, experiment_run: ExperimentRun, experiment_template: ExperimentTemplate
+        self,
+        experiment_run: ExperimentRun,
+        experiment_template: ExperimentTemplate,
+        preprocessing_slot: ReleasableSlot | None = None,
     ) -> bool:
         image_exists = await self.container_platform.check_image(experiment_template)
         if image_exists:
             return True
 
-        # image rebuilding
-        await experiment_template.update_state_in_db(TemplateState.CREATED, retry_count=0)
-        successful_image_rebuild = await self._build_image_multiple_attempts(experiment_template)
+        # image rebuilding, the preprocessing slot is left to other runs in the meantime
+        if self.image_builds.is_in_flight(experiment_template.image_name) is False:
+            self.logger.warning(
+                f"Image of ExperimentTemplate id={experiment_template.id} is missing. "
+                + "Rebuilding the image..."
+            )
+        if preprocessing_slot is not None:
+            preprocessing_slot.release()
+        self.runs_waiting_for_image += 1
+        try:
+            successful_image_rebuild = await self._build_image_once(
+                experiment_template, reset_attempts=True
+            )
+        finally:
+            self.runs_waiting_for_image -= 1
+
         if successful_image_rebuild is False:
             self.logger.error(
                 f"ExperimentRun id={experiment_run.id} has not started "
                 + "as the corresponding image was not successfully rebuilt"
             )
             await experiment_run.update_state_in_db(RunState.CRASHED)
+        elif preprocessing_slot is not None:
+            await preprocessing_slot.acquire()
 
         return successful_image_rebuild
 
     async def _general_workflow_preparation(
         self, experiment_run: ExperimentRun, experiment: Experiment
     ) -> dict[str, str]:
-        model_names_env = ",".join([await get_model_name(x) for x in experiment.model_ids])
-        dataset_names_env = ",".join([await get_dataset_name(x) for x in experiment.dataset_ids])
+        model_names, dataset_names = await asyncio.gather(
+            get_model_names(experiment.model_ids), get_dataset_names(experiment.dataset_ids)
+        )
+        model_names_env = ",".join(model_names)
+        dataset_names_env = ",".join(dataset_names)
         model_ids_env = ",".join([id for id in experiment.model_ids])
         dataset_ids_env = ",".join([id for id in experiment.dataset_ids])
         reserved_env_values = [
@@ -226,21 +508,50 @@ class ExperimentScheduler:
         return environment_variables
 
     async def build_experiment_environment(self, template_id: PydanticObjectId) -> bool:
-        async with self.image_semaphore:
-            experiment_template = await ExperimentTemplate.get(template_id)
+        experiment_template = await ExperimentTemplate.get(template_id)
 
+        self.logger.info(
+            "=== Creation of an environment for "
+            + f"ExperimentTemplate id={template_id} "
+            + "INITIALIZED ==="
+        )
+        if await self.container_platform.check_image(experiment_template):
+            # the same environment has already been built for another template
             self.logger.info(
-                "=== Creation of an environment for "
-                + f"ExperimentTemplate id={template_id} "
-                + "INITIALIZED ==="
-            )
-            image_build_state = await self._build_image_multiple_attempts(experiment_template)
-            self.logger.info(
-                "=== Creation of an environment "
-                + f"for ExperimentTemplate id={template_id} "
-                + "CONCLUDED ==="
+                f"\tExperimentTemplate id={template_id} reuses the existing image "
+                + f"'{experiment_template.image_name}'"
             )
-            return image_build_state
+            await experiment_template.update_state_in_db(TemplateState.FINISHED)
+            image_build_state = True
+        else:
+            image_build_state = await self._build_image_once(experiment_template)
+        self.logger.info(
+            "=== Creation of an environment "
+            + f"for ExperimentTemplate id={template_id} "
+            + "CONCLUDED ==="
+        )
+        return image_build_state
+
+    async def _build_image_once(
+        self, experiment_template: ExperimentTemplate, reset_attempts: bool = False
+    ) -> bool:
+        """Build the image of a template, or wait for the result of a build of the same image
+        in progress, which may be a build of another template with the same environment
+        """
+        built_by_other = True
+
+        async def build() -> bool:
+            nonlocal built_by_other
+            built_by_other = False
+            if reset_attempts:
+                await experiment_template.update_state_in_db(TemplateState.CREATED, retry_count=0)
+            return await self._build_image_multiple_attempts(experiment_template)
+
+        image_build_state = await self.image_builds.do(experiment_template.image_name, build)
+        state = TemplateState.FINISHED if image_build_state else TemplateState.CRASHED
+        if built_by_other and experiment_template.state != state:
+            await experiment_template.update_state_in_db(state)
+        return image_build_state
 
     async def _build_image_multiple_attempts(self, experiment_template: ExperimentTemplate) -> bool:
         while True:
@@ -266,6 +577,7 @@ class ExperimentScheduler:
         container_platform: ContainerPlatformBase, workflow_engine: WorkflowEngineBase
     ) -> ExperimentScheduler:
         ExperimentScheduler.SERVICE = ExperimentScheduler(container_platform, workflow_engine)
+        await ExperimentScheduler.SERVICE.init_environment_hashes()
         await ExperimentScheduler.SERVICE.init_image_build_queue()
         await ExperimentScheduler.SERVICE.init_run_queue()
 
@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from beanie import PydanticObjectId
+from pymongo import ReturnDocument
+
+from app.config import settings
+from app.models.scheduled_job import JobKind, ScheduledJob
+from app.services.scheduling_policies import SchedulingPolicyBase
+
+# How many times a claim is retried if the selected job is claimed by another worker meanwhile
+MAX_CLAIM_ATTEMPTS = 3
+
+
+def get_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid4().hex[:8]}"
+
+
+class JobQueue:
+    """Persistent queue of jobs of a single kind stored in MongoDB.
+
+    Jobs are claimed in the order given by a scheduling policy, or oldest first
+    if no policy is set.
+
+    Jobs are claimed atomically with a lease that the owning worker has to renew
+    (see `keep_alive`) until the job is completed. Jobs whose lease expires,
+    e.g. because their worker crashed, are claimed again by any other worker.
+    """
+
+    def __init__(
+        self,
+        kind: JobKind,
+        worker_id: str,
+        lease_duration: float | None = None,
+        heartbeat_interval: float | None = None,
+        poll_interval: float | None = None,
+        policy: SchedulingPolicyBase | None = None,
+    ) -> None:
+        self.logger = logging.getLogger("uvicorn")
+
+        self.kind = kind
+        self.worker_id = worker_id
+        self.lease_duration = timedelta(seconds=lease_duration or settings.JOB_QUEUE.LEASE_DURATION)
+        self.heartbeat_interval = heartbeat_interval or settings.JOB_QUEUE.HEARTBEAT_INTERVAL
+        self.poll_interval = poll_interval or settings.JOB_QUEUE.POLL_INTERVAL
+        self.policy = policy
+
+        # Wakes up workers of this process once a job is enqueued locally,
+        # jobs of other replicas are picked up within `poll_interval`
+        self.job_available = asyncio.Event()
+
+    @property
+    def collection(self):
+        return ScheduledJob.get_motor_collection()
+
+    async def put(self, target_id: PydanticObjectId, owner: str | None = None) -> None:
+        """Enqueue a job. If the job is already being processed,
+        it's processed once more after its current execution completes.
+        """
+        await self.collection.update_one(
+            {"kind": self.kind.value, "target_id": target_id},
+            {
+                "$set": {"requeued": True},
+                "$setOnInsert": {**self._new_job_fields(), "owner": owner},
+            },
+            upsert=True,
+        )
+        self.job_available.set()
+
+    async def put_if_absent(self, target_id: PydanticObjectId, owner: str | None = None) -> bool:
+        """Enqueue a job unless it's already queued or being processed.
+        Returns whether the job has been enqueued.
+        """
+        result = await self.collection.update_one(
+            {"kind": self.kind.value, "target_id": target_id},
+            {"$setOnInsert": {**self._new_job_fields(), "owner": owner, "requeued": False}},
+            upsert=True,
+        )
+        if result.upserted_id is None:
+            return False
+
+        self.job_available.set()
+        return True
+
+    async def get(self) -> ScheduledJob:
+        """Wait for a job and claim it"""
+        while True:
+            self.job_available.clear()
+            job = await self.claim()
+            if job is not None:
+                return job
+
+            try:
+                await asyncio.wait_for(self.job_available.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def claim(self) -> ScheduledJob | None:
+        """Claim the next job that is either not leased or its lease has expired"""
+        if self.policy is None:
+            return await self._claim_first({})
+
+        for _ in range(MAX_CLAIM_ATTEMPTS):
+            queued_jobs, running = await asyncio.gather(
+                self.get_queued_jobs(), self.count_running_by_owner()
+            )
+            jobs_to_claim = self.policy.select(queued_jobs, running)
+            if len(jobs_to_claim) == 0:
+                return None
+
+            job = await self._claim_first({"_id": jobs_to_claim[0].id})
+            if job is not None:
+                return job
+
+        return None
+
+    async def _claim_first(self, query: dict) -> ScheduledJob | None:
+        now = datetime.now(tz=timezone.utc)
+        doc = await self.collection.find_one_and_update(
+            {**query, **self._queued_query(now)},
+            {
+                "$set": {
+                    "lease_owner": self.worker_id,
+                    "lease_id": uuid4().hex,
+                    "lease_expires_at": now + self.lease_duration,
+                    "requeued": False,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("enqueued_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc is None:
+            return None
+
+        job = ScheduledJob.parse_obj(doc)
+        if job.attempts > 1:
+            self.logger.warning(
+                f"{self.kind.value} job of id={job.target_id} has been reclaimed "
+                + f"(attempt {job.attempts})"
+            )
+        return job
+
+    async def heartbeat(self, job: ScheduledJob) -> bool:
+        """Renew the lease of a claimed job. Returns False if the lease has been lost."""
+        result = await self.collection.update_one(
+            {"_id": job.id, "lease_id": job.lease_id},
+            {"$set": {"lease_expires_at": datetime.now(tz=timezone.utc) + self.lease_duration}},
+        )
+        return result.matched_count > 0
+
+    async def keep_alive(self, job: ScheduledJob) -> None:
+        """Periodically renew the lease of a job until cancelled"""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            if not await self.heartbeat(job):
+                self.logger.error(
+                    f"Lease of {self.kind.value} job of id={job.target_id} has been lost"
+                )
+                return
+
+    async def complete(self, job: ScheduledJob) -> None:
+        """Remove a processed job from the queue, or release it back to the queue
+        if it has been enqueued again in the meantime.
+        """
+        result = await self.collection.delete_one(
+            {"_id": job.id, "lease_id": job.lease_id, "requeued": False}
+        )
+        if result.deleted_count > 0:
+            # jobs held back by limits of running jobs (e.g. per user) may be claimable now
+            self.job_available.set()
+            return
+
+        result = await self.collection.update_one(
+            {"_id": job.id, "lease_id": job.lease_id},
+            {"$set": {**self._new_job_fields(), "requeued": False}},
+        )
+        if result.modified_count > 0:
+            self.job_available.set()
+
+    async def get_queued_jobs(self) -> list[ScheduledJob]:
+        """Jobs waiting to be claimed, oldest first"""
+        docs = (
+            await self.collection.find(self._queued_query(datetime.now(tz=timezone.utc)))
+            .sort("enqueued_at", 1)
+            .to_list(length=None)
+        )
+        return [ScheduledJob.parse_obj(doc) for doc in docs]
+
+    async def count_running_by_owner(self) -> dict[str | None, int]:
+        """Number of jobs of individual owners that are being processed by any worker"""
+        docs = await self.collection.aggregate(
+            [
+                {"$match": self._leased_query(datetime.now(tz=timezone.utc))},
+                {"$group": {"_id": "$owner", "count": {"$sum": 1}}},
+            ]
+        ).to_list(length=None)
+        return {doc["_id"]: doc["count"] for doc in docs}
+
+    async def count_queued(self) -> int:
+        return await self.collection.count_documents(
+            self._queued_query(datetime.now(tz=timezone.utc))
+        )
+
+    async def count_leased(self) -> int:
+        return await self.collection.count_documents(
+            self._leased_query(datetime.now(tz=timezone.utc))
+        )
+
+    def _queued_query(self, now: datetime) -> dict:
+        return {
+            "kind": self.kind.value,
+            "$or": [{"lease_expires_at": None}, {"lease_expires_at": {"$lt": now}}],
+        }
+
+    def _leased_query(self, now: datetime) -> dict:
+        return {"kind": self.kind.value, "lease_expires_at": {"$gte": now}}
+
+    @staticmethod
+    def _new_job_fields() -> dict:
+        return {
+            "enqueued_at": datetime.now(tz=timezone.utc),
+            "lease_owner": None,
+            "lease_id": None,
+            "lease_expires_at": None,
+            "attempts": 0,
+        }
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+from typing import AsyncIterator
+
+from beanie import PydanticObjectId
+
+from app.models.experiment_run import ExperimentRun
+from app.schemas.states import RunState
+from app.services.workflow_engines.base import WorkflowEngineBase
+
+logger = logging.getLogger("uvicorn")
+
+# States in which the workflow of a run may have produced logs
+STATES_WITH_LOGS = [RunState.RUNNING, RunState.POSTPROCESSING]
+CONCLUDED_STATES = [RunState.FINISHED, RunState.CRASHED]
+
+
+async def stream_logs(
+    run_id: PydanticObjectId,
+    workflow_engine: WorkflowEngineBase,
+    offset: int,
+    interval: float,
+) -> AsyncIterator[str]:
+    """Tail logs of an experiment run as server-sent events.
+
+    Each `log` event carries logs following the byte `offset`, its id being the offset
+    to resume from. Logs are followed until the run concludes and its persisted logs
+    are sent, the stream is then closed with an `end` event.
+    """
+    yield f"retry: {int(interval * 1000)}\n\n"
+
+    while True:
+        experiment_run = await ExperimentRun.get(run_id)
+        if experiment_run is None:
+            return
+
+        concluded = experiment_run.state in CONCLUDED_STATES
+        if concluded or experiment_run.state in STATES_WITH_LOGS:
+            logs = await _get_logs(experiment_run, workflow_engine)
+            if len(logs) > offset:
+                yield format_event("log", logs[offset:].decode("utf-8", errors="ignore"), len(logs))
+                offset = len(logs)
+
+        if concluded:
+            yield format_event("end", experiment_run.state.value)
+            return
+
+        # keeps the connection open and lets us notice disconnected clients
+        yield ": keep-alive\n\n"
+        await asyncio.sleep(interval)
+
+
+async def _get_logs(experiment_run: ExperimentRun, workflow_engine: WorkflowEngineBase) -> bytes:
+    try:
+        return (await workflow_engine.get_logs(experiment_run)).encode("utf-8")
+    except Exception as e:
+        # the workflow may not have been created yet, logs are fetched again in a while
+        logger.debug(f"Logs of ExperimentRun id={experiment_run.id} are not available: {e}")
+        return b""
+
+
+def format_event(event: str, data: str, id: int | None = None) -> str:
+    lines = [f"event: {event}"]
+    if id is not None:
+        lines.append(f"id: {id}")
+    lines.extend(f"data: {line}" for line in re.split(r"\r\n|\r|\n", data))
+    return "\n".join(lines) + "\n\n"
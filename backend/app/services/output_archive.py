@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import logging
+import tarfile
+import zipfile
+from enum import Enum
+from typing import AsyncIterator, Awaitable, Callable
+
+from app.helpers import FileDetail, FileStream
+
+logger = logging.getLogger("uvicorn")
+
+
+class ArchiveFormat(str, Enum):
+    ZIP = "zip"
+    TAR_GZ = "tar.gz"
+
+    @property
+    def media_type(self) -> str:
+        return "application/zip" if self == ArchiveFormat.ZIP else "application/gzip"
+
+
+class _ChunkSink:
+    """Write-only file object collecting whatever is written to it until drained.
+
+    It intentionally has no `tell` nor `seek`, so that zipfile writes the archive
+    sequentially (with data descriptors following the individual entries).
+    """
+
+    def __init__(self) -> None:
+        self.chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+async def stream_archive(
+    files: list[FileDetail],
+    open_file: Callable[[str], Awaitable[FileStream | None]],
+    archive_format: ArchiveFormat,
+) -> AsyncIterator[bytes]:
+    """Build an archive of files on the fly.
+
+    Files are read one at a time and the compressed archive is yielded as soon
+    as it's produced, so neither the files nor the archive are ever held as a whole.
+    Files that cannot be opened anymore are left out of the archive.
+    """
+    sink = _ChunkSink()
+    writer = _ZipWriter(sink) if archive_format == ArchiveFormat.ZIP else _TarGzWriter(sink)
+
+    for file in files:
+        file_stream = await open_file(file.filepath)
+        if file_stream is None:
+            logger.warning(f"File '{file.filepath}' is left out of the archive, it doesn't exist")
+            continue
+
+        try:
+            await asyncio.to_thread(writer.start_entry, file)
+            async for chunk in file_stream.chunks:
+                # compression is offloaded not to block the event loop
+                await asyncio.to_thread(writer.write, chunk)
+                if data := sink.drain():
+                    yield data
+            await asyncio.to_thread(writer.end_entry)
+        finally:
+            await file_stream.close()
+        if data := sink.drain():
+            yield data
+
+    await asyncio.to_thread(writer.close)
+    if data := sink.drain():
+        yield data
+
+
+class _ZipWriter:
+    def __init__(self, sink: _ChunkSink) -> None:
+        self.zip_file = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED)
+        self.entry = None
+
+    def start_entry(self, file: FileDetail) -> None:
+        # zip timestamps cannot precede 1980
+        date_time = max(file.last_modified.timetuple()[:6], (1980, 1, 1, 0, 0, 0))
+        zip_info = zipfile.ZipInfo(file.filepath, date_time=date_time)
+        zip_info.compress_type = zipfile.ZIP_DEFLATED
+        # the expected size decides whether ZIP64 extensions are needed
+        zip_info.file_size = file.size
+        self.entry = self.zip_file.open(zip_info, mode="w")
+
+    def write(self, data: bytes) -> None:
+        self.entry.write(data)
+
+    def end_entry(self) -> None:
+        self.entry.close()
+        self.entry = None
+
+    def close(self) -> None:
+        self.zip_file.close()
+
+
+class _TarGzWriter:
+    """Tar entries are framed manually as the size of each entry has to be known
+    upfront and tarfile itself only accepts synchronous file objects.
+    """
+
+    def __init__(self, sink: _ChunkSink) -> None:
+        self.gzip_file = gzip.GzipFile(fileobj=sink, mode="wb", mtime=0)
+        self.remaining = 0
+        self.size = 0
+
+    def start_entry(self, file: FileDetail) -> None:
+        tar_info = tarfile.TarInfo(file.filepath)
+        tar_info.size = file.size
+        tar_info.mtime = int(file.last_modified.timestamp())
+        tar_info.mode = 0o644
+        self.gzip_file.write(tar_info.tobuf(format=tarfile.PAX_FORMAT))
+        self.remaining = self.size = file.size
+
+    def write(self, data: bytes) -> None:
+        if len(data) > self.remaining:
+            raise ValueError("File is larger than declared in the archive")
+        self.gzip_file.write(data)
+        self.remaining -= len(data)
+
+    def end_entry(self) -> None:
+        if self.remaining > 0:
+            raise ValueError("File is smaller than declared in the archive")
+        if padding := -self.size % tarfile.BLOCKSIZE:
+            self.gzip_file.write(tarfile.NUL * padding)
+
+    def close(self) -> None:
+        # end-of-archive marker
+        self.gzip_file.write(tarfile.NUL * 2 * tarfile.BLOCKSIZE)
+        self.gzip_file.close()
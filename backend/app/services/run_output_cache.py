@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+from typing import AsyncIterator
+
+import aiofiles as aiof
+from pydantic import BaseModel, Field
+
+from app.config import (
+    EXPERIMENT_RUN_DIR_PREFIX,
+    METRICS_FILENAME,
+    OUTPUT_MANIFEST_FILENAME,
+    RUN_OUTPUT_FOLDER,
+    settings,
+)
+from app.helpers import FileDetail, FileStream
+from app.models.experiment_run import ExperimentRun
+from app.services.workflow_engines.base import WorkflowEngineBase
+
+READ_CHUNK_SIZE = 1024**2  # 1MB
+
+
+class OutputFile(BaseModel):
+    filepath: str
+    size: int
+    last_modified: datetime
+    sha256: str
+
+
+class OutputManifest(BaseModel):
+    files: list[OutputFile]
+    total_size: int
+    archived_at: datetime = Field(default_factory=partial(datetime.now, tz=timezone.utc))
+
+
+class RunOutputCache:
+    """Local copies of outputs of concluded experiment runs.
+
+    Outputs are archived into the output folder of a run together with a manifest
+    of their sizes and checksums, the manifest being written only once all files
+    are stored. The total size of archived outputs is kept under a quota
+    by evicting outputs of the least recently accessed runs.
+    """
+
+    SERVICE: RunOutputCache | None = None
+
+    def __init__(self, quota: int) -> None:
+        self.logger = logging.getLogger("uvicorn")
+        self.quota = quota
+        self.hits = 0
+        self.misses = 0
+
+    async def archive(
+        self,
+        experiment_run: ExperimentRun,
+        workflow_engine: WorkflowEngineBase,
+        files: list[FileDetail] | None = None,
+    ) -> bool:
+        """Download outputs of a run from the workflow engine, `files` being
+        the current listing of the workflow workspace if it's already known.
+        Returns whether the outputs have been archived.
+        """
+        if files is None:
+            files = await workflow_engine.list_files(experiment_run)
+
+        output_prefix = f"{RUN_OUTPUT_FOLDER}/"
+        files = [
+            file
+            for file in files
+            if file.filepath.startswith(output_prefix) and not file.filepath.endswith("/")
+        ]
+        total_size = sum(file.size for file in files)
+        if total_size > self.quota:
+            self.logger.warning(
+                f"Outputs of ExperimentRun id={experiment_run.id} ({total_size} B) "
+                + "exceed the quota of the output cache and are not archived"
+            )
+            return False
+
+        output_files = []
+        for file in files:
+            savepath = self._resolve(experiment_run, file.filepath)
+            if savepath is None:
+                continue
+            output_file = await self._download(experiment_run, workflow_engine, file, savepath)
+            if output_file is None:
+                return False
+            output_files.append(output_file)
+
+        manifest = OutputManifest(
+            files=output_files, total_size=sum(file.size for file in output_files)
+        )
+        await asyncio.to_thread(self._write_manifest, experiment_run, manifest)
+        await asyncio.to_thread(self.evict)
+        return True
+
+    async def _download(
+        self,
+        experiment_run: ExperimentRun,
+        workflow_engine: WorkflowEngineBase,
+        file: FileDetail,
+        savepath: Path,
+    ) -> OutputFile | None:
+        file_stream = await workflow_engine.stream_file(experiment_run, file.filepath)
+        if file_stream is None:
+            self.logger.error(
+                f"Output file '{file.filepath}' of ExperimentRun id={experiment_run.id} "
+                + "could not be archived"
+            )
+            return None
+
+        savepath.parent.mkdir(parents=True, exist_ok=True)
+        checksum = hashlib.sha256()
+        size = 0
+        try:
+            async with aiof.open(savepath, "wb") as f:
+                async for chunk in file_stream.chunks:
+                    checksum.update(chunk)
+                    size += len(chunk)
+                    await f.write(chunk)
+        finally:
+            await file_stream.close()
+
+        return OutputFile(
+            filepath=file.filepath,
+            size=size,
+            last_modified=file.last_modified,
+            sha256=checksum.hexdigest(),
+        )
+
+    def get_manifest(self, experiment_run: ExperimentRun) -> OutputManifest | None:
+        manifest_path = self._get_manifest_path(experiment_run.run_path)
+        if not manifest_path.is_file():
+            return None
+        return OutputManifest.parse_file(manifest_path)
+
+    def list_files(self, experiment_run: ExperimentRun) -> list[FileDetail] | None:
+        manifest = self.get_manifest(experiment_run)
+        if manifest is None:
+            self.misses += 1
+            return None
+
+        self._touch(experiment_run)
+        self.hits += 1
+        return [
+            FileDetail(filepath=file.filepath, size=file.size, last_modified=file.last_modified)
+            for file in manifest.files
+        ]
+
+    def get_file(self, experiment_run: ExperimentRun, filepath: str) -> Path | None:
+        """Local path of an archived output file"""
+        manifest = self.get_manifest(experiment_run)
+        if manifest is None or not any(file.filepath == filepath for file in manifest.files):
+            self.misses += 1
+            return None
+
+        path = self._resolve(experiment_run, filepath)
+        if path is None or not path.is_file():
+            self.misses += 1
+            return None
+
+        self._touch(experiment_run)
+        self.hits += 1
+        return path
+
+    async def open_file(self, experiment_run: ExperimentRun, filepath: str) -> FileStream | None:
+        """Archived output file read chunk by chunk"""
+        path = self.get_file(experiment_run, filepath)
+        if path is None:
+            return None
+
+        f = await aiof.open(path, "rb")
+
+        async def iter_chunks() -> AsyncIterator[bytes]:
+            while chunk := await f.read(READ_CHUNK_SIZE):
+                yield chunk
+
+        return FileStream(filename=path.name, chunks=iter_chunks(), close=f.close)
+
+    def evict(self) -> None:
+        """Remove outputs of the least recently accessed runs until the cache fits the quota"""
+        manifests = []
+        for manifest_path in settings.userdata_path.glob(
+            f"{EXPERIMENT_RUN_DIR_PREFIX}*/{OUTPUT_MANIFEST_FILENAME}"
+        ):
+            try:
+                manifest = OutputManifest.parse_file(manifest_path)
+                accessed_at = manifest_path.stat().st_mtime
+            except (OSError, ValueError):
+                continue
+            manifests.append((accessed_at, manifest_path, manifest))
+
+        total_size = sum(manifest.total_size for _, _, manifest in manifests)
+        for _, manifest_path, manifest in sorted(manifests, key=lambda m: m[0]):
+            if total_size <= self.quota:
+                break
+            self._remove_outputs(manifest_path.parent, manifest)
+            total_size -= manifest.total_size
+
+    def stats(self) -> dict:
+        return {"quota": self.quota, "hits": self.hits, "misses": self.misses}
+
+    def _remove_outputs(self, run_path: Path, manifest: OutputManifest) -> None:
+        # Manifest goes first so that partially removed outputs are never served
+        self._get_manifest_path(run_path).unlink(missing_ok=True)
+        output_path = run_path / RUN_OUTPUT_FOLDER
+        for file in manifest.files:
+            path = run_path / file.filepath
+            # metrics are kept as they're part of the run details
+            if path != output_path / METRICS_FILENAME:
+                path.unlink(missing_ok=True)
+
+        for dirpath in sorted(output_path.glob("**/"), reverse=True):
+            if dirpath != output_path and not any(dirpath.iterdir()):
+                shutil.rmtree(dirpath, ignore_errors=True)
+
+    def _write_manifest(self, experiment_run: ExperimentRun, manifest: OutputManifest) -> None:
+        manifest_path = self._get_manifest_path(experiment_run.run_path)
+        temp_path = manifest_path.with_suffix(".tmp")
+        temp_path.write_text(manifest.json(), encoding="utf-8")
+        os.replace(temp_path, manifest_path)
+
+    def _touch(self, experiment_run: ExperimentRun) -> None:
+        try:
+            os.utime(self._get_manifest_path(experiment_run.run_path))
+        except OSError:
+            pass
+
+    def _resolve(self, experiment_run: ExperimentRun, filepath: str) -> Path | None:
+        """Local path of a file within the output folder of a run"""
+        output_path = experiment_run.run_output_path.resolve()
+        path = (experiment_run.run_path / filepath).resolve()
+        if output_path not in path.parents:
+            return None
+        return path
+
+    @staticmethod
+    def _get_manifest_path(run_path: Path) -> Path:
+        return run_path / OUTPUT_MANIFEST_FILENAME
+
+    @staticmethod
+    async def init() -> RunOutputCache:
+        RunOutputCache.SERVICE = RunOutputCache(quota=settings.RUN_OUTPUT_CACHE.QUOTA)
+        return RunOutputCache.SERVICE
+
+    @staticmethod
+    def get_service() -> RunOutputCache | None:
+        return RunOutputCache.SERVICE
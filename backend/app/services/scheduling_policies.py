@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from collections import defaultdict, deque
+
+from app.config import RunSchedulingConfig, SchedulingPolicyType
+from app.models.scheduled_job import ScheduledJob
+
+
+class SchedulingPolicyBase(ABC):
+    """Decides in which order queued jobs are claimed by the scheduler.
+
+    Besides ordering the jobs, the policy caps the number of jobs of each owner
+    that may be executed at the same time (across all replicas).
+    """
+
+    def __init__(
+        self,
+        max_running_per_owner: int = 0,
+        owner_max_running: dict[str, int] | None = None,
+    ) -> None:
+        self.max_running_per_owner = max_running_per_owner
+        self.owner_max_running = owner_max_running or {}
+
+    @property
+    @abstractmethod
+    def name(self) -> str:
+        pass
+
+    @abstractmethod
+    def order(
+        self, queued: list[ScheduledJob], running: dict[str | None, int]
+    ) -> list[ScheduledJob]:
+        """Order queued jobs (sorted by their enqueue time) by when they are to be executed,
+        given the number of jobs of individual owners that are being executed.
+        """
+        pass
+
+    def get_max_running(self, owner: str | None) -> int | None:
+        max_running = self.owner_max_running.get(owner or "", self.max_running_per_owner)
+        return max_running if max_running > 0 else None
+
+    def get_weight(self, owner: str | None) -> float:
+        return 1.0
+
+    def can_run(self, owner: str | None, running: dict[str | None, int]) -> bool:
+        max_running = self.get_max_running(owner)
+        return max_running is None or running.get(owner, 0) < max_running
+
+    def select(
+        self, queued: list[ScheduledJob], running: dict[str | None, int]
+    ) -> list[ScheduledJob]:
+        """Jobs that can be claimed right now, in the order they should be claimed"""
+        return [job for job in self.order(queued, running) if self.can_run(job.owner, running)]
+
+
+class FifoPolicy(SchedulingPolicyBase):
+    @property
+    def name(self) -> str:
+        return SchedulingPolicyType.FIFO.value
+
+    def order(
+        self, queued: list[ScheduledJob], running: dict[str | None, int]
+    ) -> list[ScheduledJob]:
+        return list(queued)
+
+
+class FairSharePolicy(SchedulingPolicyBase):
+    """Round-robin over owners weighted by their priority.
+
+    The next job belongs to the owner with the lowest number of running jobs
+    relative to their weight, ties are resolved in favour of the longest waiting job.
+    """
+
+    def __init__(
+        self,
+        max_running_per_owner: int = 0,
+        owner_max_running: dict[str, int] | None = None,
+        owner_weights: dict[str, float] | None = None,
+    ) -> None:
+        super().__init__(max_running_per_owner, owner_max_running)
+        self.owner_weights = owner_weights or {}
+
+    @property
+    def name(self) -> str:
+        return SchedulingPolicyType.FAIR_SHARE.value
+
+    def get_weight(self, owner: str | None) -> float:
+        return self.owner_weights.get(owner or "", 1.0)
+
+    def order(
+        self, queued: list[ScheduledJob], running: dict[str | None, int]
+    ) -> list[ScheduledJob]:
+        jobs_of_owners: dict[str | None, deque[ScheduledJob]] = defaultdict(deque)
+        for job in queued:
+            jobs_of_owners[job.owner].append(job)
+
+        running = defaultdict(int, running)
+        ordered_jobs = []
+        while len(jobs_of_owners) > 0:
+            owner = min(
+                jobs_of_owners,
+                key=lambda o: (running[o] / self.get_weight(o), jobs_of_owners[o][0].enqueued_at),
+            )
+            ordered_jobs.append(jobs_of_owners[owner].popleft())
+            running[owner] += 1
+            if len(jobs_of_owners[owner]) == 0:
+                del jobs_of_owners[owner]
+
+        return ordered_jobs
+
+
+def get_scheduling_policy(config: RunSchedulingConfig) -> SchedulingPolicyBase:
+    if config.POLICY == SchedulingPolicyType.FAIR_SHARE:
+        return FairSharePolicy(
+            config.MAX_RUNNING_PER_USER, config.USER_MAX_RUNNING, config.USER_WEIGHTS
+        )
+    return FifoPolicy(config.MAX_RUNNING_PER_USER, config.USER_MAX_RUNNING)
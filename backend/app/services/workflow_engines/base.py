@@ -3,7 +3,7 @@ from __future__ import annotations
 from abc import ABC, abstractmethod
 from pathlib import Path
 
-from app.helpers import FileDetail, WorkflowState
+from app.helpers import FileDetail, FileStream, WorkflowState
 from app.models.experiment import Experiment
 from app.models.experiment_run import ExperimentRun
 
@@ -52,10 +52,30 @@ class WorkflowEngineBase(ABC):
     ) -> Path | None:
         pass
 
+    @abstractmethod
+    async def stream_file(
+        self, experiment_run: ExperimentRun, filepath: str, byte_range: str | None = None
+    ) -> FileStream | None:
+        """Stream a file, or only the part of it requested by the HTTP Range header.
+        Returns None if the file doesn't exist.
+        """
+        pass
+
     @abstractmethod
     async def list_files(self, experiment_run: ExperimentRun) -> list[FileDetail]:
         pass
 
+    @abstractmethod
+    async def get_logs(self, experiment_run: ExperimentRun) -> str:
+        """Logs produced by the workflow so far, they only grow while the workflow is active.
+        Once the workflow has been postprocessed, the persisted logs are returned.
+        """
+        pass
+
+    def get_postprocess_stats(self) -> dict:
+        """Durations of individual stages of postprocessing"""
+        return {}
+
     @staticmethod
     @abstractmethod
     async def init() -> WorkflowEngineBase:
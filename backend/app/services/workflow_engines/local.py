@@ -0,0 +1,366 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import resource
+import shlex
+import shutil
+import signal
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import AsyncIterator
+
+import yaml
+from docker import DockerClient
+from docker.models.containers import Container
+
+from app.config import (
+    LOGS_FILENAME,
+    RUN_OUTPUT_FOLDER,
+    RUN_TEMP_OUTPUT_FOLDER,
+    LocalExecutionMode,
+    LocalWorkflowsConfig,
+    settings,
+)
+from app.helpers import (
+    FileDetail,
+    FileStream,
+    WorkflowState,
+    create_env_file,
+    iter_file_chunks,
+    parse_byte_range,
+)
+from app.models.experiment import Experiment
+from app.models.experiment_run import ExperimentRun
+from app.services.workflow_engines.base import WorkflowEngineBase
+
+# Same command as in the REANA specification of templates, in a POSIX shell
+COMMAND = "set -a && . ./.env && set +a && exec {python} script.py"
+CONTAINER_WORKSPACE = "/workspace"
+# Folders of a run that are exposed as the workspace of its workflow
+WORKSPACE_FOLDERS = (RUN_OUTPUT_FOLDER, RUN_TEMP_OUTPUT_FOLDER)
+
+
+class LocalWorkflowEngine(WorkflowEngineBase):
+    """Executes workflows on the host of RAIL itself.
+
+    The script of a template is executed either in a Docker container of the template
+    image or as a local Python process, in both cases within the folder of the run,
+    which serves as the workspace of the workflow. Logs are written to the logs file
+    of the run as they're produced.
+    """
+
+    def __init__(self, config: LocalWorkflowsConfig) -> None:
+        self.logger = logging.getLogger("uvicorn")
+        self.config = config
+        self.docker_client = (
+            DockerClient(base_url=settings.DOCKER_BASE_URL)
+            if config.MODE == LocalExecutionMode.DOCKER
+            else None
+        )
+        # Containers or processes of running workflows by workflow names
+        self.running: dict[str, Container | asyncio.subprocess.Process] = {}
+        # Workflows stopped ("stopped") or deleted ("deleted") on request
+        self.interrupted: dict[str, str] = {}
+
+    async def is_available(self) -> bool:
+        if self.docker_client is None:
+            return True
+        try:
+            return await asyncio.to_thread(self.docker_client.ping)
+        except Exception as e:
+            self.logger.error("Failed to ping Docker daemon", exc_info=e)
+            return False
+
+    async def preprocess_workflow(
+        self,
+        experiment_run: ExperimentRun,
+        experiment: Experiment,
+        environment_variables: dict[str, str],
+    ) -> bool:
+        await self.delete_workflow(experiment_run)
+
+        exp_run_folder = experiment_run.run_path
+        exp_template_folder = settings.get_experiment_template_path(
+            experiment.experiment_template_id
+        )
+        create_env_file(environment_variables, exp_run_folder / ".env")
+        shutil.copy(exp_template_folder / "reana.yaml", exp_run_folder / "reana.yaml")
+        shutil.copy(exp_template_folder / "script.py", exp_run_folder / "script.py")
+        exp_run_folder.joinpath(RUN_TEMP_OUTPUT_FOLDER).mkdir(exist_ok=True)
+
+        return True
+
+    async def run_workflow(self, experiment_run: ExperimentRun) -> WorkflowState:
+        exp_run_id = experiment_run.id
+        workflow_name = experiment_run.workflow_name
+
+        self.logger.info(f"\tRunning local workflow for ExperimentRun id={exp_run_id}")
+        error_log_msg = (
+            "\tThere was an error when running local workflow "
+            + f"for ExperimentRun id={exp_run_id}"
+        )
+        error_return_msg = "Error encountered when running a local workflow.\n\n"
+
+        self.interrupted.pop(workflow_name, None)
+        try:
+            if self.config.MODE == LocalExecutionMode.DOCKER:
+                exit_code = await self._run_container(experiment_run)
+            else:
+                exit_code = await self._run_process(experiment_run)
+        except Exception as e:
+            self.logger.error(error_log_msg, exc_info=e)
+            return WorkflowState(success=False, error_message=error_return_msg)
+        finally:
+            self.running.pop(workflow_name, None)
+
+        interruption = self.interrupted.pop(workflow_name, None)
+        if exit_code == 0 and interruption is None:
+            return WorkflowState(success=True)
+
+        if interruption is None:
+            self.logger.error(f"{error_log_msg} (exit code {exit_code})")
+        return WorkflowState(
+            success=False,
+            error_message=error_return_msg,
+            manually_stopped=interruption == "stopped",
+            manually_deleted=interruption == "deleted",
+        )
+
+    async def _run_process(self, experiment_run: ExperimentRun) -> int:
+        command = COMMAND.format(python=shlex.quote(self.config.PYTHON_EXECUTABLE))
+        # The script only gets its own variables, not the secrets RAIL is configured with
+        env = {"PATH": os.environ.get("PATH", os.defpath), "PYTHONUNBUFFERED": "1"}
+
+        with experiment_run.logs_path.open("ab") as log_file:
+            process = await asyncio.create_subprocess_exec(
+                "sh",
+                "-c",
+                command,
+                cwd=experiment_run.run_path,
+                env=env,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=log_file,
+                stderr=asyncio.subprocess.STDOUT,
+                preexec_fn=self._limit_process,
+                # the script and its children are killed together when stopped
+                start_new_session=True,
+            )
+        self.running[experiment_run.workflow_name] = process
+        return await process.wait()
+
+    def _limit_process(self) -> None:
+        if self.config.MEMORY_LIMIT > 0:
+            limit = self.config.MEMORY_LIMIT
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    async def _run_container(self, experiment_run: ExperimentRun) -> int:
+        container = await asyncio.to_thread(
+            self.docker_client.containers.run,
+            self._get_image(experiment_run),
+            command=["sh", "-c", COMMAND.format(python="python")],
+            working_dir=CONTAINER_WORKSPACE,
+            volumes={
+                str(self._get_host_path(experiment_run.run_path)): {
+                    "bind": CONTAINER_WORKSPACE,
+                    "mode": "rw",
+                }
+            },
+            environment={"PYTHONUNBUFFERED": "1"},
+            # outputs are owned by RAIL so that it can remove them later on
+            user=f"{os.getuid()}:{os.getgid()}",
+            nano_cpus=int(self.config.CPU_LIMIT * 1e9) or None,
+            mem_limit=self.config.MEMORY_LIMIT or None,
+            detach=True,
+        )
+        self.running[experiment_run.workflow_name] = container
+        try:
+            return await asyncio.to_thread(
+                self._follow_container, container, experiment_run.logs_path
+            )
+        finally:
+            await asyncio.to_thread(container.remove, force=True)
+
+    @staticmethod
+    def _follow_container(container: Container, log_path: Path) -> int:
+        """Write logs of a container as they're produced and return its exit code"""
+        with log_path.open("ab") as log_file:
+            for chunk in container.logs(stream=True, follow=True):
+                log_file.write(chunk)
+                log_file.flush()
+        return container.wait()["StatusCode"]
+
+    @staticmethod
+    def _get_image(experiment_run: ExperimentRun) -> str:
+        with experiment_run.run_path.joinpath("reana.yaml").open() as fp:
+            reana_cfg = yaml.safe_load(fp)
+        return reana_cfg["workflow"]["specification"]["steps"][0]["environment"]
+
+    def _get_host_path(self, path: Path) -> Path:
+        """Path on the Docker host of a path within EEE_DATA_PATH"""
+        if self.config.HOST_DATA_PATH is None:
+            return path.resolve()
+        return self.config.HOST_DATA_PATH / path.resolve().relative_to(
+            settings.EEE_DATA_PATH.resolve()
+        )
+
+    async def stop_workflow(self, experiment_run: ExperimentRun) -> bool:
+        return await self._interrupt_workflow(experiment_run, "stopped")
+
+    async def delete_workflow(self, experiment_run: ExperimentRun) -> bool:
+        # Workspace of the workflow is the folder of the run, which is removed with the run
+        return await self._interrupt_workflow(experiment_run, "deleted")
+
+    async def _interrupt_workflow(self, experiment_run: ExperimentRun, interruption: str) -> bool:
+        workflow_name = experiment_run.workflow_name
+        workflow = self.running.get(workflow_name)
+        if workflow is None:
+            return True
+
+        self.interrupted[workflow_name] = interruption
+        try:
+            if isinstance(workflow, asyncio.subprocess.Process):
+                os.killpg(workflow.pid, signal.SIGKILL)
+            else:
+                await asyncio.to_thread(workflow.kill)
+        except (ProcessLookupError, PermissionError):
+            # the workflow has concluded meanwhile
+            pass
+        except Exception as e:
+            action = "stop" if interruption == "stopped" else "delete"
+            self.logger.error(
+                f"There was error when trying to {action} a local workflow", exc_info=e
+            )
+            return False
+        return True
+
+    async def postprocess_workflow(
+        self, experiment_run: ExperimentRun, workflow_state: WorkflowState
+    ) -> None:
+        try:
+            await asyncio.to_thread(self._move_outputs, experiment_run.run_path)
+        except Exception as e:
+            self.logger.error(
+                "There was an error when postprocessing an experiment run", exc_info=e
+            )
+
+        if workflow_state.success is False:
+            # appended to keep offsets of logs that were streamed before valid
+            with experiment_run.logs_path.open("a", encoding="utf-8") as f:
+                f.write(f"\n{workflow_state.error_message}")
+
+    @staticmethod
+    def _move_outputs(run_path: Path) -> None:
+        temp_output_path = run_path / RUN_TEMP_OUTPUT_FOLDER
+        if not temp_output_path.is_dir():
+            return
+
+        output_path = run_path / RUN_OUTPUT_FOLDER
+        output_path.mkdir(exist_ok=True)
+        for path in temp_output_path.iterdir():
+            target = output_path / path.name
+            if target.is_dir():
+                shutil.rmtree(target)
+            shutil.move(path, target)
+        temp_output_path.rmdir()
+
+    async def download_file(
+        self, experiment_run: ExperimentRun, filepath: str, savedir: Path
+    ) -> Path | None:
+        path = self._resolve(experiment_run, filepath)
+        if path is None or not path.is_file():
+            return None
+
+        savepath = savedir / path.name
+        if savepath.resolve() != path:
+            savedir.mkdir(parents=True, exist_ok=True)
+            await asyncio.to_thread(shutil.copyfile, path, savepath)
+        return savepath
+
+    async def stream_file(
+        self, experiment_run: ExperimentRun, filepath: str, byte_range: str | None = None
+    ) -> FileStream | None:
+        path = self._resolve(experiment_run, filepath)
+        if path is None or not path.is_file():
+            return None
+
+        file_size = path.stat().st_size
+        headers = {"Accept-Ranges": "bytes"}
+        if byte_range is None:
+            chunks = iter_file_chunks(path)
+            headers["Content-Length"] = str(file_size)
+            return FileStream(
+                filename=path.name, chunks=chunks, close=chunks.aclose, headers=headers
+            )
+
+        requested_range = parse_byte_range(byte_range, file_size)
+        if requested_range is None:
+            chunks = _empty_chunks()
+            headers["Content-Range"] = f"bytes */{file_size}"
+            return FileStream(
+                filename=path.name,
+                chunks=chunks,
+                close=chunks.aclose,
+                status_code=416,
+                headers=headers,
+            )
+
+        start, end = requested_range
+        chunks = iter_file_chunks(path, start, end)
+        headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return FileStream(
+            filename=path.name, chunks=chunks, close=chunks.aclose, status_code=206, headers=headers
+        )
+
+    async def list_files(self, experiment_run: ExperimentRun) -> list[FileDetail]:
+        return await asyncio.to_thread(self._list_files, experiment_run.run_path)
+
+    @staticmethod
+    def _list_files(run_path: Path) -> list[FileDetail]:
+        files = []
+        for folder in WORKSPACE_FOLDERS:
+            for path in sorted(run_path.joinpath(folder).rglob("*")):
+                if not path.is_file():
+                    continue
+                stat = path.stat()
+                files.append(
+                    FileDetail(
+                        filepath=path.relative_to(run_path).as_posix(),
+                        size=stat.st_size,
+                        last_modified=datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc),
+                    )
+                )
+        return files
+
+    async def get_logs(self, experiment_run: ExperimentRun) -> str:
+        log_path = experiment_run.run_path / LOGS_FILENAME
+        if not log_path.is_file():
+            return ""
+        return await asyncio.to_thread(log_path.read_text, encoding="utf-8", errors="replace")
+
+    @staticmethod
+    def _resolve(experiment_run: ExperimentRun, filepath: str) -> Path | None:
+        """Local path of a file within the workspace of a workflow"""
+        run_path = experiment_run.run_path.resolve()
+        path = (run_path / filepath).resolve()
+        if not any(run_path / folder in path.parents for folder in WORKSPACE_FOLDERS):
+            return None
+        return path
+
+    @staticmethod
+    async def init() -> LocalWorkflowEngine:
+        service = LocalWorkflowEngine(settings.LOCAL_WORKFLOWS)
+
+        if not await service.is_available():
+            raise SystemExit(
+                f"Unable to connect to Docker daemon '{settings.DOCKER_BASE_URL}'. Exiting..."
+            )
+        WorkflowEngineBase.set_service(service)
+        return service
+
+
+async def _empty_chunks() -> AsyncIterator[bytes]:
+    return
+    yield
@@ -1,15 +1,21 @@
 from __future__ import annotations
 
 import asyncio
+import json
 import logging
 import os
-import re
 import shutil
-import subprocess
+import time
+from collections import defaultdict
+from contextlib import contextmanager
 from pathlib import Path
+from typing import AsyncIterator, Iterator
+from urllib.parse import quote
 
 import aiofiles as aiof
+import httpx
 from reana_client.api import client
+from reana_commons.specification import load_reana_spec
 
 from app.config import (
     LOGS_FILENAME,
@@ -18,13 +24,28 @@ from app.config import (
     RUN_TEMP_OUTPUT_FOLDER,
     settings,
 )
-from app.helpers import FileDetail, WorkflowState, create_env_file
+from app.helpers import (
+    DurationStats,
+    FileDetail,
+    FileStream,
+    SingleFlight,
+    TTLCache,
+    WorkflowState,
+    create_env_file,
+)
 from app.models.experiment import Experiment
 from app.models.experiment_run import ExperimentRun
+from app.services.run_output_cache import RunOutputCache
 from app.services.workflow_engines.base import (
     WorkflowConnectionException,
     WorkflowEngineBase,
 )
+from app.services.workflow_engines.reana_health import ReanaHealthMonitor
+from app.services.workflow_engines.reana_watcher import ReanaWorkflowWatcher
+
+DOWNLOAD_CHUNK_SIZE = 1024**2  # 1MB
+PROXIED_FILE_HEADERS = ("Content-Length", "Content-Range", "Accept-Ranges", "Last-Modified")
+LOGS_CACHE_SIZE = 256
 
 
 class ReanaConnectionException(WorkflowConnectionException):
@@ -35,9 +56,29 @@ class ReanaService(WorkflowEngineBase):
     def __init__(self) -> None:
         # self.logger = setup_logging("reana")
         self.logger = logging.getLogger("uvicorn")
+        self.health_monitor = ReanaHealthMonitor(
+            self._ping,
+            interval=settings.REANA_HEALTH_CHECK_INTERVAL,
+            max_backoff=settings.REANA_HEALTH_CHECK_MAX_BACKOFF,
+        )
+        # Files are streamed from REANA directly, the access token is sent in the query
+        verify = settings.REANA_VERIFY_TLS
+        self.http_client = httpx.AsyncClient(
+            base_url=settings.REANA_SERVER_URL,
+            verify=str(verify) if isinstance(verify, Path) else verify,
+            timeout=60,
+        )
+        self.watcher = ReanaWorkflowWatcher(
+            self._async_reana_call, interval=settings.REANA_STATUS_POLL_INTERVAL
+        )
+        self.postprocess_durations: defaultdict[str, DurationStats] = defaultdict(DurationStats)
+        self.logs_cache = TTLCache(maxsize=LOGS_CACHE_SIZE, ttl=settings.LOGS_STREAM_INTERVAL)
+        self._log_fetches = SingleFlight()
 
     async def is_available(self) -> bool:
-        return self._ping()
+        if self.health_monitor.available is None:
+            return await self.health_monitor.check()
+        return self.health_monitor.available
 
     async def preprocess_workflow(
         self,
@@ -59,7 +100,6 @@ class ReanaService(WorkflowEngineBase):
 
     async def run_workflow(self, experiment_run: ExperimentRun) -> WorkflowState:
         exp_run_id = experiment_run.id
-        exp_run_folder = experiment_run.run_path
         workflow_name = experiment_run.workflow_name
 
         self.logger.info(f"\tRunning REANA workflow for ExperimentRun id={exp_run_id}")
@@ -70,40 +110,63 @@ class ReanaService(WorkflowEngineBase):
         error_return_msg = "Error encountered when running a REANA workflow.\n\n"
 
         try:
-            reana_command = f"reana-client run -w {workflow_name} --follow"
-            result = await asyncio.to_thread(
-                subprocess.run,
-                f"cd {exp_run_folder}; {reana_command}",
-                capture_output=True,
-                shell=True,
-                text=True,
-            )
+            await self._call_reana(self._submit_workflow, experiment_run)
+            status = await self.watcher.wait(workflow_name)
+        except ReanaConnectionException as e:
+            raise e
         except Exception as e:
             self.logger.error(error_log_msg, exc_info=e)
             return WorkflowState(success=False, error_message=error_return_msg)
 
-        if result.returncode != 0:
-            manually_stopped = self._is_manually_stopped(experiment_run, result.stderr)
-            manually_deleted = self._is_manually_deleted(experiment_run, result.stderr)
-            if manually_stopped is False and manually_deleted is False:
-                self.logger.error(error_log_msg)
-
-            return WorkflowState(
-                success=False,
-                error_message=error_return_msg,
-                manually_stopped=manually_stopped,
-                manually_deleted=manually_deleted,
-            )
+        if status == "finished":
+            return WorkflowState(success=True)
 
-        return WorkflowState(success=True)
+        manually_stopped = status == "stopped"
+        manually_deleted = status == "deleted"
+        if manually_stopped is False and manually_deleted is False:
+            self.logger.error(error_log_msg)
 
-    def _is_manually_stopped(self, experiment_run: ExperimentRun, stderr: str) -> bool:
-        pattern = experiment_run.workflow_name + r"\.[0-9]+ has been stopped"
-        return len(re.findall(pattern, stderr)) > 0
+        return WorkflowState(
+            success=False,
+            error_message=error_return_msg,
+            manually_stopped=manually_stopped,
+            manually_deleted=manually_deleted,
+        )
 
-    def _is_manually_deleted(self, experiment_run: ExperimentRun, stderr: str) -> bool:
-        pattern = experiment_run.workflow_name + r".[0-9]+ has been deleted"
-        return len(re.findall(pattern, stderr)) > 0
+    def _submit_workflow(self, experiment_run: ExperimentRun) -> None:
+        """Create a workflow, upload its inputs and start it"""
+        access_token = settings.REANA_ACCESS_TOKEN
+        workflow_name = experiment_run.workflow_name
+        exp_run_folder = experiment_run.run_path
+        reana_spec = load_reana_spec(
+            str(exp_run_folder / "reana.yaml"), workspace_path=str(exp_run_folder)
+        )
+        client.create_workflow(reana_spec, workflow_name, access_token)
+
+        for filepath in self._get_input_files(exp_run_folder, reana_spec):
+            with filepath.open("rb") as f:
+                client.upload_file(
+                    workflow_name,
+                    f,
+                    str(filepath.relative_to(exp_run_folder)),
+                    access_token,
+                )
+
+        client.start_workflow(
+            workflow_name,
+            access_token,
+            {"input_parameters": {}, "operational_options": {}},
+        )
+
+    def _get_input_files(self, exp_run_folder: Path, reana_spec: dict) -> list[Path]:
+        inputs = reana_spec.get("inputs") or {}
+        filepaths = [exp_run_folder / "reana.yaml"]
+        filepaths.extend(exp_run_folder / file for file in inputs.get("files") or [])
+        for directory in inputs.get("directories") or []:
+            filepaths.extend(
+                path for path in sorted((exp_run_folder / directory).rglob("*")) if path.is_file()
+            )
+        return filepaths
 
     async def stop_workflow(self, experiment_run: ExperimentRun) -> bool:
         return await self._stop_and_delete_workflow(experiment_run, delete_workflow=False)
@@ -146,81 +209,212 @@ class ReanaService(WorkflowEngineBase):
 
     async def postprocess_workflow(
         self, experiment_run: ExperimentRun, workflow_state: WorkflowState
+    ) -> None:
+        # Logs are retrieved while outputs are being postprocessed
+        timings: dict[str, float] = {}
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            self._save_logs(experiment_run, workflow_state, timings),
+            self._postprocess_outputs(experiment_run, timings),
+            return_exceptions=True,
+        )
+        timings["total"] = time.perf_counter() - start
+        self.postprocess_durations["total"].add(timings["total"])
+        self.logger.info(
+            f"\tPostprocessing of ExperimentRun id={experiment_run.id} took "
+            + ", ".join(f"{stage}={duration:.2f}s" for stage, duration in timings.items())
+        )
+
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    async def _save_logs(
+        self,
+        experiment_run: ExperimentRun,
+        workflow_state: WorkflowState,
+        timings: dict[str, float],
+    ) -> None:
+        try:
+            with self._measure_stage("logs", timings):
+                raw_logs = await self._fetch_logs(experiment_run.workflow_name)
+                # only the output of jobs is kept, so that the logs can be read in parts
+                logs = self._extract_job_logs(raw_logs)
+
+                if workflow_state.success is False:
+                    # appended to keep offsets of logs that were streamed before valid
+                    logs = f"{logs}\n{workflow_state.error_message}"
+                await asyncio.to_thread(
+                    experiment_run.run_path.joinpath(LOGS_FILENAME).write_text,
+                    logs,
+                    encoding="utf-8",
+                )
+        except ReanaConnectionException as e:
+            raise e
+        except Exception as e:
+            self.logger.error(
+                "There was an error when retrieving logs from an experiment run",
+                exc_info=e,
+            )
+
+    async def _postprocess_outputs(
+        self, experiment_run: ExperimentRun, timings: dict[str, float]
     ) -> None:
         workflow_name = experiment_run.workflow_name
-        exp_dirpath = experiment_run.run_path
-        exp_output_dirpath = experiment_run.run_output_path
+        # Listing of the workspace is reused by all stages as long as it's up to date
+        files: list[FileDetail] | None = None
 
         # general postprocessing
         try:
-            await self._async_reana_call(
-                "prune_workspace",
-                workflow=workflow_name,
-                include_inputs=True,
-                include_outputs=False,
-            )
-            if await self._exists_file(experiment_run, f"{RUN_TEMP_OUTPUT_FOLDER}/"):
+            with self._measure_stage("prune", timings):
                 await self._async_reana_call(
-                    "mv_files",
-                    source=RUN_TEMP_OUTPUT_FOLDER,
-                    target=RUN_OUTPUT_FOLDER,
+                    "prune_workspace",
                     workflow=workflow_name,
+                    include_inputs=True,
+                    include_outputs=False,
                 )
+            with self._measure_stage("list_files", timings):
+                files = await self.list_files(experiment_run)
+
+            temp_output_prefix = f"{RUN_TEMP_OUTPUT_FOLDER}/"
+            if any(file.filepath.startswith(temp_output_prefix) for file in files):
+                with self._measure_stage("move_outputs", timings):
+                    await self._async_reana_call(
+                        "mv_files",
+                        source=RUN_TEMP_OUTPUT_FOLDER,
+                        target=RUN_OUTPUT_FOLDER,
+                        workflow=workflow_name,
+                    )
+                files = None
         except ReanaConnectionException as e:
             raise e
         except Exception as e:
             self.logger.error(
                 "There was an error when postprocessing an experiment run", exc_info=e
             )
+            files = None
 
-        # retrieve logs
-        try:
-            logs = (await self._async_reana_call("get_workflow_logs", workflow=workflow_name))[
-                "logs"
-            ]
+        with self._measure_stage("outputs", timings):
+            if files is None:
+                files = await self.list_files(experiment_run)
 
-            if workflow_state.success is False:
-                logs = f"{workflow_state.error_message}{logs}"
-            exp_dirpath.joinpath(LOGS_FILENAME).write_text(logs, encoding="utf-8")
+            # archive outputs, including metrics.json
+            if await self._archive_outputs(experiment_run, files):
+                return
+
+            # save metrics.json
+            metrics_filepath = f"{RUN_OUTPUT_FOLDER}/{METRICS_FILENAME}"
+            if any(file.filepath == metrics_filepath for file in files):
+                await self.download_file(
+                    experiment_run, metrics_filepath, experiment_run.run_output_path
+                )
+
+    async def _archive_outputs(
+        self, experiment_run: ExperimentRun, files: list[FileDetail]
+    ) -> bool:
+        run_output_cache = RunOutputCache.get_service()
+        if run_output_cache is None:
+            return False
+
+        try:
+            return await run_output_cache.archive(experiment_run, self, files=files)
         except ReanaConnectionException as e:
             raise e
         except Exception as e:
             self.logger.error(
-                "There was an error when retrieving logs from an experiment run",
-                exc_info=e,
+                "There was an error when archiving outputs of an experiment run", exc_info=e
             )
+            return False
 
-        # save metrics.json
-        metrics_filepath = f"{RUN_OUTPUT_FOLDER}/{METRICS_FILENAME}"
-        if await self._exists_file(experiment_run, metrics_filepath):
-            await self.download_file(experiment_run, metrics_filepath, exp_output_dirpath)
+    @contextmanager
+    def _measure_stage(self, stage: str, timings: dict[str, float]) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            timings[stage] = time.perf_counter() - start
+            self.postprocess_durations[stage].add(timings[stage])
+
+    def get_postprocess_stats(self) -> dict:
+        return {stage: stats.stats() for stage, stats in self.postprocess_durations.items()}
 
     async def download_file(
         self, experiment_run: ExperimentRun, filepath: str, savedir: Path
     ) -> Path | None:
+        file_stream = await self.stream_file(experiment_run, filepath)
+        if file_stream is None:
+            return None
+
+        savedir.mkdir(parents=True, exist_ok=True)
+        try:
+            async with aiof.open(savedir / file_stream.filename, "wb") as f:
+                async for chunk in file_stream.chunks:
+                    await f.write(chunk)
+        finally:
+            await file_stream.close()
+
+        return savedir / file_stream.filename
+
+    async def stream_file(
+        self, experiment_run: ExperimentRun, filepath: str, byte_range: str | None = None
+    ) -> FileStream | None:
+        if not self.health_monitor.is_available:
+            raise ReanaConnectionException("REANA server is unavailable")
+
         filepath = filepath[:-1] if filepath.endswith("/") else filepath
+        # Content is proxied as is, hence it must not be compressed by REANA
+        headers = {"Accept-Encoding": "identity"}
+        if byte_range is not None:
+            headers["Range"] = byte_range
+
+        request = self.http_client.build_request(
+            "GET",
+            f"/api/workflows/{experiment_run.workflow_name}/workspace/{quote(filepath)}",
+            params={"access_token": settings.REANA_ACCESS_TOKEN},
+            headers=headers,
+        )
         try:
-            data, _, zipped = await self._async_reana_call(
-                "download_file",
-                workflow=experiment_run.workflow_name,
-                file_name=filepath,
-            )
-        except ReanaConnectionException as e:
-            raise e
-        except Exception as e:
+            response = await self.http_client.send(request, stream=True)
+        except httpx.TransportError as e:
+            if not await self.health_monitor.check():
+                raise ReanaConnectionException("Unable to connect to REANA server") from e
             self.logger.error(
                 "There was error when trying to download a file from REANA workflow",
                 exc_info=e,
             )
             return None
 
-        savedir.mkdir(parents=True, exist_ok=True)
-        filename = os.path.basename(f"{filepath}.zip" if zipped else filepath)
+        if response.status_code not in (200, 206, 416):
+            await response.aclose()
+            if response.status_code != 404:
+                self.logger.error(
+                    "There was error when trying to download a file from REANA workflow "
+                    + f"(status code {response.status_code})"
+                )
+            return None
 
-        async with aiof.open(savedir / filename, "wb") as f:
-            await f.write(data)
+        # Directories are downloaded as zip archives
+        zipped = response.headers.get("Content-Type") == "application/zip"
+        filename = os.path.basename(f"{filepath}.zip" if zipped else filepath)
 
-        return savedir / filename
+        async def iter_chunks() -> AsyncIterator[bytes]:
+            try:
+                async for chunk in response.aiter_raw(DOWNLOAD_CHUNK_SIZE):
+                    yield chunk
+            finally:
+                await response.aclose()
+
+        return FileStream(
+            filename=filename,
+            chunks=iter_chunks(),
+            close=response.aclose,
+            status_code=response.status_code,
+            headers={
+                header: response.headers[header]
+                for header in PROXIED_FILE_HEADERS
+                if header in response.headers
+            },
+        )
 
     async def list_files(self, experiment_run: ExperimentRun) -> list[FileDetail]:
         files = await self._async_reana_call("list_files", workflow=experiment_run.workflow_name)
@@ -233,14 +427,53 @@ class ReanaService(WorkflowEngineBase):
             for file in files
         ]
 
-    async def _exists_file(self, experiment_run: ExperimentRun, filepath: str) -> bool:
-        matching_files = await self._async_reana_call(
-            "list_files", workflow=experiment_run.workflow_name, file_name=filepath
-        )
-        return len(matching_files) > 0
+    async def get_logs(self, experiment_run: ExperimentRun) -> str:
+        log_path = experiment_run.run_path / LOGS_FILENAME
+        if log_path.is_file():
+            return await asyncio.to_thread(log_path.read_text, encoding="utf-8")
+
+        workflow_name = experiment_run.workflow_name
+        raw_logs = self.logs_cache.get(workflow_name)
+        if raw_logs is None:
+            # logs of a workflow followed by multiple clients are fetched once per interval
+            raw_logs = await self._log_fetches.do(
+                workflow_name, lambda: self._fetch_logs(workflow_name)
+            )
+            self.logs_cache.set(workflow_name, raw_logs)
+        return self._extract_job_logs(raw_logs)
+
+    async def _fetch_logs(self, workflow_name: str) -> str:
+        return (await self._async_reana_call("get_workflow_logs", workflow=workflow_name))["logs"]
+
+    @staticmethod
+    def _extract_job_logs(raw_logs: str) -> str:
+        """Output of workflow jobs from the logs returned by REANA"""
+        try:
+            job_logs = json.loads(raw_logs).get("job_logs") or {}
+        except (ValueError, AttributeError):
+            return raw_logs
+        return "".join(job.get("logs") or "" for job in job_logs.values())
 
     async def _async_reana_call(self, function_name, *args, **kwargs):
-        return await asyncio.to_thread(self._reana_call, function_name, *args, **kwargs)
+        return await self._call_reana(
+            getattr(client, function_name),
+            *args,
+            **kwargs,
+            access_token=settings.REANA_ACCESS_TOKEN,
+        )
+
+    async def _call_reana(self, function, *args, **kwargs):
+        """Call REANA in a separate thread unless it's known to be unavailable"""
+        if not self.health_monitor.is_available:
+            raise ReanaConnectionException("REANA server is unavailable")
+
+        try:
+            return await asyncio.to_thread(function, *args, **kwargs)
+        except Exception as e:
+            # Only a failed call makes us re-check the connection right away
+            if not await self.health_monitor.check():
+                raise ReanaConnectionException("Unable to connect to REANA server") from e
+            raise e
 
     def _ping(self) -> bool:
         for _ in range(5):
@@ -249,13 +482,6 @@ class ReanaService(WorkflowEngineBase):
                 return True
         return False
 
-    def _reana_call(self, function_name, *args, **kwargs):
-        if not self._ping():
-            raise ReanaConnectionException("Unable to connect to REANA server")
-        return getattr(client, function_name)(
-            *args, **kwargs, access_token=settings.REANA_ACCESS_TOKEN
-        )
-
     @staticmethod
     async def init() -> ReanaService:
         service = ReanaService()
@@ -264,5 +490,6 @@ class ReanaService(WorkflowEngineBase):
             raise SystemExit(
                 f"Unable to connect to REANA server '{settings.REANA_SERVER_URL}'. Exiting..."
             )
+        asyncio.create_task(service.health_monitor.run())
         WorkflowEngineBase.set_service(service)
         return service
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Callable
+
+from app.helpers import SingleFlight
+
+# Delay before the first re-check of an unavailable REANA server, doubled after each failure
+INITIAL_BACKOFF = 1
+
+
+class ReanaHealthMonitor:
+    """Cached availability of the REANA server.
+
+    The availability is re-checked periodically in the background, more often
+    (with exponential backoff) while REANA is unavailable. While REANA is known
+    to be unavailable, calls to it are refused right away (the circuit is open).
+    """
+
+    def __init__(self, ping: Callable[[], bool], interval: float, max_backoff: float) -> None:
+        self.logger = logging.getLogger("uvicorn")
+
+        self.ping = ping
+        self.interval = interval
+        self.max_backoff = max_backoff
+
+        self.available: bool | None = None
+        self.checked_at: datetime | None = None
+        self.consecutive_failures = 0
+        self.check_count = 0
+        self._checks = SingleFlight()
+
+    @property
+    def is_available(self) -> bool:
+        """Whether REANA should be called, it's assumed available until checked"""
+        return self.available is not False
+
+    async def check(self) -> bool:
+        """Ping REANA and update the cached state. Concurrent checks share a single ping."""
+        return await self._checks.do("ping", self._check)
+
+    async def _check(self) -> bool:
+        try:
+            available = await asyncio.to_thread(self.ping)
+        except Exception as e:
+            self.logger.error("Failed to ping REANA server", exc_info=e)
+            available = False
+
+        if available is False and self.available is not False:
+            self.logger.error("REANA server has become unavailable")
+        elif available is True and self.available is False:
+            self.logger.info("REANA server is available again")
+
+        self.available = available
+        self.checked_at = datetime.now(tz=timezone.utc)
+        self.consecutive_failures = 0 if available else self.consecutive_failures + 1
+        self.check_count += 1
+        return available
+
+    def get_next_check_delay(self) -> float:
+        if self.consecutive_failures == 0:
+            return self.interval
+        return min(INITIAL_BACKOFF * 2 ** (self.consecutive_failures - 1), self.max_backoff)
+
+    async def run(self) -> None:
+        """Periodically re-check the availability of REANA"""
+        while True:
+            await asyncio.sleep(self.get_next_check_delay())
+            await self.check()
+
+    def stats(self) -> dict:
+        return {
+            "available": self.available,
+            "checked_at": self.checked_at,
+            "consecutive_failures": self.consecutive_failures,
+            "check_count": self.check_count,
+            "next_check_in": self.get_next_check_delay(),
+        }
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+from typing import Any, Awaitable, Callable
+
+from app.services.workflow_engines.base import WorkflowConnectionException
+
+ACTIVE_STATUSES = ["created", "queued", "pending", "running"]
+
+# Number of consecutive failed polls after which the watched workflows are given up on,
+# failures to connect to REANA are not counted as the workflows keep running meanwhile
+MAX_FAILED_POLLS = 5
+# Messages of REANA errors meaning that a workflow doesn't exist (anymore)
+WORKFLOW_NOT_FOUND = re.compile(r"does not exist|not found", re.IGNORECASE)
+
+
+class ReanaWorkflowWatcher:
+    """Waits for REANA workflows to conclude.
+
+    Instead of following each workflow separately, the statuses of all watched
+    workflows are polled by a single task listing the active workflows once per
+    `interval` seconds. The final status is only fetched for workflows that are
+    not active anymore.
+    """
+
+    def __init__(self, reana_call: Callable[..., Awaitable[Any]], interval: float) -> None:
+        self.logger = logging.getLogger("uvicorn")
+
+        self.reana_call = reana_call
+        self.interval = interval
+        self.watched: dict[str, asyncio.Future[str]] = {}
+        # Consecutive failures to fetch the final status of individual workflows
+        self.failed_status_fetches: dict[str, int] = {}
+        self._task: asyncio.Task | None = None
+
+    async def wait(self, workflow_name: str) -> str:
+        """Wait until a workflow concludes and return its final status"""
+        future = self.watched.get(workflow_name)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self.watched[workflow_name] = future
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._watch())
+
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if self.watched.get(workflow_name) is future:
+                del self.watched[workflow_name]
+                self.failed_status_fetches.pop(workflow_name, None)
+
+    async def _watch(self) -> None:
+        failed_polls = 0
+        while len(self.watched) > 0:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.poll()
+                failed_polls = 0
+            except WorkflowConnectionException as e:
+                self.logger.warning(f"Statuses of REANA workflows cannot be polled: {e}")
+            except Exception as e:
+                failed_polls += 1
+                self.logger.error("Failed to poll statuses of REANA workflows", exc_info=e)
+                if failed_polls >= MAX_FAILED_POLLS:
+                    self._fail_all(e)
+                    failed_polls = 0
+
+    async def poll(self) -> None:
+        active_workflows = await self.reana_call(
+            "get_workflows", type="batch", status=ACTIVE_STATUSES
+        )
+        active_names = {self._strip_run_number(w["name"]) for w in active_workflows}
+
+        for workflow_name, future in list(self.watched.items()):
+            if workflow_name in active_names or future.done():
+                continue
+            status = await self._get_final_status(workflow_name)
+            if status is not None:
+                future.set_result(status)
+
+    async def _get_final_status(self, workflow_name: str) -> str | None:
+        """Final status of a concluded workflow, None if it should be fetched again
+        on the next poll. Workflows whose status cannot be fetched repeatedly are failed.
+        """
+        try:
+            response = await self.reana_call("get_workflow_status", workflow=workflow_name)
+            status = response["status"]
+        except WorkflowConnectionException:
+            raise
+        except Exception as e:
+            if WORKFLOW_NOT_FOUND.search(str(e)):
+                return "deleted"
+
+            failures = self.failed_status_fetches.get(workflow_name, 0) + 1
+            self.failed_status_fetches[workflow_name] = failures
+            self.logger.error(
+                f"Failed to fetch the status of REANA workflow '{workflow_name}' "
+                + f"(attempt {failures}/{MAX_FAILED_POLLS})",
+                exc_info=e,
+            )
+            return "failed" if failures >= MAX_FAILED_POLLS else None
+
+        self.failed_status_fetches.pop(workflow_name, None)
+        return status
+
+    def _fail_all(self, exception: Exception) -> None:
+        for future in self.watched.values():
+            if not future.done():
+                future.set_exception(exception)
+
+    @staticmethod
+    def _strip_run_number(name: str) -> str:
+        return re.sub(r"\.[0-9]+$", "", name)
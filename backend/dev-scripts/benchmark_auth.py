@@ -0,0 +1,115 @@
+"""Compare the latency of authenticated requests between token verification modes.
+
+Run from the `backend` directory (so that the `.env` file and the `app` package are found):
+
+    python dev-scripts/benchmark_auth.py --requests 200 --concurrency 20 --token <ACCESS_TOKEN>
+
+If no token is provided, Keycloak is simulated: a signing key is generated locally and
+the userinfo endpoint is replaced by a blocking call taking `--userinfo-latency` seconds.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from unittest.mock import patch
+
+import httpx
+import rsa
+from fastapi import Depends, FastAPI
+from jose import jwk, jwt
+
+from app import auth
+from app.config import TokenVerificationMode, settings
+
+bench_app = FastAPI()
+
+
+@bench_app.get("/whoami")
+async def whoami(user: dict = Depends(auth.get_current_user_or_raise)) -> str:
+    return user["sub"]
+
+
+async def measure(token: str, n_requests: int, concurrency: int) -> list[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async with httpx.AsyncClient(app=bench_app, base_url="http://bench") as client:
+
+        async def single_request() -> None:
+            async with semaphore:
+                start = time.perf_counter()
+                res = await client.get("/whoami", headers={"Authorization": f"Bearer {token}"})
+                latencies.append(time.perf_counter() - start)
+                res.raise_for_status()
+
+        await asyncio.gather(*[single_request() for _ in range(n_requests)])
+
+    return latencies
+
+
+def simulated_keycloak(userinfo_latency: float):
+    _, private_key = rsa.newkeys(2048)
+    private_pem = private_key.save_pkcs1().decode()
+    public_jwk = {**jwk.construct(private_pem, "RS256").public_key().to_dict(), "kid": "bench"}
+    issuer = "https://keycloak.bench/realms/bench"
+    claims = {"sub": "bench-user", "email": "bench@rail.eu", "iss": issuer}
+    token = jwt.encode(
+        {**claims, "exp": int(time.time()) + 3600},
+        private_pem,
+        algorithm="RS256",
+        headers={"kid": "bench"},
+    )
+
+    def userinfo(_token: str) -> dict:
+        time.sleep(userinfo_latency)
+        return claims
+
+    patches = [
+        patch.object(auth.keycloak_openid, "userinfo", side_effect=userinfo),
+        patch.object(auth.keycloak_openid, "certs", return_value={"keys": [public_jwk]}),
+        patch.object(auth.keycloak_openid, "well_known", return_value={"issuer": issuer}),
+    ]
+    return token, patches
+
+
+def report(mode: TokenVerificationMode, latencies: list[float], elapsed: float) -> None:
+    latencies_ms = sorted(lat * 1000 for lat in latencies)
+    p95 = latencies_ms[int(len(latencies_ms) * 0.95) - 1]
+    print(
+        f"{mode.value:>6}: {len(latencies_ms) / elapsed:8.1f} req/s | "
+        + f"mean {statistics.mean(latencies_ms):8.2f} ms | "
+        + f"median {statistics.median(latencies_ms):8.2f} ms | "
+        + f"p95 {p95:8.2f} ms"
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    token, patches = args.token, []
+    if token is None:
+        token, patches = simulated_keycloak(args.userinfo_latency)
+
+    for p in patches:
+        p.start()
+    try:
+        for mode in TokenVerificationMode:
+            settings.AIOD_KEYCLOAK.TOKEN_VERIFICATION = mode
+            # warm-up (fetching of JWKS in the local mode)
+            await measure(token, n_requests=1, concurrency=1)
+
+            start = time.perf_counter()
+            latencies = await measure(token, args.requests, args.concurrency)
+            report(mode, latencies, time.perf_counter() - start)
+    finally:
+        for p in patches:
+            p.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--token", type=str, default=None, help="Valid Keycloak access token")
+    parser.add_argument("--userinfo-latency", type=float, default=0.05)
+
+    asyncio.run(main(parser.parse_args()))
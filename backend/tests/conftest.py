@@ -6,8 +6,12 @@ from fastapi.testclient import TestClient
 from mongomock_motor import AsyncMongoMockClient
 
 from app.main import app
+from app.models.aiod_asset import AIoDAsset
+from app.models.experiment_run import ExperimentRun
+from app.models.experiment_template import ExperimentTemplate
 from app.models.rail_user import RailUser
-from app.services.aiod import AsyncClientWrapper, aiod_client_wrapper
+from app.models.scheduled_job import ScheduledJob
+from app.services.aiod import AsyncClientWrapper, aiod_client_wrapper, aiod_response_cache
 
 
 @pytest.fixture(scope="module")
@@ -20,10 +24,15 @@ def client():
 async def db_init():
     await init_beanie(
         database=AsyncMongoMockClient()["tests"],
-        document_models=[RailUser],
+        document_models=[RailUser, AIoDAsset, ScheduledJob, ExperimentRun, ExperimentTemplate],
     )
 
 
 @pytest.fixture
 def async_client_mock(mocker):
     return mocker.patch.object(AsyncClientWrapper, "client", new_callable=AsyncMock)
+
+
+@pytest.fixture(autouse=True)
+def clear_aiod_response_cache():
+    aiod_response_cache.clear()
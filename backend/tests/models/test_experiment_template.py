@@ -0,0 +1,92 @@
+from unittest.mock import AsyncMock, Mock
+
+import yaml
+from app.config import Settings
+from app.models.experiment_template import ExperimentTemplate
+from app.schemas.experiment_template import AssetCardinality, AssetSchema, TaskType
+from app.schemas.states import TemplateState
+from app.services.experiment_scheduler import ExperimentScheduler
+from beanie import PydanticObjectId
+
+
+def make_template(mocker, tmp_path) -> ExperimentTemplate:
+    mocker.patch.object(
+        Settings,
+        "get_experiment_template_path",
+        side_effect=lambda template_id: tmp_path / f"template-{template_id}",
+    )
+    return ExperimentTemplate(
+        id=PydanticObjectId(),
+        name="template",
+        description="",
+        task=TaskType.TEXT_CLASSIFICATION,
+        datasets_schema=AssetSchema(cardinality=AssetCardinality.ONE),
+        models_schema=AssetSchema(cardinality=AssetCardinality.ONE),
+        envs_required=[],
+        envs_optional=[],
+        created_by="user@example.com",
+    )
+
+
+def read_image_of_reana_spec(template: ExperimentTemplate) -> str:
+    with template.experiment_template_path.joinpath("reana.yaml").open() as fp:
+        return yaml.safe_load(fp)["workflow"]["specification"]["steps"][0]["environment"]
+
+
+def test_templates_with_the_same_environment_share_an_image(mocker, tmp_path):
+    template = make_template(mocker, tmp_path)
+    template.initialize_files("python:3.11", "numpy\ntorch==2.1\n", "print(1)")
+    other_template = make_template(mocker, tmp_path)
+    other_template.initialize_files("python:3.11", "# deps\ntorch==2.1\n\nnumpy", "print(2)")
+
+    assert template.image_name == other_template.image_name
+    assert template.image_name.endswith(f":env-{template.environment_hash}")
+    assert read_image_of_reana_spec(other_template) == template.image_name
+
+
+def test_templates_with_different_environments_do_not_share_an_image(mocker, tmp_path):
+    template = make_template(mocker, tmp_path)
+    template.initialize_files("python:3.11", "numpy", "")
+    other_template = make_template(mocker, tmp_path)
+    other_template.initialize_files("python:3.10", "numpy", "")
+    another_template = make_template(mocker, tmp_path)
+    another_template.initialize_files("python:3.11", "numpy==1.26", "")
+
+    image_names = {t.image_name for t in [template, other_template, another_template]}
+    assert len(image_names) == 3
+
+
+async def test_older_templates_are_migrated_to_shared_images_once(mocker, tmp_path):
+    template = make_template(mocker, tmp_path)
+    template.initialize_files("python:3.11", "numpy", "")
+    image_name = template.image_name
+    reana_path = template.experiment_template_path / "reana.yaml"
+    reana_path.write_text(reana_path.read_text().replace(image_name, "old:template-1"))
+    template.environment_hash = None
+    await template.insert()
+    scheduler = ExperimentScheduler(Mock(), workflow_engine=Mock())
+
+    await scheduler.init_environment_hashes()
+
+    assert read_image_of_reana_spec(template) == image_name
+    migrated_template = await ExperimentTemplate.get(template.id)
+    assert migrated_template.image_name == image_name
+
+    compute_environment_hash = mocker.spy(ExperimentTemplate, "compute_environment_hash")
+    await scheduler.init_environment_hashes()
+    assert migrated_template.image_name == image_name
+    compute_environment_hash.assert_not_called()
+
+
+async def test_build_is_skipped_if_the_image_exists(mocker, tmp_path):
+    template = make_template(mocker, tmp_path)
+    template.initialize_files("python:3.11", "numpy", "")
+    update_state_in_db = mocker.patch.object(ExperimentTemplate, "update_state_in_db")
+    mocker.patch.object(ExperimentTemplate, "get", AsyncMock(return_value=template))
+    container_platform = Mock(check_image=AsyncMock(return_value=True), build_image=AsyncMock())
+    scheduler = ExperimentScheduler(container_platform, workflow_engine=Mock())
+
+    assert await scheduler.build_experiment_environment(template.id) is True
+
+    container_platform.build_image.assert_not_called()
+    update_state_in_db.assert_awaited_once_with(TemplateState.FINISHED)
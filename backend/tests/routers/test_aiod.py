@@ -5,7 +5,9 @@ from app.schemas.dataset import Dataset
 from app.schemas.ml_model import MLModel
 from app.schemas.platform import Platform
 from app.schemas.publication import Publication
+from app.schemas.states import SearchJobState
 from app.services.aiod import AssetType
+from app.services.enhanced_search import EnhancedSearchJob
 
 example_id = "data_ceREqVzRDnJAtw4VMGENCsmI"
 
@@ -165,3 +167,40 @@ async def test_api_get_filtered_assets_count(client, mocker, api_path, asset_typ
     mock_get_assets_count.assert_called_once_with(asset_type=asset_type, filter_query="asset_name")
     assert res.status_code == 200
     assert isinstance(res.json(), int) and res.json() == 7
+
+
+@pytest.mark.asyncio
+async def test_api_enhanced_search_job(client, mocker):
+    job = EnhancedSearchJob(
+        asset_type=AssetType.DATASETS,
+        query="asset_name",
+        topk=20,
+        state=SearchJobState.COMPLETED,
+        results=[{"asset": {"name": f"asset_{i}", "identifier": example_id}} for i in range(20)],
+    )
+    mock_submit = mocker.patch("app.routers.aiod.submit_enhanced_search", return_value=job)
+    mocker.patch("app.routers.aiod.get_enhanced_search_job", return_value=job)
+
+    res = client.post("/v1/assets/datasets/search/enhanced", params={"query": "asset_name"})
+
+    assert res.status_code == 202 and res.json()["id"] == job.id
+    mock_submit.assert_called_once()
+
+    res = client.get(
+        f"/v1/assets/datasets/search/enhanced/jobs/{job.id}", params={"offset": 10, "limit": 5}
+    )
+
+    assert res.status_code == 200
+    assert res.json()["state"] == SearchJobState.COMPLETED
+    assert [asset["name"] for asset in res.json()["results"]] == [
+        f"asset_{i}" for i in range(10, 15)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_api_enhanced_search_job_not_found(client, mocker):
+    mocker.patch("app.routers.aiod.get_enhanced_search_job", return_value=None)
+
+    res = client.get("/v1/assets/datasets/search/enhanced/jobs/unknown")
+
+    assert res.status_code == 404
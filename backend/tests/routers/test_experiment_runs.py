@@ -0,0 +1,209 @@
+import io
+import zipfile
+from datetime import datetime
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from beanie import PydanticObjectId
+
+from app.config import settings
+from app.helpers import FileDetail, FileStream
+from app.main import app
+from app.models.experiment_run import ExperimentRun
+from app.schemas.states import RunState
+from app.services.run_output_cache import RunOutputCache
+from app.services.workflow_engines.reana import ReanaService
+
+
+@pytest.fixture
+def workflow_engine(mocker):
+    mocker.patch(
+        "app.routers.experiment_runs.get_experiment_run_if_accessible_or_raise",
+        AsyncMock(return_value=Mock(workflow_name="run-1")),
+    )
+    workflow_engine = Mock()
+    app.dependency_overrides[ReanaService.get_service] = lambda: workflow_engine
+    yield workflow_engine
+    app.dependency_overrides.pop(ReanaService.get_service)
+
+
+@pytest.mark.asyncio
+async def test_download_file_is_streamed_with_range(client, workflow_engine):
+    async def chunks():
+        yield b"56789"
+
+    close = AsyncMock()
+    workflow_engine.stream_file = AsyncMock(
+        return_value=FileStream(
+            filename="model.pt",
+            chunks=chunks(),
+            close=close,
+            status_code=206,
+            headers={"Content-Range": "bytes 5-9/10", "Content-Length": "5"},
+        )
+    )
+
+    res = client.get(
+        f"/v1/experiment-runs/{PydanticObjectId()}/files/download",
+        params={"filepath": "output/model.pt"},
+        headers={"Range": "bytes=5-"},
+    )
+
+    assert res.status_code == 206
+    assert res.content == b"56789"
+    assert res.headers["Content-Range"] == "bytes 5-9/10"
+    assert res.headers["Content-Disposition"] == 'attachment; filename="model.pt"'
+    assert workflow_engine.stream_file.call_args.kwargs["byte_range"] == "bytes=5-"
+    close.assert_awaited()
+
+
+@pytest.mark.asyncio
+async def test_download_missing_file(client, workflow_engine):
+    workflow_engine.stream_file = AsyncMock(return_value=None)
+
+    res = client.get(
+        f"/v1/experiment-runs/{PydanticObjectId()}/files/download",
+        params={"filepath": "missing.txt"},
+    )
+
+    assert res.status_code == 400
+
+
+@pytest.fixture
+def run_output_cache(tmp_path):
+    local_path = tmp_path / "model.pt"
+    local_path.write_bytes(b"0123456789")
+    run_output_cache = Mock()
+    run_output_cache.get_file.return_value = local_path
+    app.dependency_overrides[RunOutputCache.get_service] = lambda: run_output_cache
+    yield run_output_cache
+    app.dependency_overrides.pop(RunOutputCache.get_service)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "byte_range, status_code, content, content_range",
+    [
+        (None, 200, b"0123456789", None),
+        ("bytes=5-", 206, b"56789", "bytes 5-9/10"),
+        ("bytes=2-4", 206, b"234", "bytes 2-4/10"),
+        ("bytes=-3", 206, b"789", "bytes 7-9/10"),
+        ("bytes=20-", 416, None, "bytes */10"),
+    ],
+)
+async def test_download_archived_file(
+    client, workflow_engine, run_output_cache, byte_range, status_code, content, content_range
+):
+    headers = {"Range": byte_range} if byte_range is not None else {}
+    res = client.get(
+        f"/v1/experiment-runs/{PydanticObjectId()}/files/download",
+        params={"filepath": "output/model.pt"},
+        headers=headers,
+    )
+
+    assert res.status_code == status_code
+    if content is not None:
+        assert res.content == content
+    assert res.headers.get("Content-Range") == content_range
+    workflow_engine.stream_file.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_download_archive_of_outputs(client, workflow_engine):
+    files = {"output/model.pt": b"0123456789", "output/dir/": b"", "reana.yaml": b"workflow"}
+    workflow_engine.list_files = AsyncMock(
+        return_value=[
+            FileDetail(filepath=filepath, size=len(content), last_modified=datetime.now())
+            for filepath, content in files.items()
+        ]
+    )
+
+    async def stream_file(experiment_run, filepath, byte_range=None):
+        async def chunks():
+            yield files[filepath]
+
+        return FileStream(filename=filepath, chunks=chunks(), close=AsyncMock())
+
+    workflow_engine.stream_file = stream_file
+
+    run_id = PydanticObjectId()
+    res = client.get(f"/v1/experiment-runs/{run_id}/files/archive")
+
+    assert res.status_code == 200
+    assert res.headers["Content-Type"] == "application/zip"
+    assert res.headers["Content-Disposition"] == f'attachment; filename="run-{run_id}.zip"'
+    with zipfile.ZipFile(io.BytesIO(res.content)) as zip_file:
+        assert zip_file.namelist() == ["output/model.pt"]
+        assert zip_file.read("output/model.pt") == b"0123456789"
+
+
+@pytest.mark.asyncio
+async def test_download_archive_without_files(client, workflow_engine):
+    workflow_engine.list_files = AsyncMock(return_value=[])
+
+    res = client.get(
+        f"/v1/experiment-runs/{PydanticObjectId()}/files/archive",
+        params={"prefix": "output/", "format": "tar.gz"},
+    )
+
+    assert res.status_code == 400
+
+
+@pytest.fixture
+def experiment_run_with_logs(mocker, tmp_path):
+    mocker.patch.object(settings, "EEE_DATA_PATH", tmp_path)
+    experiment_run = ExperimentRun(
+        id=PydanticObjectId(),
+        experiment_id=PydanticObjectId(),
+        created_by="user@rail.eu",
+        is_public=True,
+        state=RunState.FINISHED,
+    )
+    experiment_run.run_path.mkdir(parents=True)
+    experiment_run.logs_path.write_text("".join(f"epoch {i}\n" for i in range(1000)))
+    mocker.patch(
+        "app.routers.experiment_runs.get_experiment_run_if_accessible_or_raise",
+        AsyncMock(return_value=experiment_run),
+    )
+    return experiment_run
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "params, logs",
+    [
+        ({"limit": 16}, b"epoch 0\nepoch 1\n"),
+        ({"offset": 8, "limit": 8}, b"epoch 1\n"),
+        ({"offset": -10}, b"epoch 999\n"),
+        ({"offset": 100_000}, b""),
+    ],
+)
+async def test_get_part_of_logs(client, experiment_run_with_logs, params, logs):
+    res = client.get(f"/v1/experiment-runs/{experiment_run_with_logs.id}/logs", params=params)
+
+    assert res.status_code == 200
+    assert res.content == logs
+    assert res.headers["X-Logs-Size"] == str(experiment_run_with_logs.logs_path.stat().st_size)
+
+
+@pytest.mark.asyncio
+async def test_logs_are_compressed(client, experiment_run_with_logs):
+    res = client.get(
+        f"/v1/experiment-runs/{experiment_run_with_logs.id}/logs",
+        headers={"Accept-Encoding": "gzip"},
+    )
+
+    assert res.headers["Content-Encoding"] == "gzip"
+    assert int(res.headers["Content-Length"]) < experiment_run_with_logs.logs_path.stat().st_size
+    assert res.content == experiment_run_with_logs.logs_path.read_bytes()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("params, logs", [({}, None), ({"logs_tail": 10}, "epoch 999\n")])
+async def test_run_details_include_only_tail_of_logs(
+    client, experiment_run_with_logs, params, logs
+):
+    res = client.get(f"/v1/experiment-runs/{experiment_run_with_logs.id}", params=params)
+
+    assert res.status_code == 200
+    assert res.json()["logs"] == logs
@@ -0,0 +1,52 @@
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from app.helpers import read_file_part
+from beanie import PydanticObjectId
+
+
+@pytest.fixture
+def experiment_template_with_build_logs(mocker, tmp_path):
+    build_logs_path = tmp_path / "build-logs.txt"
+    build_logs_path.write_text("Step 1/4 : FROM python:3.11\nStep 2/4 : WORKDIR /app\n")
+    experiment_template = Mock(
+        read_build_logs=lambda offset, limit: read_file_part(build_logs_path, offset, limit)
+    )
+    mocker.patch(
+        "app.routers.experiment_templates.get_experiment_template_if_accessible_or_raise",
+        AsyncMock(return_value=experiment_template),
+    )
+    return experiment_template
+
+
+@pytest.mark.parametrize(
+    "params, logs",
+    [
+        ({}, b"Step 1/4 : FROM python:3.11\nStep 2/4 : WORKDIR /app\n"),
+        ({"offset": 28}, b"Step 2/4 : WORKDIR /app\n"),
+        ({"offset": 0, "limit": 8}, b"Step 1/4"),
+    ],
+)
+def test_get_build_logs(client, experiment_template_with_build_logs, params, logs):
+    res = client.get(f"/v1/experiment-templates/{PydanticObjectId()}/build-logs", params=params)
+
+    assert res.status_code == 200
+    assert res.content == logs
+    assert res.headers["X-Logs-Size"] == "52"
+
+
+def test_build_logs_of_template_that_has_not_been_built(mocker, client, tmp_path):
+    mocker.patch(
+        "app.routers.experiment_templates.get_experiment_template_if_accessible_or_raise",
+        AsyncMock(
+            return_value=Mock(
+                read_build_logs=lambda offset, limit: read_file_part(tmp_path / "missing")
+            )
+        ),
+    )
+
+    res = client.get(f"/v1/experiment-templates/{PydanticObjectId()}/build-logs")
+
+    assert res.status_code == 200
+    assert res.content == b""
+    assert res.headers["X-Logs-Size"] == "0"
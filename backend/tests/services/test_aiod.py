@@ -1,18 +1,24 @@
+import asyncio
 from unittest.mock import Mock, call
 
 import pytest
 from fastapi import HTTPException
 
+from app.config import settings
 from app.helpers import Pagination
 from app.services.aiod import (
     AssetType,
+    aiod_response_cache,
     get_asset,
     get_assets,
+    get_assets_by_ids,
     get_assets_count,
     get_my_asset_ids,
     get_my_assets,
     search_assets,
 )
+from app.services.asset_caches.base import AssetCacheBase
+from app.services.asset_caches.memory import InMemoryAssetCache
 
 example_id = "data_ceREqVzRDnJAtw4VMGENCsmI"
 example_id2 = "data_ceREqVzRDnJAtw4VMGENCsFF"
@@ -81,6 +87,64 @@ async def test_get_my_assets_happy_path(mocker, asset_type):
     ]
 
 
+@pytest.mark.asyncio
+async def test_get_my_assets_skips_failed_assets(mocker):
+    mocker.patch(
+        "app.services.aiod.get_my_asset_ids",
+        return_value=[example_id, example_id2, example_id3],
+    )
+    mocker.patch(
+        "app.services.aiod.get_asset",
+        side_effect=[{"identifier": example_id}, HTTPException(404), {"identifier": example_id3}],
+    )
+
+    my_assets = await get_my_assets(AssetType.DATASETS, token="token", pagination=Pagination())
+
+    assert my_assets == [{"identifier": example_id}, {"identifier": example_id3}]
+
+
+@pytest.mark.asyncio
+async def test_get_assets_by_ids_keeps_order_and_reports_failures(mocker):
+    async def fake_get_asset(asset_type, asset_id):
+        # the first requested asset is the slowest one to be fetched
+        await asyncio.sleep(0.01 if asset_id == example_id else 0)
+        if asset_id == example_id2:
+            raise HTTPException(status_code=404)
+        return {"identifier": asset_id}
+
+    mocker.patch("app.services.aiod.get_asset", side_effect=fake_get_asset)
+
+    assets, failures = await get_assets_by_ids(
+        AssetType.DATASETS, [example_id, example_id2, example_id3]
+    )
+
+    assert assets == [{"identifier": example_id}, {"identifier": example_id3}]
+    assert list(failures.keys()) == [example_id2]
+    assert failures[example_id2].status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_get_assets_by_ids_limits_concurrency(mocker):
+    running, max_running = 0, 0
+
+    async def fake_get_asset(asset_type, asset_id):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return {"identifier": asset_id}
+
+    mocker.patch("app.services.aiod.get_asset", side_effect=fake_get_asset)
+
+    assets, failures = await get_assets_by_ids(
+        AssetType.DATASETS, [example_id] * 10, max_concurrency=3
+    )
+
+    assert len(assets) == 10 and len(failures) == 0
+    assert max_running == 3
+
+
 @pytest.mark.parametrize(
     "asset_type, pagination, expected_url, expected_asset_ids",
     [
@@ -254,6 +318,76 @@ async def test_get_asset_raises_exception_on_non_200_status_code(asset_type, asy
         await get_asset(asset_type, asset_id=example_id)
 
 
+@pytest.fixture
+def asset_cache():
+    cache = InMemoryAssetCache(maxsize=10, ttl=60, negative_ttl=60)
+    AssetCacheBase.set_service(cache)
+    yield cache
+    AssetCacheBase.set_service(None)
+
+
+@pytest.mark.asyncio
+async def test_get_asset_is_served_from_cache(asset_cache, async_client_mock):
+    mock_response = Mock()
+    mock_response.status_code = 200
+    mock_response.json.return_value = {"identifier": example_id}
+    async_client_mock.get.return_value = mock_response
+
+    for _ in range(3):
+        asset = await get_asset(AssetType.DATASETS, asset_id=example_id)
+
+    async_client_mock.get.assert_called_once_with(f"datasets/{example_id}")
+    assert asset == {"identifier": example_id}
+    assert asset_cache.stats()["hits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_get_asset_caches_missing_assets(asset_cache, async_client_mock):
+    mock_response = Mock()
+    mock_response.status_code = 404
+    async_client_mock.get.return_value = mock_response
+
+    for _ in range(2):
+        with pytest.raises(HTTPException) as exception_info:
+            await get_asset(AssetType.DATASETS, asset_id=example_id)
+        assert exception_info.value.status_code == 404
+
+    async_client_mock.get.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_get_asset_does_not_cache_server_errors(asset_cache, async_client_mock):
+    mock_response = Mock()
+    mock_response.status_code = 500
+    async_client_mock.get.return_value = mock_response
+
+    for _ in range(2):
+        with pytest.raises(HTTPException):
+            await get_asset(AssetType.DATASETS, asset_id=example_id)
+
+    assert async_client_mock.get.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_get_asset_calls_are_coalesced(async_client_mock):
+    mock_response = Mock()
+    mock_response.status_code = 200
+    mock_response.json.return_value = {"identifier": example_id}
+
+    async def slow_get(*args, **kwargs):
+        await asyncio.sleep(0.01)
+        return mock_response
+
+    async_client_mock.get.side_effect = slow_get
+
+    assets = await asyncio.gather(
+        *[get_asset(AssetType.DATASETS, asset_id=example_id) for _ in range(5)]
+    )
+
+    async_client_mock.get.assert_called_once()
+    assert assets == [{"identifier": example_id}] * 5
+
+
 @pytest.mark.parametrize(
     "asset_type, expected_url",
     [
@@ -372,3 +506,48 @@ async def test_search_assets_raises_exception_on_non_200_status_code(asset_type,
 
     with pytest.raises(HTTPException):
         await search_assets(asset_type, "", Pagination())
+
+
+@pytest.mark.asyncio
+async def test_get_assets_count_is_cached(async_client_mock):
+    mock_response = Mock()
+    mock_response.status_code = 200
+    mock_response.json.return_value = 123
+    async_client_mock.get.return_value = mock_response
+
+    counts = [await get_assets_count(AssetType.DATASETS) for _ in range(3)]
+
+    async_client_mock.get.assert_called_once_with("counts/datasets")
+    assert counts == [123, 123, 123]
+
+
+@pytest.mark.asyncio
+async def test_stale_assets_count_is_served_while_refreshing(mocker, async_client_mock):
+    mocker.patch.object(settings.AIOD_RESPONSE_CACHE, "COUNT_TTL", 0)
+    responses = [Mock(status_code=200), Mock(status_code=200)]
+    responses[0].json.return_value = 123
+    responses[1].json.return_value = 124
+    async_client_mock.get.side_effect = responses
+
+    assert await get_assets_count(AssetType.DATASETS) == 123
+    # expired entry is served immediately, the refresh runs in the background
+    assert await get_assets_count(AssetType.DATASETS) == 123
+    await asyncio.sleep(0.01)
+
+    assert async_client_mock.get.call_count == 2
+    assert aiod_response_cache.stats()["stale_hits"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_failed_search_is_not_cached(async_client_mock):
+    failed_response = Mock(status_code=500)
+    ok_response = Mock(status_code=200)
+    ok_response.json.return_value = {"resources": [{"name": "asset_name_1"}]}
+    async_client_mock.get.side_effect = [failed_response, ok_response]
+
+    with pytest.raises(HTTPException):
+        await search_assets(AssetType.DATASETS, "query", Pagination())
+    resources = await search_assets(AssetType.DATASETS, "query", Pagination())
+
+    assert resources == [{"name": "asset_name_1"}]
+    assert async_client_mock.get.call_count == 2
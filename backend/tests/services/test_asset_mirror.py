@@ -0,0 +1,91 @@
+from unittest.mock import Mock
+
+import pytest
+
+from app.helpers import Pagination
+from app.models.aiod_asset import AIoDAsset
+from app.services.aiod import AssetType, get_asset, sync_asset_mirror
+from app.services.asset_mirror import AssetMirror
+
+example_id = "data_ceREqVzRDnJAtw4VMGENCsmI"
+example_id2 = "data_ceREqVzRDnJAtw4VMGENCsFF"
+
+
+def create_asset(identifier: str, date_modified: str) -> dict:
+    return {"identifier": identifier, "aiod_entry": {"date_modified": date_modified}}
+
+
+@pytest.fixture
+async def asset_mirror():
+    await AIoDAsset.find_all().delete()
+    mirror = await AssetMirror.init()
+    yield mirror
+    AssetMirror.SERVICE = None
+
+
+@pytest.mark.asyncio
+async def test_upsert_many_writes_only_changed_assets(asset_mirror):
+    await asset_mirror.upsert(AssetType.DATASETS.value, create_asset(example_id, "2024-01-01"))
+
+    updated_count = await asset_mirror.upsert_many(
+        AssetType.DATASETS.value,
+        [create_asset(example_id, "2024-01-01"), create_asset(example_id2, "2024-01-01")],
+    )
+
+    assert updated_count == 1
+    assert await AIoDAsset.count() == 2
+
+
+@pytest.mark.asyncio
+async def test_upsert_many_without_inserting_new_assets(asset_mirror):
+    await asset_mirror.upsert(AssetType.DATASETS.value, create_asset(example_id, "2024-01-01"))
+
+    updated_count = await asset_mirror.upsert_many(
+        AssetType.DATASETS.value,
+        [create_asset(example_id, "2024-02-02"), create_asset(example_id2, "2024-01-01")],
+        insert_new=False,
+    )
+
+    assert updated_count == 1
+    assert await asset_mirror.get(AssetType.DATASETS.value, example_id) == create_asset(
+        example_id, "2024-02-02"
+    )
+    assert await asset_mirror.get(AssetType.DATASETS.value, example_id2) is None
+
+
+@pytest.mark.asyncio
+async def test_get_asset_reads_mirror_first(asset_mirror, async_client_mock):
+    asset = create_asset(example_id, "2024-01-01")
+    await asset_mirror.upsert(AssetType.DATASETS.value, asset)
+
+    assert await get_asset(AssetType.DATASETS, asset_id=example_id) == asset
+    async_client_mock.get.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_asset_falls_back_to_aiod_and_mirrors_asset(asset_mirror, async_client_mock):
+    asset = create_asset(example_id, "2024-01-01")
+    mock_response = Mock(status_code=200)
+    mock_response.json.return_value = asset
+    async_client_mock.get.return_value = mock_response
+
+    assert await get_asset(AssetType.DATASETS, asset_id=example_id) == asset
+    assert await asset_mirror.get(AssetType.DATASETS.value, example_id) == asset
+
+
+@pytest.mark.asyncio
+async def test_sync_asset_mirror_pages_through_assets(mocker, asset_mirror):
+    await asset_mirror.upsert(AssetType.DATASETS.value, create_asset(example_id, "2024-01-01"))
+    mocker.patch("app.services.aiod.settings.AIOD_ASSET_MIRROR.SYNC_PAGE_SIZE", 1)
+    mock_get_assets = mocker.patch(
+        "app.services.aiod._get_assets",
+        side_effect=[[create_asset(example_id, "2024-02-02")], []],
+    )
+
+    updated_count = await sync_asset_mirror(asset_mirror, [AssetType.DATASETS])
+
+    assert updated_count == 1
+    assert mock_get_assets.call_args_list[1].args == (
+        AssetType.DATASETS,
+        Pagination(offset=1, limit=1),
+    )
@@ -0,0 +1,52 @@
+from unittest.mock import Mock
+
+from app.services.container_platforms.docker_image_cache import DockerImageCache
+from docker.errors import APIError
+
+REPOSITORY = "registry/rail-exp-templates"
+
+
+def image(tag: str, size: int, created: str = "2024-01-01T00:00:00.123456789Z") -> Mock:
+    return Mock(tags=[f"{REPOSITORY}:{tag}"], attrs={"Size": size, "Created": created})
+
+
+def make_cache(images: list[Mock], max_size: int) -> DockerImageCache:
+    docker_client = Mock()
+    docker_client.images.list.return_value = images
+    return DockerImageCache(docker_client, repository=REPOSITORY, max_size=max_size)
+
+
+def test_least_recently_used_images_are_removed():
+    cache = make_cache([image("env-a", 40), image("env-b", 40), image("env-c", 40)], max_size=80)
+    cache.touch(f"{REPOSITORY}:env-c")
+    cache.touch(f"{REPOSITORY}:env-a")
+
+    assert cache.enforce() == [f"{REPOSITORY}:env-b"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_images_not_used_since_start_are_removed_from_the_oldest():
+    cache = make_cache(
+        [
+            image("env-new", 40, created="2024-03-01T00:00:00Z"),
+            image("env-old", 40, created="2023-03-01T00:00:00Z"),
+        ],
+        max_size=50,
+    )
+
+    assert cache.enforce() == [f"{REPOSITORY}:env-old"]
+
+
+def test_nothing_is_removed_within_the_size():
+    cache = make_cache([image("env-a", 40), image("env-b", 40)], max_size=80)
+
+    assert cache.enforce() == []
+    cache.docker_client.images.remove.assert_not_called()
+
+
+def test_images_in_use_are_skipped():
+    cache = make_cache([image("env-a", 40), image("env-b", 40)], max_size=40)
+    cache.touch(f"{REPOSITORY}:env-b")
+    cache.docker_client.images.remove.side_effect = [APIError("in use"), None]
+
+    assert cache.enforce() == [f"{REPOSITORY}:env-b"]
@@ -0,0 +1,207 @@
+import asyncio
+import socket
+import threading
+import time
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from app.config import settings
+from app.services.container_platforms.docker import DockerService
+from docker import APIClient
+from docker.errors import ImageNotFound, NotFound
+
+BUILD_LOGS = [
+    {"stream": "Step 1/4 : FROM python:3.11"},
+    {"stream": " ---> 1234"},
+    {"stream": "Step 2/4 : WORKDIR /app"},
+    {"stream": " ---> Using cache"},
+    {"stream": "Step 3/4 : COPY requirements.txt ."},
+    {"stream": " ---> Using cache"},
+    {"stream": "Step 4/4 : RUN pip install -r requirements.txt"},
+    {"stream": " ---> Using cache"},
+]
+
+
+PUSH_LOGS = [
+    {"status": "The push refers to repository [registry/rail-exp-templates]"},
+    {"status": "Pushing", "progress": "[==>   ]", "progressDetail": {}, "id": "abc"},
+    {"status": "Pushed", "progressDetail": {}, "id": "abc"},
+]
+
+
+def progress(items: list[dict]):
+    yield from items
+
+
+@pytest.fixture
+def docker_service(mocker):
+    mocker.patch("app.services.container_platforms.docker.DockerClient")
+    mocker.patch("app.services.container_platforms.docker.APIClient")
+    docker_service = DockerService()
+    docker_service.build_client.build.side_effect = lambda **kwargs: progress(BUILD_LOGS)
+    docker_service.build_client.push.side_effect = lambda *args, **kwargs: progress(PUSH_LOGS)
+    docker_service.docker_client.images.list.return_value = []
+    return docker_service
+
+
+@pytest.fixture
+def experiment_template(tmp_path):
+    return Mock(
+        id="1",
+        image_name=f"{settings.DOCKER_REGISTRY_URL}/rail-exp-templates:env-a",
+        base_image="python:3.11",
+        experiment_template_path=tmp_path,
+        build_logs_path=tmp_path / "build-logs.txt",
+        retry_count=1,
+        image_digest=None,
+        update_image_digest_in_db=AsyncMock(),
+    )
+
+
+async def test_built_image_is_kept_and_recorded(docker_service, experiment_template):
+    assert await docker_service.build_image(experiment_template) is True
+
+    docker_client = docker_service.docker_client
+    docker_client.images.remove.assert_not_called()
+    assert docker_service.build_client.build.call_args.kwargs["pull"] is False
+
+    build = docker_service.get_build_stats()["templates"]["1"]
+    assert build["steps"] == 4
+    assert build["cached_steps"] == 3
+    assert build["cached"] is True
+    assert docker_service.get_build_stats()["cached_builds"] == 1
+
+
+async def test_missing_base_image_is_pulled(docker_service, experiment_template):
+    docker_service.docker_client.images.get.side_effect = ImageNotFound("missing")
+
+    assert await docker_service.build_image(experiment_template) is True
+
+    assert docker_service.build_client.build.call_args.kwargs["pull"] is True
+
+
+async def test_build_logs_are_written_as_reported(docker_service, experiment_template):
+    await docker_service.build_image(experiment_template)
+
+    logs = experiment_template.build_logs_path.read_text()
+    assert "Step 4/4 : RUN pip install -r requirements.txt" in logs
+    assert "abc Pushed" in logs
+    assert "[==>   ]" not in logs
+
+
+async def test_failed_build_is_logged(docker_service, experiment_template):
+    docker_service.build_client.build.side_effect = lambda **kwargs: progress(
+        [{"stream": "Step 1/4 : FROM python:3.11"}, {"error": "pip install failed"}]
+    )
+
+    assert await docker_service.build_image(experiment_template) is False
+
+    docker_service.build_client.push.assert_not_called()
+    assert experiment_template.build_logs_path.read_text().endswith("ERROR: pip install failed\n")
+
+
+async def test_stuck_build_times_out(mocker, docker_service, experiment_template):
+    mocker.patch.object(settings, "IMAGE_BUILD_TIMEOUT", 0.2)
+    closed = threading.Event()
+
+    def stuck_build(**kwargs):
+        try:
+            while True:
+                time.sleep(0.05)
+                yield {"stream": "."}
+        finally:
+            closed.set()
+
+    docker_service.build_client.build.side_effect = stuck_build
+
+    assert await asyncio.wait_for(docker_service.build_image(experiment_template), 1) is False
+    assert docker_service.get_build_stats()["timeouts"] == 1
+    # the build is abandoned right after the timeout
+    assert await asyncio.to_thread(closed.wait, 1) is True
+
+
+@pytest.fixture
+def silent_daemon():
+    """Docker daemon that starts responding to a build, but never reports any progress"""
+    server = socket.create_server(("127.0.0.1", 0))
+    connections = []
+
+    def serve():
+        connection, _ = server.accept()
+        connections.append(connection)
+        connection.recv(65536)
+        connection.sendall(
+            b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+            + b"Transfer-Encoding: chunked\r\n\r\n"
+        )
+
+    threading.Thread(target=serve, daemon=True).start()
+    yield f"tcp://127.0.0.1:{server.getsockname()[1]}"
+    for connection in connections:
+        connection.close()
+    server.close()
+
+
+async def test_silent_build_is_given_up_on(
+    mocker, docker_service, experiment_template, silent_daemon
+):
+    mocker.patch.object(settings, "IMAGE_BUILD_TIMEOUT", 0.1)
+    experiment_template.experiment_template_path.joinpath("Dockerfile").write_text("FROM scratch")
+    docker_service.build_client = APIClient(base_url=silent_daemon, version="1.41", timeout=0.5)
+
+    assert await asyncio.wait_for(docker_service.build_image(experiment_template), 1) is False
+    assert len(docker_service.abandoned_builds) == 1
+
+    # the next attempt waits for the socket of the abandoned build to time out
+    docker_service.build_client = Mock(
+        build=lambda **kwargs: progress(BUILD_LOGS),
+        push=lambda *args, **kwargs: progress(PUSH_LOGS),
+    )
+    mocker.patch.object(settings, "IMAGE_BUILD_TIMEOUT", 5)
+    assert await asyncio.wait_for(docker_service.build_image(experiment_template), 2) is True
+
+    assert docker_service.abandoned_builds == {}
+    assert experiment_template.build_logs_path.read_text().startswith("Step 1/4")
+
+
+async def test_existing_image_is_checked_in_the_registry_once(docker_service, experiment_template):
+    get_registry_data = docker_service.docker_client.images.get_registry_data
+    get_registry_data.return_value = Mock(id="sha256:abc")
+
+    assert await docker_service.check_image(experiment_template) is True
+    experiment_template.image_digest = "sha256:abc"
+    assert await docker_service.check_image(experiment_template) is True
+
+    get_registry_data.assert_called_once()
+    experiment_template.update_image_digest_in_db.assert_awaited_once_with("sha256:abc")
+
+
+async def test_missing_image_is_checked_again_after_it_is_built(
+    docker_service, experiment_template
+):
+    get_registry_data = docker_service.docker_client.images.get_registry_data
+    get_registry_data.side_effect = NotFound("missing")
+
+    assert await docker_service.check_image(experiment_template) is False
+    assert await docker_service.check_image(experiment_template) is False
+    assert get_registry_data.call_count == 1
+
+    await docker_service.build_image(experiment_template)
+    get_registry_data.side_effect = None
+    get_registry_data.return_value = Mock(id="sha256:abc")
+
+    assert await docker_service.check_image(experiment_template) is True
+    assert get_registry_data.call_count == 2
+
+
+async def test_missing_image_is_not_remembered_for_long(
+    mocker, docker_service, experiment_template
+):
+    mocker.patch.object(settings, "IMAGE_CHECK_NEGATIVE_TTL", 0)
+    get_registry_data = docker_service.docker_client.images.get_registry_data
+    get_registry_data.side_effect = NotFound("missing")
+
+    await docker_service.check_image(experiment_template)
+    await docker_service.check_image(experiment_template)
+
+    assert get_registry_data.call_count == 2
@@ -0,0 +1,88 @@
+from unittest.mock import Mock
+
+import pytest
+from fastapi import HTTPException
+
+from app.config import settings
+from app.helpers import Pagination
+from app.schemas.states import SearchJobState
+from app.services.aiod import AssetType
+from app.services.enhanced_search import (
+    enhanced_search,
+    enhanced_search_jobs,
+    get_enhanced_search_job,
+    submit_enhanced_search,
+)
+
+
+def create_results(count: int) -> list[dict]:
+    return [{"asset": {"name": f"asset_{i}"}} for i in range(count)]
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(mocker):
+    mocker.patch.object(settings.AIOD_ENHANCED_SEARCH_API, "POLL_INITIAL_DELAY", 0.001)
+    mocker.patch.object(settings.AIOD_ENHANCED_SEARCH_API, "POLL_MAX_DELAY", 0.001)
+    enhanced_search_jobs.jobs.clear()
+    enhanced_search_jobs.latest_jobs.clear()
+
+
+@pytest.fixture
+def enhanced_search_mock(async_client_mock):
+    initial_response = Mock(status_code=202, headers={"location": "query/1/result"})
+    in_progress_response = Mock(status_code=200)
+    in_progress_response.json.return_value = {"status": "In progress"}
+    completed_response = Mock(status_code=200)
+    completed_response.json.return_value = {"status": "Completed", "results": create_results(10)}
+
+    async_client_mock.post.return_value = initial_response
+    async_client_mock.get.side_effect = [in_progress_response, in_progress_response] + [
+        completed_response
+    ] * 5
+    return async_client_mock
+
+
+@pytest.mark.asyncio
+async def test_enhanced_search_polls_until_completed(enhanced_search_mock):
+    assets = await enhanced_search(AssetType.DATASETS, "query", Pagination(offset=2, limit=3))
+
+    assert assets == [{"name": "asset_2"}, {"name": "asset_3"}, {"name": "asset_4"}]
+    enhanced_search_mock.post.assert_called_once_with(
+        "query", params={"search_query": "query", "asset_type": "datasets", "topk": 5}
+    )
+    assert enhanced_search_mock.get.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_identical_enhanced_searches_share_one_job(enhanced_search_mock):
+    job = submit_enhanced_search(AssetType.DATASETS, "query", Pagination(offset=0, limit=10))
+    same_job = submit_enhanced_search(AssetType.DATASETS, "query", Pagination(offset=0, limit=5))
+    await enhanced_search_jobs.wait(job)
+
+    # the next page is served from the results of the completed job
+    assets = await enhanced_search(AssetType.DATASETS, "query", Pagination(offset=5, limit=5))
+
+    assert same_job.id == job.id
+    assert get_enhanced_search_job(job.id).state == SearchJobState.COMPLETED
+    assert len(assets) == 5
+    enhanced_search_mock.post.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_enhanced_search_with_more_results_starts_new_job(enhanced_search_mock):
+    job = submit_enhanced_search(AssetType.DATASETS, "query", Pagination(offset=0, limit=5))
+    await enhanced_search_jobs.wait(job)
+
+    new_job = submit_enhanced_search(AssetType.DATASETS, "query", Pagination(offset=5, limit=5))
+
+    assert new_job.id != job.id and new_job.topk == 10
+
+
+@pytest.mark.asyncio
+async def test_failed_enhanced_search_raises_exception(async_client_mock):
+    async_client_mock.post.return_value = Mock(status_code=500)
+
+    with pytest.raises(HTTPException) as exception_info:
+        await enhanced_search(AssetType.DATASETS, "query", Pagination())
+
+    assert exception_info.value.status_code == 500
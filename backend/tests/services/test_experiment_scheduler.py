@@ -0,0 +1,266 @@
+import asyncio
+from functools import partial
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from app.config import settings
+from app.models.experiment_template import ExperimentTemplate
+from app.models.scheduled_job import ScheduledJob
+from app.schemas.states import TemplateState
+from app.services.experiment_scheduler import ExperimentScheduler, ReleasableSlot
+from beanie import PydanticObjectId
+
+
+@pytest.fixture
+async def scheduler(mocker):
+    await ScheduledJob.find_all().delete()
+    mocker.patch.object(settings, "MAX_PARALLEL_PREPROCESSING", 2)
+    mocker.patch.object(settings, "MAX_PARALLEL_CONTAINERS", 2)
+    mocker.patch.object(settings, "MAX_PARALLEL_POSTPROCESSING", 1)
+    workflow_engine = Mock()
+    workflow_engine.is_available = AsyncMock(return_value=True)
+    return ExperimentScheduler(container_platform=Mock(), workflow_engine=workflow_engine)
+
+
+@pytest.fixture
+async def running_scheduler(scheduler):
+    task = asyncio.create_task(scheduler.schedule_experiment_runs())
+    yield scheduler
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_run_is_dispatched_as_soon_as_it_is_enqueued(running_scheduler):
+    started = asyncio.Event()
+
+    async def execute_experiment_run(exp_run_id, preprocessing_slot=None):
+        started.set()
+
+    running_scheduler.execute_experiment_run = execute_experiment_run
+    await running_scheduler.add_run_to_execute(PydanticObjectId())
+
+    await asyncio.wait_for(started.wait(), timeout=1)
+    assert running_scheduler.run_queue_wait.count == 1
+
+
+@pytest.mark.asyncio
+async def test_runs_wait_for_a_free_slot(running_scheduler):
+    started_runs = []
+    finish_run = asyncio.Event()
+
+    async def execute_experiment_run(exp_run_id, preprocessing_slot=None):
+        started_runs.append(exp_run_id)
+        await finish_run.wait()
+
+    running_scheduler.execute_experiment_run = execute_experiment_run
+    run_ids = [PydanticObjectId() for _ in range(3)]
+    for run_id in run_ids:
+        await running_scheduler.add_run_to_execute(run_id)
+
+    await asyncio.sleep(0.05)
+    assert started_runs == run_ids[:2]
+    metrics = await running_scheduler.get_metrics()
+    assert metrics["runs"]["queued"] == 1
+    assert metrics["runs"]["in_progress"] == 2
+    assert metrics["runs"]["active"] == 2
+
+    finish_run.set()
+    await asyncio.sleep(0.05)
+    assert started_runs == run_ids
+    metrics = await running_scheduler.get_metrics()
+    assert metrics["runs"]["active"] == 0
+    assert await ScheduledJob.count() == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_run_frees_its_slot(running_scheduler):
+    executed_runs = []
+
+    async def execute_experiment_run(exp_run_id, preprocessing_slot=None):
+        executed_runs.append(exp_run_id)
+        raise RuntimeError("Unexpected error")
+
+    running_scheduler.execute_experiment_run = execute_experiment_run
+    for _ in range(5):
+        await running_scheduler.add_run_to_execute(PydanticObjectId())
+
+    await asyncio.sleep(0.05)
+    assert len(executed_runs) == 5
+    assert await ScheduledJob.count() == 0
+
+
+@pytest.mark.asyncio
+async def test_run_enqueued_during_its_execution_is_executed_again(running_scheduler):
+    executed_runs = []
+
+    async def execute_experiment_run(exp_run_id, preprocessing_slot=None):
+        executed_runs.append(exp_run_id)
+        if len(executed_runs) == 1:
+            # e.g. the workflow engine has been disconnected
+            await running_scheduler.add_run_to_execute(exp_run_id)
+
+    running_scheduler.execute_experiment_run = execute_experiment_run
+    run_id = PydanticObjectId()
+    await running_scheduler.add_run_to_execute(run_id)
+
+    await asyncio.sleep(0.05)
+    assert executed_runs == [run_id, run_id]
+    assert await ScheduledJob.count() == 0
+
+
+@pytest.mark.asyncio
+async def test_postprocessed_runs_do_not_hold_execution_slots(running_scheduler):
+    executed_runs = []
+    finish_postprocessing = asyncio.Event()
+
+    async def execute_experiment_run(exp_run_id, preprocessing_slot=None):
+        async with running_scheduler.running_slot(preprocessing_slot):
+            executed_runs.append(exp_run_id)
+        async with running_scheduler.postprocessing_slot():
+            await finish_postprocessing.wait()
+
+    running_scheduler.execute_experiment_run = execute_experiment_run
+    run_ids = [PydanticObjectId() for _ in range(4)]
+    for run_id in run_ids:
+        await running_scheduler.add_run_to_execute(run_id)
+
+    await asyncio.sleep(0.05)
+    # all runs have been executed while the first one is still being postprocessed
+    assert executed_runs == run_ids
+    metrics = await running_scheduler.get_metrics()
+    assert metrics["runs"]["phases"]["running"]["active"] == 0
+    assert metrics["runs"]["phases"]["postprocessing"]["active"] == 1
+    assert metrics["runs"]["phases"]["preprocessing"]["active"] == 0
+    assert metrics["runs"]["run_slot_wait"]["count"] == 4
+
+    finish_postprocessing.set()
+    await asyncio.sleep(0.05)
+    assert await ScheduledJob.count() == 0
+    metrics = await running_scheduler.get_metrics()
+    assert metrics["runs"]["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_runs_are_preprocessed_only_ahead_of_free_execution_slots(running_scheduler):
+    preprocessed_runs = []
+    finish_runs = asyncio.Event()
+
+    async def execute_experiment_run(exp_run_id, preprocessing_slot=None):
+        preprocessed_runs.append(exp_run_id)
+        async with running_scheduler.running_slot(preprocessing_slot):
+            await finish_runs.wait()
+
+    running_scheduler.execute_experiment_run = execute_experiment_run
+    for _ in range(6):
+        await running_scheduler.add_run_to_execute(PydanticObjectId())
+
+    await asyncio.sleep(0.05)
+    # 2 runs are being executed, 2 more are prepared and wait for a free slot
+    assert len(preprocessed_runs) == 4
+    metrics = await running_scheduler.get_metrics()
+    assert metrics["runs"]["queued"] == 2
+    assert metrics["runs"]["phases"]["running"]["active"] == 2
+    assert metrics["runs"]["phases"]["preprocessing"]["active"] == 2
+
+    finish_runs.set()
+    await asyncio.sleep(0.05)
+    assert len(preprocessed_runs) == 6
+
+
+def missing_image_template(image_name: str = "registry/rail-exp-templates:env-a") -> Mock:
+    return Mock(
+        id=PydanticObjectId(),
+        image_name=image_name,
+        state=TemplateState.CREATED,
+        retry_count=0,
+        update_state_in_db=AsyncMock(),
+    )
+
+
+@pytest.fixture
+def slow_image_build(scheduler):
+    finish_build = asyncio.Event()
+
+    async def build_image(template):
+        await finish_build.wait()
+        return True
+
+    scheduler.container_platform.check_image = AsyncMock(return_value=False)
+    scheduler.container_platform.build_image = AsyncMock(side_effect=build_image)
+    return finish_build
+
+
+@pytest.mark.asyncio
+async def test_concurrent_rebuilds_of_an_image_are_deduplicated(
+    mocker, scheduler, slow_image_build
+):
+    experiment_template = missing_image_template()
+    mocker.patch.object(ExperimentTemplate, "get", AsyncMock(return_value=experiment_template))
+
+    environment_build = asyncio.create_task(
+        scheduler.build_experiment_environment(experiment_template.id)
+    )
+    rebuilds = [
+        asyncio.create_task(scheduler._rebuild_image_if_necessary(Mock(), experiment_template))
+        for _ in range(3)
+    ]
+    await asyncio.sleep(0.01)
+    assert (await scheduler.get_metrics())["runs"]["waiting_for_image"] == 3
+
+    slow_image_build.set()
+    assert await asyncio.gather(environment_build, *rebuilds) == [True, True, True, True]
+    scheduler.container_platform.build_image.assert_awaited_once()
+    assert (await scheduler.get_metrics())["runs"]["waiting_for_image"] == 0
+
+
+@pytest.mark.asyncio
+async def test_templates_with_the_same_environment_share_a_build(
+    mocker, scheduler, slow_image_build
+):
+    templates = [missing_image_template(), missing_image_template()]
+    other_template = missing_image_template("registry/rail-exp-templates:env-b")
+    mocker.patch.object(
+        ExperimentTemplate,
+        "get",
+        AsyncMock(
+            side_effect=lambda template_id: next(
+                t for t in [*templates, other_template] if t.id == template_id
+            )
+        ),
+    )
+
+    builds = [
+        asyncio.create_task(scheduler.build_experiment_environment(t.id))
+        for t in [*templates, other_template]
+    ]
+    await asyncio.sleep(0.01)
+    slow_image_build.set()
+
+    assert await asyncio.gather(*builds) == [True, True, True]
+    assert scheduler.container_platform.build_image.await_count == 2
+    # the template that waited for the build of the other one is finished as well
+    templates[1].update_state_in_db.assert_awaited_with(TemplateState.FINISHED)
+
+
+@pytest.mark.asyncio
+async def test_run_waits_for_image_without_a_preprocessing_slot(scheduler, slow_image_build):
+    await scheduler.preprocessing_semaphore.acquire()
+    scheduler.active_run_phases["preprocessing"] += 1
+    preprocessing_slot = ReleasableSlot(
+        scheduler.preprocessing_semaphore,
+        on_release=partial(scheduler._leave_phase, "preprocessing"),
+        on_acquire=partial(scheduler._enter_phase, "preprocessing"),
+    )
+
+    rebuild = asyncio.create_task(
+        scheduler._rebuild_image_if_necessary(Mock(), missing_image_template(), preprocessing_slot)
+    )
+    await asyncio.sleep(0.01)
+    assert preprocessing_slot.held is False
+    assert scheduler.active_run_phases["preprocessing"] == 0
+
+    slow_image_build.set()
+    assert await rebuild is True
+    assert preprocessing_slot.held is True
+    assert scheduler.active_run_phases["preprocessing"] == 1
@@ -0,0 +1,139 @@
+import asyncio
+from collections import Counter
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from app.config import settings
+from app.models.scheduled_job import JobKind, ScheduledJob
+from app.services.experiment_scheduler import ExperimentScheduler
+from app.services.job_queue import JobQueue
+from beanie import PydanticObjectId
+
+
+@pytest.fixture(autouse=True)
+async def clear_queue():
+    await ScheduledJob.find_all().delete()
+
+
+def create_queue(worker_id: str, lease_duration: float = 60) -> JobQueue:
+    return JobQueue(
+        JobKind.EXPERIMENT_RUN, worker_id, lease_duration=lease_duration, poll_interval=0.01
+    )
+
+
+@pytest.mark.asyncio
+async def test_job_is_claimed_by_single_worker():
+    queue_a, queue_b = create_queue("worker-a"), create_queue("worker-b")
+    await queue_a.put(PydanticObjectId())
+
+    claimed = await asyncio.gather(queue_a.claim(), queue_b.claim())
+
+    assert len([job for job in claimed if job is not None]) == 1
+
+
+@pytest.mark.asyncio
+async def test_put_if_absent_does_not_duplicate_jobs():
+    queue = create_queue("worker-a")
+    target_id = PydanticObjectId()
+
+    assert await queue.put_if_absent(target_id) is True
+    await queue.claim()
+    assert await queue.put_if_absent(target_id) is False
+
+    assert await ScheduledJob.count() == 1
+    assert await queue.claim() is None
+
+
+@pytest.mark.asyncio
+async def test_job_with_expired_lease_is_reclaimed():
+    crashed_worker = create_queue("worker-a", lease_duration=0.05)
+    worker = create_queue("worker-b")
+    target_id = PydanticObjectId()
+    await crashed_worker.put(target_id)
+    lost_job = await crashed_worker.claim()
+
+    assert await worker.claim() is None
+    await asyncio.sleep(0.1)
+
+    job = await worker.claim()
+    assert job.target_id == target_id
+    assert job.lease_owner == "worker-b"
+    assert job.attempts == 2
+
+    # the former owner can neither renew nor complete the job anymore
+    assert await crashed_worker.heartbeat(lost_job) is False
+    await crashed_worker.complete(lost_job)
+    assert await ScheduledJob.count() == 1
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_keeps_lease():
+    worker = create_queue("worker-a", lease_duration=0.1)
+    other_worker = create_queue("worker-b")
+    await worker.put(PydanticObjectId())
+    job = await worker.claim()
+
+    for _ in range(3):
+        await asyncio.sleep(0.05)
+        assert await worker.heartbeat(job) is True
+        assert await other_worker.claim() is None
+
+    await worker.complete(job)
+    assert await ScheduledJob.count() == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("n_workers", [1, 4])
+async def test_runs_are_shared_by_multiple_workers(mocker, n_workers):
+    """Simulated replicas share the queue of runs executed by a fake workflow engine"""
+    n_runs, run_duration, slots_per_worker = 24, 0.05, 2
+    mocker.patch.object(settings, "MAX_PARALLEL_CONTAINERS", slots_per_worker)
+    mocker.patch.object(settings.JOB_QUEUE, "POLL_INTERVAL", 0.01)
+
+    executed_runs = []
+    all_executed = asyncio.Event()
+    executed_by_worker: Counter[str] = Counter()
+    running_by_worker: Counter[str] = Counter()
+    max_running_by_worker: Counter[str] = Counter()
+
+    def create_execute_experiment_run(worker: ExperimentScheduler):
+        async def execute_experiment_run(exp_run_id, preprocessing_slot=None):
+            async with worker.running_slot(preprocessing_slot):
+                running_by_worker[worker.worker_id] += 1
+                max_running_by_worker[worker.worker_id] = max(
+                    max_running_by_worker[worker.worker_id], running_by_worker[worker.worker_id]
+                )
+                await asyncio.sleep(run_duration)
+                running_by_worker[worker.worker_id] -= 1
+            executed_by_worker[worker.worker_id] += 1
+            executed_runs.append(exp_run_id)
+            if len(executed_runs) == n_runs:
+                all_executed.set()
+
+        return execute_experiment_run
+
+    workers = []
+    for i in range(n_workers):
+        workflow_engine = Mock(is_available=AsyncMock(return_value=True))
+        worker = ExperimentScheduler(Mock(), workflow_engine, worker_id=f"worker-{i}")
+        worker.execute_experiment_run = create_execute_experiment_run(worker)
+        workers.append(worker)
+
+    run_ids = [PydanticObjectId() for _ in range(n_runs)]
+    for run_id in run_ids:
+        await workers[0].add_run_to_execute(run_id)
+
+    tasks = [asyncio.create_task(worker.schedule_experiment_runs()) for worker in workers]
+    try:
+        await asyncio.wait_for(all_executed.wait(), timeout=10)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert sorted(executed_runs) == sorted(run_ids)
+    # each worker executes runs in parallel, but never more than its slots
+    assert all(0 < count <= slots_per_worker for count in max_running_by_worker.values())
+    if n_workers > 1:
+        assert all(executed_by_worker[worker.worker_id] > 0 for worker in workers)
+        assert all(worker.run_queue_wait.count > 0 for worker in workers)
@@ -0,0 +1,133 @@
+import asyncio
+import json
+import sys
+from unittest.mock import Mock
+
+import pytest
+
+from app.config import LocalExecutionMode, LocalWorkflowsConfig, Settings
+from app.helpers import WorkflowState
+from app.services.workflow_engines.local import LocalWorkflowEngine
+
+SCRIPT = """
+import json, os
+print("model:", os.environ["MODEL"])
+os.makedirs("output-temp/plots", exist_ok=True)
+with open("output-temp/metrics.json", "w") as f:
+    json.dump({"accuracy": 0.9}, f)
+with open("output-temp/plots/loss.txt", "w") as f:
+    f.write("0123456789")
+"""
+
+
+@pytest.fixture
+def experiment_run(tmp_path):
+    return Mock(
+        id="1",
+        workflow_name="run-1",
+        run_path=tmp_path,
+        run_output_path=tmp_path / "output",
+        logs_path=tmp_path / "logs.txt",
+    )
+
+
+@pytest.fixture
+def local_engine():
+    return LocalWorkflowEngine(
+        LocalWorkflowsConfig(MODE=LocalExecutionMode.PROCESS, PYTHON_EXECUTABLE=sys.executable)
+    )
+
+
+async def prepare_run(mocker, local_engine, experiment_run, tmp_path, script: str) -> None:
+    template_path = tmp_path / "template"
+    template_path.mkdir()
+    template_path.joinpath("script.py").write_text(script)
+    template_path.joinpath("reana.yaml").write_text("version: 0.6.0")
+    mocker.patch.object(Settings, "get_experiment_template_path", return_value=template_path)
+
+    await local_engine.preprocess_workflow(experiment_run, Mock(), {"MODEL": "bert base"})
+
+
+async def test_run_workflow_captures_logs_and_moves_outputs(
+    mocker, local_engine, experiment_run, tmp_path
+):
+    await prepare_run(mocker, local_engine, experiment_run, tmp_path, SCRIPT)
+
+    workflow_state = await local_engine.run_workflow(experiment_run)
+    await local_engine.postprocess_workflow(experiment_run, workflow_state)
+
+    assert workflow_state.success is True
+    assert await local_engine.get_logs(experiment_run) == "model: bert base\n"
+    assert json.loads((tmp_path / "output/metrics.json").read_text()) == {"accuracy": 0.9}
+    assert not (tmp_path / "output-temp").exists()
+    assert [file.filepath for file in await local_engine.list_files(experiment_run)] == [
+        "output/metrics.json",
+        "output/plots/loss.txt",
+    ]
+
+
+async def test_failed_workflow_appends_error_to_logs(
+    mocker, local_engine, experiment_run, tmp_path
+):
+    await prepare_run(mocker, local_engine, experiment_run, tmp_path, "raise SystemExit('oops')")
+
+    workflow_state = await local_engine.run_workflow(experiment_run)
+    await local_engine.postprocess_workflow(experiment_run, workflow_state)
+
+    assert workflow_state == WorkflowState(
+        success=False, error_message="Error encountered when running a local workflow.\n\n"
+    )
+    logs = await local_engine.get_logs(experiment_run)
+    assert logs.startswith("oops\n")
+    assert logs.endswith(workflow_state.error_message)
+
+
+async def test_stop_workflow_kills_the_process(mocker, local_engine, experiment_run, tmp_path):
+    await prepare_run(mocker, local_engine, experiment_run, tmp_path, "import time\ntime.sleep(30)")
+
+    run_task = asyncio.create_task(local_engine.run_workflow(experiment_run))
+    while "run-1" not in local_engine.running:
+        await asyncio.sleep(0.01)
+    assert await local_engine.stop_workflow(experiment_run) is True
+    workflow_state = await asyncio.wait_for(run_task, timeout=5)
+
+    assert workflow_state.success is False
+    assert workflow_state.manually_stopped is True
+    assert local_engine.running == {}
+
+
+async def test_script_does_not_inherit_environment_of_rail(
+    mocker, monkeypatch, local_engine, experiment_run, tmp_path
+):
+    monkeypatch.setenv("REANA_ACCESS_TOKEN", "secret")
+    script = "import os\nprint(os.environ.get('REANA_ACCESS_TOKEN'), os.environ['MODEL'])"
+    await prepare_run(mocker, local_engine, experiment_run, tmp_path, script)
+
+    await local_engine.run_workflow(experiment_run)
+
+    assert await local_engine.get_logs(experiment_run) == "None bert base\n"
+
+
+async def test_stream_file_range(local_engine, experiment_run, tmp_path):
+    (tmp_path / "output").mkdir()
+    (tmp_path / "output/data.txt").write_text("0123456789")
+
+    file_stream = await local_engine.stream_file(experiment_run, "output/data.txt", "bytes=2-4")
+    content = b"".join([chunk async for chunk in file_stream.chunks])
+
+    assert content == b"234"
+    assert file_stream.status_code == 206
+    assert file_stream.headers["Content-Range"] == "bytes 2-4/10"
+
+    file_stream = await local_engine.stream_file(experiment_run, "output/data.txt", "bytes=20-")
+    assert file_stream.status_code == 416
+    assert file_stream.headers["Content-Range"] == "bytes */10"
+
+
+async def test_stream_file_outside_workspace(local_engine, experiment_run, tmp_path):
+    (tmp_path / "output").mkdir()
+    (tmp_path / ".env").write_text('SECRET="1"')
+
+    assert await local_engine.stream_file(experiment_run, ".env") is None
+    assert await local_engine.stream_file(experiment_run, "output/../.env") is None
+    assert await local_engine.stream_file(experiment_run, "output/missing.txt") is None
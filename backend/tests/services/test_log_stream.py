@@ -0,0 +1,99 @@
+from unittest.mock import AsyncMock
+
+import pytest
+from beanie import PydanticObjectId
+
+from app.models.experiment_run import ExperimentRun
+from app.schemas.states import RunState
+from app.services.log_stream import format_event, stream_logs
+from app.services.workflow_engines.base import WorkflowConnectionException
+
+
+async def create_run(state: RunState) -> ExperimentRun:
+    experiment_run = ExperimentRun(
+        experiment_id=PydanticObjectId(), created_by="user@rail.eu", is_public=False, state=state
+    )
+    return await experiment_run.insert()
+
+
+def parse_events(messages: list[str]) -> list[dict]:
+    events = []
+    for message in messages:
+        fields: dict = {}
+        for line in message.strip("\n").split("\n"):
+            key, _, value = line.partition(": ")
+            if key == "data":
+                fields["data"] = value if "data" not in fields else f"{fields['data']}\n{value}"
+            elif key in ("event", "id"):
+                fields[key] = value
+        if "event" in fields:
+            events.append(fields)
+    return events
+
+
+@pytest.mark.asyncio
+async def test_logs_are_tailed_until_run_concludes():
+    experiment_run = await create_run(RunState.RUNNING)
+    logs = ["", "epoch 1\n", "epoch 1\n", "epoch 1\nepoch 2\n", "epoch 1\nepoch 2\ndone"]
+
+    async def get_logs(run):
+        current_logs = logs.pop(0)
+        if len(logs) == 0:
+            await run.update_state_in_db(RunState.FINISHED)
+        return current_logs
+
+    workflow_engine = AsyncMock()
+    workflow_engine.get_logs.side_effect = get_logs
+
+    messages = [m async for m in stream_logs(experiment_run.id, workflow_engine, 0, interval=0)]
+    events = parse_events(messages)
+
+    assert messages[0] == "retry: 0\n\n"
+    assert events == [
+        {"event": "log", "id": "8", "data": "epoch 1\n"},
+        {"event": "log", "id": "16", "data": "epoch 2\n"},
+        {"event": "log", "id": "20", "data": "done"},
+        {"event": "end", "data": "FINISHED"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_logs_are_resumed_from_offset():
+    experiment_run = await create_run(RunState.FINISHED)
+    workflow_engine = AsyncMock()
+    workflow_engine.get_logs.return_value = "epoch 1\nepoch 2\n"
+
+    messages = [m async for m in stream_logs(experiment_run.id, workflow_engine, 8, interval=0)]
+
+    assert parse_events(messages) == [
+        {"event": "log", "id": "16", "data": "epoch 2\n"},
+        {"event": "end", "data": "FINISHED"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_logs_are_not_fetched_before_run_starts():
+    experiment_run = await create_run(RunState.CREATED)
+    workflow_engine = AsyncMock()
+
+    stream = stream_logs(experiment_run.id, workflow_engine, 0, interval=0)
+    messages = [await anext(stream) for _ in range(3)]
+    await stream.aclose()
+
+    assert parse_events(messages) == []
+    workflow_engine.get_logs.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_unavailable_logs_are_skipped():
+    experiment_run = await create_run(RunState.CRASHED)
+    workflow_engine = AsyncMock()
+    workflow_engine.get_logs.side_effect = WorkflowConnectionException()
+
+    messages = [m async for m in stream_logs(experiment_run.id, workflow_engine, 0, interval=0)]
+
+    assert parse_events(messages) == [{"event": "end", "data": "CRASHED"}]
+
+
+def test_multiline_event():
+    assert format_event("log", "a\r\nb\n", 5) == "event: log\nid: 5\ndata: a\ndata: b\ndata: \n\n"
@@ -0,0 +1,101 @@
+import io
+import tarfile
+import zipfile
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.helpers import FileDetail, FileStream
+from app.services.output_archive import ArchiveFormat, stream_archive
+
+files = {
+    "output/metrics.json": b'{"accuracy": 0.9}',
+    "output/model/weights.bin": bytes(range(256)) * 1000,
+    "output/empty.txt": b"",
+}
+
+
+def create_file_details(files: dict[str, bytes]) -> list[FileDetail]:
+    return [
+        FileDetail(
+            filepath=filepath,
+            size=len(content),
+            last_modified=datetime(2024, 5, 1, tzinfo=timezone.utc),
+        )
+        for filepath, content in files.items()
+    ]
+
+
+def create_open_file(files: dict[str, bytes]):
+    closes = []
+
+    async def open_file(filepath: str) -> FileStream | None:
+        if filepath not in files:
+            return None
+
+        async def chunks():
+            content = files[filepath]
+            for i in range(0, len(content), 10_000):
+                yield content[i : i + 10_000]
+
+        close = AsyncMock()
+        closes.append(close)
+        return FileStream(filename=filepath, chunks=chunks(), close=close)
+
+    return open_file, closes
+
+
+async def build_archive(archive_format: ArchiveFormat, file_details, open_file) -> list[bytes]:
+    return [chunk async for chunk in stream_archive(file_details, open_file, archive_format)]
+
+
+@pytest.mark.asyncio
+async def test_zip_archive():
+    open_file, closes = create_open_file(files)
+    chunks = await build_archive(ArchiveFormat.ZIP, create_file_details(files), open_file)
+
+    assert len(chunks) > 1
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as zip_file:
+        assert zip_file.testzip() is None
+        assert {name: zip_file.read(name) for name in zip_file.namelist()} == files
+    assert all(close.await_count == 1 for close in closes)
+
+
+@pytest.mark.asyncio
+async def test_tar_gz_archive():
+    open_file, closes = create_open_file(files)
+    chunks = await build_archive(ArchiveFormat.TAR_GZ, create_file_details(files), open_file)
+
+    assert len(chunks) > 1
+    # the archive can be extracted sequentially, i.e. while it's being downloaded
+    with tarfile.open(fileobj=io.BytesIO(b"".join(chunks)), mode="r|gz") as tar_file:
+        extracted = {member.name: tar_file.extractfile(member).read() for member in tar_file}
+        assert extracted == files
+        assert tar_file.members[0].mtime == datetime(2024, 5, 1, tzinfo=timezone.utc).timestamp()
+    assert all(close.await_count == 1 for close in closes)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("archive_format", list(ArchiveFormat))
+async def test_missing_files_are_left_out(archive_format):
+    open_file, _ = create_open_file(files)
+    file_details = create_file_details({**files, "output/deleted.txt": b"123"})
+    chunks = await build_archive(archive_format, file_details, open_file)
+
+    if archive_format == ArchiveFormat.ZIP:
+        with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as zip_file:
+            assert zip_file.namelist() == list(files)
+    else:
+        with tarfile.open(fileobj=io.BytesIO(b"".join(chunks)), mode="r:gz") as tar_file:
+            assert tar_file.getnames() == list(files)
+
+
+@pytest.mark.asyncio
+async def test_tar_gz_archive_fails_if_file_size_changes():
+    open_file, closes = create_open_file({"output/metrics.json": b"{}"})
+    file_details = create_file_details({"output/metrics.json": b"{...}"})
+
+    with pytest.raises(ValueError):
+        await build_archive(ArchiveFormat.TAR_GZ, file_details, open_file)
+    closes[0].assert_awaited()
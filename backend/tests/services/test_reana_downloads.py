@@ -0,0 +1,98 @@
+from unittest.mock import Mock
+
+import httpx
+import pytest
+
+from app.services.workflow_engines.reana import ReanaService
+
+file_content = b"0123456789" * 1000
+
+
+class ChunkedStream(httpx.AsyncByteStream):
+    def __init__(self, content: bytes, chunk_size: int = 1024) -> None:
+        self.content = content
+        self.chunk_size = chunk_size
+
+    async def __aiter__(self):
+        for i in range(0, len(self.content), self.chunk_size):
+            yield self.content[i : i + self.chunk_size]
+
+
+def streamed_response(status_code: int, content: bytes, headers: dict) -> httpx.Response:
+    headers = {**headers, "Content-Length": str(len(content))}
+    return httpx.Response(status_code, stream=ChunkedStream(content), headers=headers)
+
+
+def reana_workspace(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/api/workflows/run-1/workspace/output/metrics.json":
+        byte_range = request.headers.get("Range")
+        if byte_range is None:
+            return streamed_response(200, file_content, headers={"Accept-Ranges": "bytes"})
+
+        start = int(byte_range.removeprefix("bytes=").split("-")[0])
+        return streamed_response(
+            206,
+            file_content[start:],
+            headers={"Content-Range": f"bytes {start}-{len(file_content) - 1}/{len(file_content)}"},
+        )
+    if request.url.path == "/api/workflows/run-1/workspace/output":
+        return streamed_response(200, b"PK", headers={"Content-Type": "application/zip"})
+    return httpx.Response(404, json={"message": "File not found"})
+
+
+@pytest.fixture
+def reana_service():
+    service = ReanaService()
+    service.http_client = httpx.AsyncClient(
+        base_url="https://reana.test", transport=httpx.MockTransport(reana_workspace)
+    )
+    return service
+
+
+async def read_all(file_stream) -> bytes:
+    return b"".join([chunk async for chunk in file_stream.chunks])
+
+
+@pytest.mark.asyncio
+async def test_stream_file(reana_service):
+    file_stream = await reana_service.stream_file(
+        Mock(workflow_name="run-1"), "output/metrics.json"
+    )
+
+    assert file_stream.filename == "metrics.json"
+    assert file_stream.status_code == 200
+    assert file_stream.headers["Content-Length"] == str(len(file_content))
+    assert await read_all(file_stream) == file_content
+
+
+@pytest.mark.asyncio
+async def test_stream_byte_range_of_file(reana_service):
+    file_stream = await reana_service.stream_file(
+        Mock(workflow_name="run-1"), "output/metrics.json", byte_range="bytes=9000-"
+    )
+
+    assert file_stream.status_code == 206
+    assert file_stream.headers["Content-Range"] == "bytes 9000-9999/10000"
+    assert await read_all(file_stream) == file_content[9000:]
+
+
+@pytest.mark.asyncio
+async def test_stream_directory_as_zip(reana_service):
+    file_stream = await reana_service.stream_file(Mock(workflow_name="run-1"), "output/")
+
+    assert file_stream.filename == "output.zip"
+
+
+@pytest.mark.asyncio
+async def test_stream_missing_file(reana_service):
+    assert await reana_service.stream_file(Mock(workflow_name="run-1"), "missing.txt") is None
+
+
+@pytest.mark.asyncio
+async def test_download_file_writes_chunks(reana_service, tmp_path):
+    savepath = await reana_service.download_file(
+        Mock(workflow_name="run-1"), "output/metrics.json", tmp_path
+    )
+
+    assert savepath == tmp_path / "metrics.json"
+    assert savepath.read_bytes() == file_content
@@ -0,0 +1,80 @@
+import asyncio
+from unittest.mock import Mock
+
+import pytest
+
+from app.services.workflow_engines.reana import ReanaConnectionException, ReanaService
+from app.services.workflow_engines.reana_health import ReanaHealthMonitor
+
+
+@pytest.fixture
+def reana_service(mocker):
+    service = ReanaService()
+    mocker.patch.object(service.health_monitor, "ping", Mock(return_value=True))
+    return service
+
+
+@pytest.mark.asyncio
+async def test_successful_calls_do_not_ping(reana_service):
+    reana_call = Mock(return_value="result")
+
+    for _ in range(3):
+        assert await reana_service._call_reana(reana_call) == "result"
+
+    assert reana_service.health_monitor.ping.call_count == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_call_rechecks_availability(reana_service):
+    reana_call = Mock(side_effect=ValueError("File not found"))
+
+    with pytest.raises(ValueError):
+        await reana_service._call_reana(reana_call)
+
+    assert reana_service.health_monitor.ping.call_count == 1
+    assert await reana_service.is_available() is True
+
+
+@pytest.mark.asyncio
+async def test_calls_are_refused_while_reana_is_unavailable(reana_service):
+    reana_service.health_monitor.ping.return_value = False
+    reana_call = Mock(side_effect=ConnectionError())
+
+    with pytest.raises(ReanaConnectionException):
+        await reana_service._call_reana(reana_call)
+    with pytest.raises(ReanaConnectionException):
+        await reana_service._call_reana(reana_call)
+
+    assert reana_call.call_count == 1
+    assert await reana_service.is_available() is False
+
+    reana_service.health_monitor.ping.return_value = True
+    await reana_service.health_monitor.check()
+    await reana_service._call_reana(Mock())
+
+
+@pytest.mark.asyncio
+async def test_concurrent_failures_share_single_check(reana_service):
+    reana_call = Mock(side_effect=ConnectionError())
+
+    await asyncio.gather(
+        *[reana_service._call_reana(reana_call) for _ in range(5)], return_exceptions=True
+    )
+
+    assert reana_service.health_monitor.ping.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_checks_back_off_while_reana_is_unavailable():
+    monitor = ReanaHealthMonitor(Mock(return_value=False), interval=30, max_backoff=10)
+
+    delays = []
+    for _ in range(6):
+        await monitor.check()
+        delays.append(monitor.get_next_check_delay())
+
+    assert delays == [1, 2, 4, 8, 10, 10]
+
+    monitor.ping.return_value = True
+    await monitor.check()
+    assert monitor.get_next_check_delay() == 30
@@ -0,0 +1,71 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from app.config import LOGS_FILENAME
+from app.helpers import WorkflowState
+from app.services.workflow_engines.reana import ReanaService
+
+
+def reana_logs(*job_logs: str) -> str:
+    return json.dumps(
+        {
+            "workflow_logs": "workflow engine output",
+            "job_logs": {f"job-{i}": {"logs": logs} for i, logs in enumerate(job_logs)},
+            "engine_specific": None,
+        }
+    )
+
+
+@pytest.fixture
+def experiment_run(tmp_path):
+    return Mock(workflow_name="run-1", run_path=tmp_path)
+
+
+@pytest.mark.asyncio
+async def test_logs_of_active_workflow_are_fetched_once_per_interval(mocker, experiment_run):
+    reana_service = ReanaService()
+    reana_call = mocker.patch.object(
+        reana_service,
+        "_async_reana_call",
+        AsyncMock(return_value={"logs": reana_logs("epoch 1\n", "epoch 2\n")}),
+    )
+
+    logs = await asyncio.gather(*[reana_service.get_logs(experiment_run) for _ in range(5)])
+    logs.append(await reana_service.get_logs(experiment_run))
+
+    assert logs == ["epoch 1\nepoch 2\n"] * 6
+    reana_call.assert_awaited_once_with("get_workflow_logs", workflow="run-1")
+
+
+@pytest.mark.asyncio
+async def test_persisted_logs_are_preferred(mocker, experiment_run):
+    reana_service = ReanaService()
+    reana_call = mocker.patch.object(reana_service, "_async_reana_call", AsyncMock())
+    (experiment_run.run_path / LOGS_FILENAME).write_text("done", encoding="utf-8")
+
+    assert await reana_service.get_logs(experiment_run) == "done"
+    reana_call.assert_not_called()
+
+
+def test_unparsable_logs_are_returned_as_they_are():
+    raw_logs = "Error encountered when running a REANA workflow.\n\n{}"
+    assert ReanaService._extract_job_logs(raw_logs) == raw_logs
+
+
+@pytest.mark.asyncio
+async def test_only_job_logs_are_persisted(mocker, experiment_run):
+    reana_service = ReanaService()
+    mocker.patch.object(
+        reana_service, "_async_reana_call", AsyncMock(return_value={"logs": reana_logs("epoch 1")})
+    )
+    mocker.patch.object(reana_service, "list_files", AsyncMock(return_value=[]))
+    mocker.patch.object(reana_service, "_archive_outputs", AsyncMock(return_value=False))
+    workflow_state = WorkflowState(success=False, error_message="Workflow failed.")
+
+    await reana_service.postprocess_workflow(experiment_run, workflow_state)
+
+    logs = (experiment_run.run_path / LOGS_FILENAME).read_text(encoding="utf-8")
+    assert logs == "epoch 1\nWorkflow failed."
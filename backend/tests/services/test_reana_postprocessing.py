@@ -0,0 +1,98 @@
+import asyncio
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from app.helpers import FileDetail, WorkflowState
+from app.services.workflow_engines.reana import ReanaConnectionException, ReanaService
+
+
+def file_detail(filepath: str) -> FileDetail:
+    return FileDetail(filepath=filepath, size=1, last_modified=datetime.now(timezone.utc))
+
+
+@pytest.fixture
+def experiment_run(tmp_path):
+    return Mock(workflow_name="run-1", run_path=tmp_path, run_output_path=tmp_path / "output")
+
+
+@pytest.fixture
+def reana_service(mocker):
+    reana_service = ReanaService()
+    mocker.patch.object(reana_service, "download_file", AsyncMock())
+    return reana_service
+
+
+def mock_reana_calls(mocker, reana_service, files, delay: float = 0):
+    calls = []
+
+    async def reana_call(function_name, **kwargs):
+        calls.append(function_name)
+        await asyncio.sleep(delay)
+        if function_name == "list_files":
+            return [
+                {"name": file, "size": {"raw": 1}, "last-modified": datetime.now(timezone.utc)}
+                for file in files
+            ]
+        if function_name == "get_workflow_logs":
+            return {"logs": "{}"}
+        return None
+
+    mocker.patch.object(reana_service, "_async_reana_call", side_effect=reana_call)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_workspace_is_listed_once_without_temporary_outputs(
+    mocker, reana_service, experiment_run
+):
+    calls = mock_reana_calls(mocker, reana_service, ["output/metrics.json"])
+
+    await reana_service.postprocess_workflow(experiment_run, WorkflowState(success=True))
+
+    assert calls.count("list_files") == 1
+    assert "mv_files" not in calls
+    reana_service.download_file.assert_awaited_once_with(
+        experiment_run, "output/metrics.json", experiment_run.run_output_path
+    )
+
+
+@pytest.mark.asyncio
+async def test_workspace_is_listed_again_after_outputs_are_moved(
+    mocker, reana_service, experiment_run
+):
+    calls = mock_reana_calls(mocker, reana_service, ["output-temp/metrics.json"])
+
+    await reana_service.postprocess_workflow(experiment_run, WorkflowState(success=True))
+
+    assert calls.index("prune_workspace") < calls.index("mv_files")
+    assert calls.count("list_files") == 2
+    reana_service.download_file.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_logs_are_retrieved_concurrently_with_outputs(mocker, reana_service, experiment_run):
+    mock_reana_calls(mocker, reana_service, ["output/metrics.json"], delay=0.1)
+
+    await reana_service.postprocess_workflow(experiment_run, WorkflowState(success=True))
+
+    stats = reana_service.get_postprocess_stats()
+    assert set(stats) == {"logs", "prune", "list_files", "outputs", "total"}
+    # prune, list_files and logs would take 0.3s if done one after another
+    assert stats["total"]["max"] < 0.28
+    assert (experiment_run.run_path / "logs.txt").is_file()
+
+
+@pytest.mark.asyncio
+async def test_connection_failure_is_raised_once_all_stages_conclude(
+    mocker, reana_service, experiment_run
+):
+    mock_reana_calls(mocker, reana_service, [])
+    mocker.patch.object(
+        reana_service, "_fetch_logs", AsyncMock(side_effect=ReanaConnectionException())
+    )
+
+    with pytest.raises(ReanaConnectionException):
+        await reana_service.postprocess_workflow(experiment_run, WorkflowState(success=True))
+    assert "outputs" in reana_service.get_postprocess_stats()
@@ -0,0 +1,129 @@
+import asyncio
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from app.services.workflow_engines.base import WorkflowConnectionException
+from app.services.workflow_engines.reana import ReanaService
+from app.services.workflow_engines.reana_watcher import MAX_FAILED_POLLS, ReanaWorkflowWatcher
+
+
+class FakeReana:
+    def __init__(self, statuses: dict[str, str]) -> None:
+        self.statuses = statuses
+        self.calls: list[str] = []
+
+    async def __call__(self, function_name, **kwargs):
+        self.calls.append(function_name)
+        if function_name == "get_workflows":
+            return [
+                {"name": f"{name}.1", "status": status}
+                for name, status in self.statuses.items()
+                if status in kwargs["status"]
+            ]
+        if function_name == "get_workflow_status":
+            if kwargs["workflow"] not in self.statuses:
+                raise Exception("Workflow does not exist")
+            return {"status": self.statuses[kwargs["workflow"]]}
+
+
+@pytest.mark.asyncio
+async def test_statuses_of_all_workflows_are_polled_at_once():
+    reana = FakeReana({"run-1": "running", "run-2": "queued", "run-3": "running"})
+    watcher = ReanaWorkflowWatcher(reana, interval=0.01)
+
+    waiting = [asyncio.create_task(watcher.wait(name)) for name in reana.statuses]
+    await asyncio.sleep(0.035)
+    assert set(reana.calls) == {"get_workflows"}
+    assert not any(task.done() for task in waiting)
+
+    reana.statuses.update({"run-1": "finished", "run-2": "stopped"})
+    del reana.statuses["run-3"]
+
+    assert await asyncio.gather(*waiting) == ["finished", "stopped", "deleted"]
+    assert reana.calls.count("get_workflow_status") == 3
+    assert watcher.watched == {}
+
+
+@pytest.mark.asyncio
+async def test_watched_workflows_fail_once_polling_keeps_failing():
+    watcher = ReanaWorkflowWatcher(AsyncMock(side_effect=Exception("Bad request")), interval=0.001)
+
+    with pytest.raises(Exception, match="Bad request"):
+        await asyncio.wait_for(watcher.wait("run-1"), timeout=1)
+    assert watcher.reana_call.call_count == MAX_FAILED_POLLS
+
+
+@pytest.mark.asyncio
+async def test_workflows_are_watched_while_reana_is_unreachable():
+    reana = FakeReana({"run-1": "running"})
+    unreachable = AsyncMock(side_effect=WorkflowConnectionException("Unable to connect"))
+    watcher = ReanaWorkflowWatcher(unreachable, interval=0.001)
+
+    waiting = asyncio.create_task(watcher.wait("run-1"))
+    await asyncio.sleep(0.05)
+    assert unreachable.call_count > MAX_FAILED_POLLS
+    assert not waiting.done()
+
+    reana.statuses["run-1"] = "finished"
+    watcher.reana_call = reana
+    assert await asyncio.wait_for(waiting, timeout=1) == "finished"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "status, success, manually_stopped, manually_deleted",
+    [
+        ("finished", True, False, False),
+        ("failed", False, False, False),
+        ("stopped", False, True, False),
+        ("deleted", False, False, True),
+    ],
+)
+async def test_run_workflow_maps_final_status(
+    mocker, status, success, manually_stopped, manually_deleted
+):
+    reana_service = ReanaService()
+    mocker.patch.object(reana_service, "_submit_workflow")
+    mocker.patch.object(reana_service.watcher, "wait", AsyncMock(return_value=status))
+
+    workflow_state = await reana_service.run_workflow(Mock(workflow_name="run-1"))
+
+    assert workflow_state.success is success
+    assert workflow_state.manually_stopped is manually_stopped
+    assert workflow_state.manually_deleted is manually_deleted
+
+
+@pytest.mark.asyncio
+async def test_errors_fetching_final_status_are_retried_and_not_mistaken_for_deletion():
+    reana = FakeReana({"run-1": "finished"})
+    responses = [Exception("Internal server error"), {"progress": {}}, {"status": "finished"}]
+
+    async def reana_call(function_name, **kwargs):
+        if function_name == "get_workflow_status":
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+        return await reana(function_name, **kwargs)
+
+    watcher = ReanaWorkflowWatcher(reana_call, interval=0.001)
+
+    assert await asyncio.wait_for(watcher.wait("run-1"), timeout=1) == "finished"
+    assert watcher.failed_status_fetches == {}
+    await asyncio.wait_for(watcher._task, timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_workflow_fails_once_its_final_status_keeps_failing():
+    reana = FakeReana({"run-1": "finished"})
+
+    async def reana_call(function_name, **kwargs):
+        if function_name == "get_workflow_status":
+            raise Exception("Token is not valid")
+        return await reana(function_name, **kwargs)
+
+    watcher = ReanaWorkflowWatcher(reana_call, interval=0.001)
+
+    assert await asyncio.wait_for(watcher.wait("run-1"), timeout=1) == "failed"
+    await asyncio.wait_for(watcher._task, timeout=1)
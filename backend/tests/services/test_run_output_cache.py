@@ -0,0 +1,116 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from beanie import PydanticObjectId
+
+from app.config import settings
+from app.helpers import FileDetail, FileStream
+from app.services.run_output_cache import RunOutputCache
+
+output_files = {
+    "output/metrics.json": b'{"accuracy": 0.9}',
+    "output/model/weights.bin": b"0123456789" * 100,
+}
+
+
+def create_run() -> Mock:
+    run_id = PydanticObjectId()
+    return Mock(
+        id=run_id,
+        run_path=settings.get_experiment_run_path(run_id),
+        run_output_path=settings.get_experiment_run_output_path(run_id),
+    )
+
+
+def create_workflow_engine(files: dict[str, bytes]) -> Mock:
+    async def stream_file(experiment_run, filepath, byte_range=None):
+        async def chunks():
+            yield files[filepath]
+
+        return FileStream(filename=os.path.basename(filepath), chunks=chunks(), close=AsyncMock())
+
+    workflow_engine = Mock()
+    workflow_engine.list_files = AsyncMock(
+        return_value=[
+            FileDetail(filepath="reana.yaml", size=10, last_modified=datetime.now(timezone.utc)),
+            *[
+                FileDetail(
+                    filepath=filepath, size=len(content), last_modified=datetime.now(timezone.utc)
+                )
+                for filepath, content in files.items()
+            ],
+        ]
+    )
+    workflow_engine.stream_file = stream_file
+    return workflow_engine
+
+
+@pytest.fixture(autouse=True)
+def eee_data_path(mocker, tmp_path):
+    mocker.patch.object(settings, "EEE_DATA_PATH", tmp_path)
+
+
+@pytest.mark.asyncio
+async def test_archive_outputs_of_run():
+    run_output_cache = RunOutputCache(quota=10_000)
+    experiment_run = create_run()
+
+    assert await run_output_cache.archive(experiment_run, create_workflow_engine(output_files))
+
+    manifest = run_output_cache.get_manifest(experiment_run)
+    assert manifest.total_size == sum(len(content) for content in output_files.values())
+    for file in manifest.files:
+        assert file.sha256 == hashlib.sha256(output_files[file.filepath]).hexdigest()
+
+    assert [file.filepath for file in run_output_cache.list_files(experiment_run)] == list(
+        output_files
+    )
+    local_path = run_output_cache.get_file(experiment_run, "output/model/weights.bin")
+    assert local_path.read_bytes() == output_files["output/model/weights.bin"]
+
+
+@pytest.mark.asyncio
+async def test_files_outside_of_outputs_are_not_served():
+    run_output_cache = RunOutputCache(quota=10_000)
+    experiment_run = create_run()
+    await run_output_cache.archive(experiment_run, create_workflow_engine(output_files))
+
+    assert run_output_cache.get_file(experiment_run, "output-manifest.json") is None
+    assert run_output_cache.get_file(experiment_run, "output/../output-manifest.json") is None
+    assert run_output_cache.get_file(create_run(), "output/metrics.json") is None
+
+
+@pytest.mark.asyncio
+async def test_outputs_exceeding_quota_are_not_archived():
+    run_output_cache = RunOutputCache(quota=100)
+    experiment_run = create_run()
+
+    assert not await run_output_cache.archive(experiment_run, create_workflow_engine(output_files))
+    assert run_output_cache.list_files(experiment_run) is None
+
+
+@pytest.mark.asyncio
+async def test_least_recently_accessed_outputs_are_evicted():
+    run_size = sum(len(content) for content in output_files.values())
+    run_output_cache = RunOutputCache(quota=2 * run_size)
+    workflow_engine = create_workflow_engine(output_files)
+
+    runs = [create_run() for _ in range(3)]
+    for i, experiment_run in enumerate(runs[:2]):
+        await run_output_cache.archive(experiment_run, workflow_engine)
+        # make the access times distinguishable regardless of the filesystem resolution
+        manifest_path = experiment_run.run_path / "output-manifest.json"
+        os.utime(manifest_path, (1000 + i, 1000 + i))
+
+    run_output_cache.list_files(runs[0])
+    await run_output_cache.archive(runs[2], workflow_engine)
+
+    assert run_output_cache.list_files(runs[0]) is not None
+    assert run_output_cache.list_files(runs[1]) is None
+    assert run_output_cache.list_files(runs[2]) is not None
+    # metrics are kept as part of the run details
+    assert (runs[1].run_output_path / "metrics.json").is_file()
+    assert not (runs[1].run_output_path / "model").exists()
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from beanie import PydanticObjectId
+
+from app.models.scheduled_job import JobKind, ScheduledJob
+from app.services.job_queue import JobQueue
+from app.services.scheduling_policies import FairSharePolicy, FifoPolicy
+
+start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def create_jobs(*owners: str) -> list[ScheduledJob]:
+    return [
+        ScheduledJob(
+            kind=JobKind.EXPERIMENT_RUN,
+            target_id=PydanticObjectId(),
+            owner=owner,
+            enqueued_at=start + timedelta(seconds=i),
+        )
+        for i, owner in enumerate(owners)
+    ]
+
+
+def owners_of(jobs: list[ScheduledJob]) -> list[str | None]:
+    return [job.owner for job in jobs]
+
+
+def test_fifo_keeps_order_of_jobs():
+    jobs = create_jobs("alice", "alice", "bob")
+
+    assert FifoPolicy().order(jobs, running={}) == jobs
+
+
+def test_fair_share_alternates_between_users():
+    jobs = create_jobs("alice", "alice", "alice", "bob", "carol", "bob")
+
+    ordered_jobs = FairSharePolicy().order(jobs, running={})
+
+    assert owners_of(ordered_jobs) == ["alice", "bob", "carol", "alice", "bob", "alice"]
+
+
+def test_fair_share_takes_running_jobs_into_account():
+    jobs = create_jobs("alice", "bob", "bob")
+
+    ordered_jobs = FairSharePolicy().order(jobs, running={"alice": 2})
+
+    assert owners_of(ordered_jobs) == ["bob", "bob", "alice"]
+
+
+def test_fair_share_respects_weights_of_users():
+    jobs = create_jobs(*["alice"] * 4, *["bob"] * 4)
+
+    ordered_jobs = FairSharePolicy(owner_weights={"alice": 3}).order(jobs, running={})
+
+    assert owners_of(ordered_jobs)[:4].count("alice") == 3
+
+
+def test_users_at_their_cap_are_skipped():
+    jobs = create_jobs("alice", "alice", "bob")
+    policy = FairSharePolicy(max_running_per_owner=2, owner_max_running={"bob": 1})
+
+    assert owners_of(policy.select(jobs, running={"alice": 2})) == ["bob"]
+    assert policy.select(jobs, running={"alice": 2, "bob": 1}) == []
+    assert policy.get_max_running("carol") == 2
+
+
+@pytest.mark.asyncio
+async def test_job_queue_claims_jobs_by_policy():
+    await ScheduledJob.find_all().delete()
+    queue = JobQueue(
+        JobKind.EXPERIMENT_RUN, "worker-a", policy=FairSharePolicy(max_running_per_owner=1)
+    )
+    for owner in ["alice", "alice", "bob"]:
+        await queue.put(PydanticObjectId(), owner=owner)
+
+    first_job, second_job = await queue.claim(), await queue.claim()
+
+    assert [first_job.owner, second_job.owner] == ["alice", "bob"]
+    assert await queue.count_running_by_owner() == {"alice": 1, "bob": 1}
+    assert await queue.claim() is None
+
+    await queue.complete(first_job)
+    assert (await queue.claim()).owner == "alice"
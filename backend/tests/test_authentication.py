@@ -1,9 +1,29 @@
+import time
 from unittest.mock import AsyncMock, patch
 
 import pytest
+import rsa
 from fastapi import HTTPException, status
+from jose import jwk, jwt
+from keycloak import KeycloakError
 
-from app.auth import get_current_user_or_raise
+from app.auth import (
+    JWKSCache,
+    get_current_user_if_exists,
+    get_current_user_or_raise,
+    has_admin_role,
+    is_admin,
+    keycloak_openid,
+    user_cache,
+)
+from app.config import TokenVerificationMode, settings
+
+
+@pytest.fixture(autouse=True)
+def clear_user_cache():
+    user_cache.clear()
+    yield
+    user_cache.clear()
 
 
 @pytest.mark.asyncio
@@ -40,3 +60,144 @@ async def test_get_current_user_raises_if_token_not_verified(
 
     mock_verify_token.assert_awaited_once_with("invalid_token")
     assert exception_info.value.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+ISSUER = "https://keycloak.aiod.eu/realms/aiod"
+
+
+@pytest.fixture(scope="module")
+def signing_key():
+    _, private_key = rsa.newkeys(2048)
+    private_pem = private_key.save_pkcs1().decode()
+    public_jwk = {**jwk.construct(private_pem, "RS256").public_key().to_dict(), "kid": "key-1"}
+    return private_pem, public_jwk
+
+
+@pytest.fixture
+def local_verification(mocker, signing_key):
+    _, public_jwk = signing_key
+    mocker.patch.object(settings.AIOD_KEYCLOAK, "TOKEN_VERIFICATION", TokenVerificationMode.LOCAL)
+    mocker.patch("app.auth.jwks_cache", JWKSCache(refresh_interval=3600))
+    mocker.patch.object(keycloak_openid, "well_known", return_value={"issuer": ISSUER})
+    return mocker.patch.object(keycloak_openid, "certs", return_value={"keys": [public_jwk]})
+
+
+def create_token(signing_key, kid: str = "key-1", **claims) -> str:
+    private_pem, _ = signing_key
+    payload = {
+        "sub": "user-id",
+        "email": "john@doe.com",
+        "iss": ISSUER,
+        "exp": int(time.time()) + 300,
+        "resource_access": {"rail": {"roles": ["admin_access"]}},
+        "session_state": "1234",
+        **claims,
+    }
+    return jwt.encode(payload, private_pem, algorithm="RS256", headers={"kid": kid})
+
+
+@pytest.mark.asyncio
+async def test_local_verification_returns_userinfo_from_claims(local_verification, signing_key):
+    token = create_token(signing_key)
+
+    user = await get_current_user_if_exists(token=f"Bearer {token}")
+
+    assert user == {
+        "sub": "user-id",
+        "email": "john@doe.com",
+        "resource_access": {"rail": {"roles": ["admin_access"]}},
+    }
+    assert has_admin_role(user)
+
+
+@pytest.mark.asyncio
+async def test_local_verification_fetches_keys_only_once(local_verification, signing_key):
+    for _ in range(3):
+        await get_current_user_if_exists(token=create_token(signing_key))
+
+    local_verification.assert_called_once()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "claims",
+    [
+        {"exp": int(time.time()) - 10},
+        {"iss": "https://evil.com/realms/aiod"},
+    ],
+)
+async def test_local_verification_rejects_invalid_claims(local_verification, signing_key, claims):
+    with pytest.raises(HTTPException) as exception_info:
+        await get_current_user_if_exists(token=create_token(signing_key, **claims))
+    assert exception_info.value.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_local_verification_checks_audience(mocker, local_verification, signing_key):
+    mocker.patch.object(settings.AIOD_KEYCLOAK, "AUDIENCE", "rail")
+
+    user = await get_current_user_if_exists(token=create_token(signing_key, aud=["rail"]))
+    assert user["sub"] == "user-id"
+
+    with pytest.raises(HTTPException) as exception_info:
+        await get_current_user_if_exists(token=create_token(signing_key, aud="account"))
+    assert exception_info.value.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_local_verification_rejects_unknown_signing_key(local_verification, signing_key):
+    with pytest.raises(HTTPException) as exception_info:
+        await get_current_user_if_exists(token=create_token(signing_key, kid="unknown-key"))
+    assert exception_info.value.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_local_verification_rejects_malformed_token(local_verification):
+    with pytest.raises(HTTPException) as exception_info:
+        await get_current_user_if_exists(token="not-a-jwt")
+    assert exception_info.value.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_user_is_resolved_once_per_token(mocker, signing_key):
+    userinfo_mock = mocker.patch.object(
+        keycloak_openid,
+        "userinfo",
+        return_value={"sub": "user-id", "resource_access": {"rail": {"roles": ["admin_access"]}}},
+    )
+    token = create_token(signing_key)
+    hits = user_cache.hits
+
+    await get_current_user_if_exists(token=f"Bearer {token}")
+    await get_current_user_or_raise(token=token)
+    await is_admin(token=token)
+
+    userinfo_mock.assert_called_once_with(token)
+    assert user_cache.hits - hits == 2
+
+
+@pytest.mark.asyncio
+async def test_cached_user_expires_with_token(mocker, signing_key):
+    userinfo_mock = mocker.patch.object(
+        keycloak_openid, "userinfo", return_value={"sub": "user-id"}
+    )
+    token = create_token(signing_key, exp=int(time.time()) - 1)
+
+    await get_current_user_if_exists(token=token)
+    await get_current_user_if_exists(token=token)
+
+    assert userinfo_mock.call_count == 2
+    assert len(user_cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_invalid_token_is_not_cached(mocker):
+    userinfo_mock = mocker.patch.object(
+        keycloak_openid, "userinfo", side_effect=KeycloakError(error_message="invalid")
+    )
+
+    for _ in range(2):
+        with pytest.raises(HTTPException):
+            await get_current_user_if_exists(token="invalid_token")
+
+    assert userinfo_mock.call_count == 2
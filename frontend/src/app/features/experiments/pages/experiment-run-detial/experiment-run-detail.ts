@@ -127,7 +127,7 @@ export class ExperimentRunDetailComponent {
         .subscribe({
           next: (r) => {
             this.run.set(r);
-            this.logs.set(extractLogs(r?.logs));
+            this.loadLogs(r.id);
 
             // get experiment
             this.backend
@@ -171,7 +171,7 @@ export class ExperimentRunDetailComponent {
         .subscribe({
           next: (r) => {
             this.run.set(r);
-            this.logs.set(extractLogs(r?.logs));
+            this.loadLogs(r.id);
             if (r.state === 'FINISHED' || r.state === 'CRASHED') {
               this.loadFiles(r.id);
               sub.unsubscribe();
@@ -284,6 +284,16 @@ export class ExperimentRunDetailComponent {
     return `${Math.round(s * 100) / 100} ${units[i]}`;
   }
 
+  private loadLogs(runId: string) {
+    this.backend
+      .getExperimentRunLogs(runId)
+      .pipe(takeUntilDestroyed(this.destroyRef))
+      .subscribe({
+        next: (logs) => this.logs.set(extractLogs(logs)),
+        error: (err) => console.error(err),
+      });
+  }
+
   private loadFiles(runId: string) {
     this.backend
       .listFilesFromExperimentRun(runId)
@@ -298,13 +308,15 @@ export class ExperimentRunDetailComponent {
 // ---------- pure helpers ----------
 function extractLogs(raw?: string | null): string {
   if (!raw) return '';
+  // logs of older runs are stored in the raw REANA format
   try {
     const parsed = JSON.parse(raw);
     const jobLogs = parsed?.['job_logs'];
-    const firstKey = jobLogs ? Object.keys(jobLogs)[0] : null;
+    if (!jobLogs) return raw;
+    const firstKey = Object.keys(jobLogs)[0];
     return firstKey ? jobLogs[firstKey]?.['logs'] ?? '' : '';
   } catch {
-    return '';
+    return raw;
   }
 }
 
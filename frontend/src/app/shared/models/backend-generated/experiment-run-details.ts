@@ -21,7 +21,7 @@ export interface ExperimentRunDetails {
     is_public: boolean;
     is_archived: boolean;
     is_mine: boolean;
-    logs: string;
+    logs?: string | null;
 }
 export namespace ExperimentRunDetails {
 }
@@ -36,6 +36,26 @@ class ExperimentRunsApi:
             response_types_map={"200": "object","422": "HTTPValidationError"}
         ).data
 
+    def download_outputs(self, id: StrictStr, prefix: StrictStr, format: StrictStr) -> RESTResponseType:
+        _param = self.api_client.param_serialize(
+                method="GET",
+                resource_path="/v1/experiment-runs/{id}/files/archive",
+                path_params={"id": id},
+                query_params=[("prefix", prefix), ("format", format)],
+                header_params={"Accept": self.api_client.select_header_accept(["application/octet-stream"])},
+                auth_settings=["AccessToken", "OpenIdConnect"]
+            )
+
+        # the archive is not preloaded so that it can be read as it's being downloaded
+        response_data = self.api_client.call_api(*_param)
+        if not 200 <= response_data.status <= 299:
+            response_data.read()
+            self.api_client.response_deserialize(
+                response_data=response_data,
+                response_types_map={"422": "HTTPValidationError"}
+            )
+        return response_data.response
+
     @validate_call
     def delete_experiment_run_v1_experiment_runs_id_delete(
         self,
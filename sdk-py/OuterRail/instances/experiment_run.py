@@ -1,4 +1,6 @@
 import json
+import shutil
+import tarfile
 
 from pathlib import Path
 from datetime import datetime
@@ -120,6 +122,45 @@ class ExperimentRun(BaseModel):
         with local_file_path.open("wb") as f:
             f.write(data)
 
+    def download_outputs(self, to_dir: str, prefix: str = "output/") -> None:
+        """
+        Downloads all files of the run under the given prefix (the whole output directory by default).
+
+        The files are transferred as a single archive that is extracted while being downloaded,
+        so it is never stored locally as a whole.
+
+        Args:
+            to_dir (str): Path to the local directory where the run files will be downloaded.
+            prefix (str, optional): Only files whose path starts with the prefix are downloaded.
+                Defaults to "output/".
+
+        Returns:
+            None.
+
+        Raises:
+            ApiException: In case of a failed HTTP request.
+
+        Examples:
+            >>> self.download_outputs("path/to/local/dir/")
+            None # files will be downloaded to "path/to/local/dir/output/..."
+        """
+
+        with ApiClient(self._config) as api_client:
+            api_instance = ExperimentRunsApi(api_client)
+            response = api_instance.download_outputs(id=self.id, prefix=prefix, format="tar.gz")
+            try:
+                # Unlike zip, tar can be extracted sequentially as it's being read
+                with tarfile.open(fileobj=response, mode="r|gz") as tar:
+                    for member in tar:
+                        local_file_path = (Path(to_dir) / member.name).resolve()
+                        if not member.isfile() or Path(to_dir).resolve() not in local_file_path.parents:
+                            continue
+                        local_file_path.parent.mkdir(parents=True, exist_ok=True)
+                        with local_file_path.open("wb") as f:
+                            shutil.copyfileobj(tar.extractfile(member), f)
+            finally:
+                response.release_conn()
+
     def logs(self) -> str:
         """
         Fetches the logs of the experiment run.